@@ -0,0 +1,106 @@
+"""
+Benchmark vision inference latency against input resolution
+
+The images in testImages/ are small, so each is first upscaled to a phone-
+camera sized JPEG (--source-edge, 4032 px by default, about 12 MP). That file
+is then sent to LlamaClient.generate_img_response as-is ("raw") and after
+preprocess_image at each --edges value. Reports preprocessing time, encoded
+size and inference latency per resolution. Requires Ollama running with
+OLLAMA_MODEL pulled unless --no-inference is given.
+
+Usage:
+    python benchmarks/bench_image_preprocess.py
+    python benchmarks/bench_image_preprocess.py --edges 1536 1024 512 --repeats 3
+    python benchmarks/bench_image_preprocess.py --no-inference
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Add src directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from PIL import Image
+from ImagePreprocessor import preprocess_image
+
+TEST_IMAGES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'testImages'))
+
+
+def make_source(image_path, edge, out_dir):
+    """
+    Upscale an image so its longest edge is `edge` pixels, saved as a camera-quality JPEG
+    """
+    with Image.open(image_path) as img:
+        img = img.convert("RGB")
+        scale = edge / max(img.size)
+        size = (round(img.width * scale), round(img.height * scale))
+        out_path = os.path.join(out_dir, f"source_{os.path.splitext(os.path.basename(image_path))[0]}.jpg")
+        img.resize(size, Image.Resampling.BICUBIC).save(out_path, "JPEG", quality=95)
+    return out_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default=TEST_IMAGES_DIR, help="Directory of images to run")
+    parser.add_argument("--source-edge", type=int, default=4032, help="Longest edge of the simulated upload")
+    parser.add_argument("--edges", type=int, nargs="+", default=[2048, 1024, 768, 512])
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--no-inference", action="store_true", help="Only measure preprocessing")
+    args = parser.parse_args()
+
+    images = sorted(
+        os.path.join(args.images, f) for f in os.listdir(args.images)
+        if f.lower().endswith((".jpg", ".jpeg", ".png", ".webp"))
+    )
+    if not images:
+        print(f"No images found in {args.images}")
+        return 1
+
+    client = None
+    if not args.no_inference:
+        from LlamaClient import LlamaClient
+        client = LlamaClient()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sources = [make_source(image, args.source_edge, tmp_dir) for image in images]
+
+        if client:
+            # Load the vision model once so the first measured call isn't a cold start
+            client.generate_img_response(sources[0])
+
+        summary = {}
+        for edge in [None] + args.edges:
+            label = "raw" if edge is None else str(edge)
+            prep_ms, sizes, latencies = [], [], []
+            for source in sources:
+                for _ in range(args.repeats):
+                    if edge is None:
+                        path = source
+                    else:
+                        path = os.path.join(tmp_dir, f"prep_{edge}.jpg")
+                        t0 = time.perf_counter()
+                        preprocess_image(source, path, max_edge=edge)
+                        prep_ms.append((time.perf_counter() - t0) * 1000)
+                    sizes.append(os.path.getsize(path))
+
+                    if client:
+                        t0 = time.perf_counter()
+                        client.generate_img_response(path)
+                        latencies.append(time.perf_counter() - t0)
+                        print(f"[{label}] {os.path.basename(source)}: {latencies[-1]:.2f}s")
+            summary[label] = (prep_ms, sizes, latencies)
+
+    print(f"\n{'max edge':>8} {'prep ms':>8} {'KB':>8} {'median s':>9} {'mean s':>8}")
+    for label, (prep_ms, sizes, latencies) in summary.items():
+        prep = f"{statistics.median(prep_ms):.1f}" if prep_ms else "-"
+        median = f"{statistics.median(latencies):.2f}" if latencies else "-"
+        mean = f"{statistics.mean(latencies):.2f}" if latencies else "-"
+        print(f"{label:>8} {prep:>8} {statistics.mean(sizes) / 1024:>8.0f} {median:>9} {mean:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Benchmark the .npy/JSON index files against versioned index bundles
+
+Builds a synthetic catalog in the chromaInit.py layout, writes a bundle at
+each --dtypes value with IndexBundle.write_bundle, then opens every variant
+with NumpyVectorIndex.load in a fresh subprocess. Reports disk size, load
+time, resident memory after load and after queries, query latency and the
+recall@k the build measured against float32.
+
+Usage:
+    python benchmarks/bench_index_bundle.py
+    python benchmarks/bench_index_bundle.py --sizes 100000 500000 --dtypes float16 int8
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from IndexBundle import MANIFEST_FILE, write_bundle
+from VectorIndex import NumpyVectorIndex, EMBEDDINGS_FILE, IDS_FILE, METADATA_FILE
+from bench_search_backends import EMBEDDING_DIM, build_catalog, current_rss_mb
+
+
+def dir_size_mb(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file()) / (1024 * 1024)
+
+
+def _measure(index_dir, n_queries, top_k, out):
+    """
+    Subprocess body: load one layout, run queries, report timings and RSS
+    """
+    rss_before = current_rss_mb()
+    t0 = time.perf_counter()
+    index = NumpyVectorIndex.load(index_dir)
+    load_s = time.perf_counter() - t0
+    rss_loaded = current_rss_mb() - rss_before
+
+    rng = np.random.default_rng(1)
+    queries = rng.standard_normal((n_queries, EMBEDDING_DIM)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    index.query(queries[:1], top_k)  # page in the index
+    latencies = []
+    for query in queries:
+        t = time.perf_counter()
+        index.query(query[None, :], top_k)
+        latencies.append((time.perf_counter() - t) * 1000)
+
+    out.put({
+        "load_ms": load_s * 1000,
+        "rss_loaded_mb": rss_loaded,
+        "rss_mb": current_rss_mb() - rss_before,
+        "p50_ms": float(np.percentile(latencies, 50)),
+    })
+
+
+def measure(index_dir, n_queries, top_k):
+    ctx = mp.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(target=_measure, args=(index_dir, n_queries, top_k, out))
+    proc.start()
+    result = out.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 250000])
+    parser.add_argument("--dtypes", nargs="+", default=["float32", "float16", "int8"])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=15)
+    args = parser.parse_args()
+
+    print(f"{'songs':>9} {'layout':>9} {'disk MB':>8} {'load ms':>8} {'RSS load':>9} {'RSS MB':>8} {'p50 ms':>8} {'recall':>7}")
+    for n_songs in args.sizes:
+        work_dir = tempfile.mkdtemp(prefix="ibmrs_bench_")
+        try:
+            build_catalog(work_dir, n_songs)
+            layouts = [("npy+json", work_dir, None)]
+            embeddings = np.load(os.path.join(work_dir, EMBEDDINGS_FILE), mmap_mode="r")
+            with open(os.path.join(work_dir, IDS_FILE)) as f:
+                ids = json.load(f)
+            with open(os.path.join(work_dir, METADATA_FILE)) as f:
+                metadatas = json.load(f)
+            for dtype in args.dtypes:
+                bundle_dir = write_bundle(os.path.join(work_dir, f"bundles_{dtype}"), embeddings, ids, metadatas,
+                                          "synthetic", dtype=dtype, top_k=args.top_k)
+                with open(os.path.join(bundle_dir, MANIFEST_FILE)) as f:
+                    recall = json.load(f)["recall"]["recall_at_k"]
+                layouts.append((dtype, bundle_dir, recall))
+            del embeddings, ids, metadatas
+
+            for label, index_dir, recall in layouts:
+                r = measure(index_dir, args.queries, args.top_k)
+                recall = "-" if recall is None else f"{recall:.4f}"
+                print(f"{n_songs:>9} {label:>9} {dir_size_mb(index_dir):>8.1f} {r['load_ms']:>8.1f} "
+                      f"{r['rss_loaded_mb']:>9.1f} {r['rss_mb']:>8.1f} {r['p50_ms']:>8.2f} {recall:>7}")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
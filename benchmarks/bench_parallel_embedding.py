@@ -0,0 +1,78 @@
+"""
+Benchmark catalog embedding throughput from 1 to N encoding processes
+
+Encodes synthetic track texts (same format as chromaInit.build_track_texts)
+with chromaInit.ParallelEncoder at each worker count and reports rows/s,
+speedup over one worker and parallel efficiency. Each worker gets
+cores / workers torch threads unless --torch-threads is given. Results are
+checked against the single-process output to confirm rows come back in order.
+Requires sentence-transformers and torch.
+
+Usage:
+    python benchmarks/bench_parallel_embedding.py
+    python benchmarks/bench_parallel_embedding.py --rows 50000 --workers 1 2 4 8 16
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Add chroma directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'chroma')))
+
+from chromaInit import ParallelEncoder, build_track_texts, FEATURE_COLUMNS
+
+
+def make_texts(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({c: rng.random(n_rows).round(3) for c in FEATURE_COLUMNS})
+    df["tempo"] = (df["tempo"] * 150 + 60).round(3)
+    return build_track_texts(df).tolist()
+
+
+def main():
+    cores = os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers)
+    parser.add_argument("--torch-threads", type=int, default=None, help="Torch threads per worker (default cores / workers)")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    texts = make_texts(args.rows)
+    reference = None
+    baseline = None
+
+    print(f"{args.rows} rows, {cores} cores")
+    print(f"{'workers':>7} {'threads':>7} {'load s':>7} {'encode s':>9} {'rows/s':>8} {'speedup':>8} {'eff':>5}")
+    for workers in sorted(args.workers):
+        t0 = time.perf_counter()
+        with ParallelEncoder(workers=workers, torch_threads=args.torch_threads, batch_size=args.batch_size) as encoder:
+            # Model load happens in the pool initializer; dimension() waits for a worker to be ready
+            encoder.dimension()
+            load_s = time.perf_counter() - t0
+            t1 = time.perf_counter()
+            embeddings = encoder.encode(texts)
+            encode_s = time.perf_counter() - t1
+
+        if reference is None:
+            reference = embeddings
+        elif not np.allclose(embeddings, reference, atol=1e-4):
+            print(f"✗ {workers} workers returned embeddings that differ from the single-process run")
+            return 1
+
+        rate = args.rows / encode_s
+        baseline = baseline or rate
+        speedup = rate / baseline
+        print(f"{workers:>7} {encoder.torch_threads:>7} {load_s:>7.1f} {encode_s:>9.1f} {rate:>8.0f} "
+              f"{speedup:>7.2f}x {speedup / workers:>5.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
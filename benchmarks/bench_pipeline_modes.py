@@ -0,0 +1,64 @@
+"""
+Benchmark end-to-end LlamaClient pipeline latency: three-step vs single-call
+
+Runs LlamaClient.run_stages on every image in testImages/ in both modes
+against the local Ollama server and reports per-image and median latency.
+Requires Ollama running with OLLAMA_MODEL pulled and a built song index.
+
+Usage:
+    python benchmarks/bench_pipeline_modes.py
+    python benchmarks/bench_pipeline_modes.py --repeats 3 --modes single_call
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Add src directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from LlamaClient import LlamaClient
+
+TEST_IMAGES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'testImages'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default=TEST_IMAGES_DIR, help="Directory of images to run")
+    parser.add_argument("--modes", nargs="+", default=["three_step", "single_call"])
+    parser.add_argument("--repeats", type=int, default=1)
+    args = parser.parse_args()
+
+    images = sorted(
+        os.path.join(args.images, f) for f in os.listdir(args.images)
+        if f.lower().endswith((".jpg", ".jpeg", ".png", ".webp"))
+    )
+    if not images:
+        print(f"No images found in {args.images}")
+        return 1
+
+    # Load the vision model once so the first measured call isn't a cold start
+    LlamaClient(mode="three_step").generate_img_response(images[0])
+
+    summary = {}
+    for mode in args.modes:
+        client = LlamaClient(mode=mode)
+        latencies = []
+        for image in images:
+            for _ in range(args.repeats):
+                t0 = time.perf_counter()
+                result = client.run_stages(image)
+                elapsed = time.perf_counter() - t0
+                latencies.append(elapsed)
+                print(f"[{mode}] {os.path.basename(image)}: {elapsed:.2f}s, {len(result['songs'])} songs, descriptors={result['descriptors']}")
+        summary[mode] = latencies
+
+    print(f"\n{'mode':>12} {'runs':>5} {'median s':>9} {'mean s':>8} {'max s':>7}")
+    for mode, latencies in summary.items():
+        print(f"{mode:>12} {len(latencies):>5} {statistics.median(latencies):>9.2f} {statistics.mean(latencies):>8.2f} {max(latencies):>7.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
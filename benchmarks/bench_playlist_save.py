@@ -0,0 +1,116 @@
+"""
+Benchmark saving a generated playlist: per-row ORM path vs bulk upsert
+
+Runs against the database configured in .env. Creates a throwaway user,
+saves playlists of 15, 100 and 1,000 tracks with both strategies (half the
+tracks already exist as songs, half are new), and deletes everything it
+created afterwards.
+
+Usage:
+    python benchmarks/bench_playlist_save.py
+    python benchmarks/bench_playlist_save.py --sizes 15 100 1000 --repeats 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.config import SessionLocal, init_db, test_connection
+from database.models import User, Playlist, Song, PlaylistSong
+from database.playlist_store import save_generated_playlist, dedupe_tracks, spotify_track_id_from_uri
+
+
+def make_tracks(prefix, n):
+    return [
+        {'name': f'Bench Song {i}', 'artist': f'Bench Artist {i % 50}', 'uri': f'spotify:track:{prefix}{i:06d}'}
+        for i in range(n)
+    ]
+
+
+def save_per_row(db, user_id, tracks):
+    """
+    The original save path: one SELECT and one COMMIT per new song
+    """
+    playlist = Playlist(name='Bench', description='bench', is_public=False, user_id=user_id)
+    db.add(playlist)
+    db.commit()
+    for idx, track in enumerate(dedupe_tracks(tracks)):
+        spotify_track_id = spotify_track_id_from_uri(track['uri'])
+        song = db.query(Song).filter(Song.spotify_track_id == spotify_track_id).first()
+        if not song:
+            song = Song(spotify_track_id=spotify_track_id, title=track['name'], artist=track['artist'], audio_url=track['uri'])
+            db.add(song)
+            db.commit()
+        db.add(PlaylistSong(playlist_id=playlist.id, song_id=song.id, order=idx))
+    db.commit()
+
+
+def save_bulk(db, user_id, tracks):
+    save_generated_playlist(db, user_id, 'Bench', 'bench', None, tracks)
+
+
+def time_save(save_fn, user_id, tracks):
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        save_fn(db, user_id, tracks)
+        return (time.perf_counter() - started) * 1000
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[15, 100, 1000])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    if not test_connection():
+        print("✗ Cannot run benchmark without database connection")
+        return 1
+    init_db()
+
+    run_id = uuid.uuid4().hex[:8]
+    db = SessionLocal()
+    user = User(spotify_id=f'bench_{run_id}', email=f'bench_{run_id}@example.com', display_name='Benchmark')
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.close()
+
+    print(f"{'tracks':>7} {'strategy':>9} {'median ms':>10} {'min ms':>8}")
+    try:
+        for n in args.sizes:
+            for name, save_fn in (('per-row', save_per_row), ('bulk', save_bulk)):
+                timings = []
+                for r in range(args.repeats):
+                    prefix = f'{run_id}{name[0]}{n}r{r}x'
+                    existing = make_tracks(prefix + 'e', n // 2)
+                    # Pre-create half the songs so both lookup and insert paths are exercised
+                    seed_db = SessionLocal()
+                    try:
+                        save_generated_playlist(seed_db, user_id, 'Seed', 'seed', None, existing)
+                    finally:
+                        seed_db.close()
+                    tracks = existing + make_tracks(prefix + 'n', n - n // 2)
+                    timings.append(time_save(save_fn, user_id, tracks))
+                print(f"{n:>7} {name:>9} {statistics.median(timings):>10.1f} {min(timings):>8.1f}")
+    finally:
+        db = SessionLocal()
+        try:
+            db.query(Playlist).filter(Playlist.user_id == user_id).delete(synchronize_session=False)
+            db.query(Song).filter(Song.spotify_track_id.like(f'{run_id}%')).delete(synchronize_session=False)
+            db.query(User).filter(User.id == user_id).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Benchmark song search backends: ChromaDB collection vs memory-mapped NumPy index
+
+Builds synthetic catalogs of unit-norm embeddings (same dimension as
+all-mpnet-base-v2), then measures per-query latency and resident memory
+for each backend in a fresh subprocess so RSS numbers do not bleed
+between runs.
+
+Usage:
+    python benchmarks/bench_search_backends.py --sizes 100000 250000 500000 1000000
+    python benchmarks/bench_search_backends.py --sizes 100000 --skip-chroma
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from VectorIndex import NumpyVectorIndex, EMBEDDINGS_FILE, IDS_FILE, METADATA_FILE
+
+EMBEDDING_DIM = 768
+COLLECTION_NAME = "spotify_songs_collection"
+FEATURES = ['danceability', 'energy', 'acousticness', 'liveness', 'tempo', 'valence']
+
+
+def current_rss_mb():
+    """
+    Current resident set size of this process in MB (Linux /proc, falls back to peak RSS)
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def build_catalog(index_dir, n_songs, seed=0):
+    """
+    Write a synthetic catalog in the chromaInit.py file layout
+    """
+    rng = np.random.default_rng(seed)
+    embeddings = np.lib.format.open_memmap(
+        os.path.join(index_dir, EMBEDDINGS_FILE), mode="w+", dtype=np.float32, shape=(n_songs, EMBEDDING_DIM)
+    )
+    chunk = 65536
+    for start in range(0, n_songs, chunk):
+        block = rng.standard_normal((min(chunk, n_songs - start), EMBEDDING_DIM)).astype(np.float32)
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        embeddings[start:start + len(block)] = block
+    embeddings.flush()
+    del embeddings
+
+    with open(os.path.join(index_dir, IDS_FILE), "w") as f:
+        json.dump([str(i) for i in range(n_songs)], f)
+    with open(os.path.join(index_dir, METADATA_FILE), "w") as f:
+        json.dump(
+            [{"name": f"Song {i}", "artists": f"Artist {i % 5000}", **{c: 0.5 for c in FEATURES}} for i in range(n_songs)],
+            f,
+        )
+
+
+def build_chroma(index_dir, chroma_dir, batch_size=5000):
+    """
+    Load the synthetic catalog into a persistent Chroma collection
+    """
+    import chromadb
+
+    embeddings = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode="r")
+    with open(os.path.join(index_dir, IDS_FILE)) as f:
+        ids = json.load(f)
+    with open(os.path.join(index_dir, METADATA_FILE)) as f:
+        metadatas = json.load(f)
+
+    client = chromadb.PersistentClient(path=chroma_dir)
+    collection = client.get_or_create_collection(COLLECTION_NAME)
+    for i in range(0, len(ids), batch_size):
+        collection.add(
+            ids=ids[i:i + batch_size],
+            embeddings=np.asarray(embeddings[i:i + batch_size]).tolist(),
+            metadatas=metadatas[i:i + batch_size],
+        )
+
+
+def _measure(backend, index_dir, chroma_dir, n_queries, batch, top_k, out):
+    """
+    Subprocess body: open one backend, run queries, report latency and RSS
+    """
+    rss_before = current_rss_mb()
+    t0 = time.perf_counter()
+    if backend == "numpy":
+        index = NumpyVectorIndex.load(index_dir)
+        run = lambda q: index.query(q, top_k)
+    else:
+        import chromadb
+        collection = chromadb.PersistentClient(path=chroma_dir).get_collection(COLLECTION_NAME)
+        run = lambda q: collection.query(query_embeddings=q.tolist(), n_results=top_k, include=["metadatas", "distances"])
+    load_s = time.perf_counter() - t0
+
+    rng = np.random.default_rng(1)
+    queries = rng.standard_normal((n_queries, EMBEDDING_DIM)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    run(queries[:batch])  # warm caches / page in the index
+    latencies = []
+    for start in range(0, n_queries, batch):
+        t = time.perf_counter()
+        run(queries[start:start + batch])
+        latencies.append((time.perf_counter() - t) * 1000)
+
+    out.put({
+        "load_s": load_s,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "rss_mb": current_rss_mb() - rss_before,
+    })
+
+
+def measure(backend, index_dir, chroma_dir, n_queries, batch, top_k):
+    ctx = mp.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(target=_measure, args=(backend, index_dir, chroma_dir, n_queries, batch, top_k, out))
+    proc.start()
+    result = out.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 250000, 500000, 1000000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=1, help="Query embeddings per search call")
+    parser.add_argument("--top-k", type=int, default=15)
+    parser.add_argument("--skip-chroma", action="store_true", help="Only benchmark the NumPy backend")
+    args = parser.parse_args()
+
+    print(f"{'songs':>9} {'backend':>7} {'load s':>8} {'p50 ms':>8} {'p95 ms':>8} {'RSS MB':>8}")
+    for n_songs in args.sizes:
+        work_dir = tempfile.mkdtemp(prefix="ibmrs_bench_")
+        try:
+            build_catalog(work_dir, n_songs)
+            chroma_dir = os.path.join(work_dir, "chromadb_db")
+            backends = ["numpy"]
+            if not args.skip_chroma:
+                build_chroma(work_dir, chroma_dir)
+                backends.append("chroma")
+
+            for backend in backends:
+                r = measure(backend, work_dir, chroma_dir, args.queries, args.batch, args.top_k)
+                print(f"{n_songs:>9} {backend:>7} {r['load_s']:>8.2f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['rss_mb']:>8.1f}")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
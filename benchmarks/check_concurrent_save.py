@@ -0,0 +1,133 @@
+"""
+Reproduce two uploads saving the same new tracks at the same time
+
+Runs against the database configured in .env. Save A looks up its tracks,
+which takes its REPEATABLE READ snapshot, and is held there while save B
+inserts the same new tracks and commits. Then A continues. Both saves use
+the same updated_at, so A's INSERT ... ON DUPLICATE KEY UPDATE changes
+nothing, and only a locking read-back can see B's song rows. Exits non-zero
+if either save fails or the two playlists do not end up sharing song rows.
+Everything it creates is deleted afterwards.
+
+Usage:
+    python benchmarks/check_concurrent_save.py
+    python benchmarks/check_concurrent_save.py --tracks 50
+"""
+import argparse
+import os
+import sys
+import threading
+import uuid
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database import playlist_store
+from database.config import SessionLocal, init_db, test_connection
+from database.models import User, Playlist, PlaylistSong, Song
+from database.playlist_store import save_generated_playlist
+
+# Both saves stamp rows with the same second, as two uploads finishing together would
+FIXED_NOW = datetime(2024, 1, 1, 12, 0, 0)
+
+
+class _FrozenDatetime(datetime):
+    @classmethod
+    def utcnow(cls):
+        return FIXED_NOW
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tracks', type=int, default=15)
+    args = parser.parse_args()
+
+    if not test_connection():
+        print("✗ Cannot run check without database connection")
+        return 1
+    init_db()
+
+    run_id = uuid.uuid4().hex[:8]
+    db = SessionLocal()
+    user = User(spotify_id=f'savecheck_{run_id}', email=f'savecheck_{run_id}@example.com', display_name='Save Check')
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.close()
+
+    tracks = [
+        {'name': f'Race Song {i}', 'artist': 'Race Artist', 'uri': f'spotify:track:{run_id}{i:04d}'}
+        for i in range(args.tracks)
+    ]
+
+    # Hold save A right after its first lookup until save B has committed
+    a_looked_up = threading.Event()
+    b_committed = threading.Event()
+    lookup = playlist_store._song_ids_by_track_id
+
+    def paused_lookup(db, track_ids, lock=False):
+        result = lookup(db, track_ids, lock=lock)
+        if threading.current_thread().name == 'save-a' and not a_looked_up.is_set():
+            a_looked_up.set()
+            b_committed.wait(timeout=30)
+        return result
+
+    errors = {}
+    playlist_ids = {}
+
+    def save(label):
+        db = SessionLocal()
+        try:
+            playlist_ids[label] = save_generated_playlist(db, user_id, f'Race {label}', 'concurrent save check', None, tracks).id
+        except Exception as e:
+            errors[label] = e
+        finally:
+            db.close()
+
+    playlist_store._song_ids_by_track_id = paused_lookup
+    playlist_store.datetime = _FrozenDatetime
+    try:
+        thread_a = threading.Thread(target=save, args=('A',), name='save-a')
+        thread_a.start()
+        a_looked_up.wait(timeout=30)
+        save('B')
+        b_committed.set()
+        thread_a.join()
+
+        for label, error in sorted(errors.items()):
+            print(f"✗ Save {label} failed: {error}")
+        if errors:
+            return 1
+
+        db = SessionLocal()
+        try:
+            song_sets = {
+                label: {song_id for (song_id,) in db.query(PlaylistSong.song_id).filter(PlaylistSong.playlist_id == playlist_id)}
+                for label, playlist_id in playlist_ids.items()
+            }
+            song_rows = db.query(Song).filter(Song.spotify_track_id.like(f'{run_id}%')).count()
+        finally:
+            db.close()
+    finally:
+        playlist_store._song_ids_by_track_id = lookup
+        playlist_store.datetime = datetime
+        db = SessionLocal()
+        try:
+            db.query(Playlist).filter(Playlist.user_id == user_id).delete(synchronize_session=False)
+            db.query(Song).filter(Song.spotify_track_id.like(f'{run_id}%')).delete(synchronize_session=False)
+            db.query(User).filter(User.id == user_id).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    if song_sets['A'] != song_sets['B'] or len(song_sets['A']) != args.tracks or song_rows != args.tracks:
+        print(f"✗ Saves disagree: A has {len(song_sets['A'])} songs, B has {len(song_sets['B'])}, "
+              f"{song_rows} song rows for {args.tracks} tracks")
+        return 1
+    print(f"✓ Both saves succeeded and share the same {args.tracks} song rows")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Check that playlist listing endpoints run a fixed number of SQL queries
+
+Runs against the database configured in .env. Creates a throwaway user,
+grows their library to 1, 10 and 200 playlists (3 songs each), and counts
+the statements issued by GET /playlists and GET /api/my-playlists at each
+size. Exits non-zero if any endpoint's query count grows with the number
+of playlists. Everything it creates is deleted afterwards.
+
+Usage:
+    python benchmarks/check_query_counts.py
+    python benchmarks/check_query_counts.py --sizes 1 50 500
+"""
+import argparse
+import os
+import sys
+import uuid
+
+# Add parent and src directories to path
+_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, _root)
+sys.path.insert(0, os.path.join(_root, 'src'))
+
+from sqlalchemy import event
+
+from database.config import engine, SessionLocal, init_db, test_connection
+from database.models import User, Playlist, Song
+from database.playlist_store import save_generated_playlist
+from app import app
+
+ENDPOINTS = ['/playlists', '/api/my-playlists']
+
+
+class QueryCounter:
+    """
+    Counts statements sent to the engine while active
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, 'before_cursor_execute', self)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 200])
+    args = parser.parse_args()
+
+    if not test_connection():
+        print("✗ Cannot run check without database connection")
+        return 1
+    init_db()
+
+    run_id = uuid.uuid4().hex[:8]
+    db = SessionLocal()
+    user = User(spotify_id=f'querycheck_{run_id}', email=f'querycheck_{run_id}@example.com', display_name='Query Check')
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.close()
+
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['user_id'] = user_id
+
+    counts = {endpoint: [] for endpoint in ENDPOINTS}
+    created = 0
+    try:
+        for size in sorted(args.sizes):
+            while created < size:
+                db = SessionLocal()
+                try:
+                    tracks = [
+                        {'name': f'Check Song {i}', 'artist': 'Check Artist', 'uri': f'spotify:track:{run_id}{created}x{i}'}
+                        for i in range(3)
+                    ]
+                    save_generated_playlist(db, user_id, f'Check {created}', 'query count check', None, tracks)
+                finally:
+                    db.close()
+                created += 1
+
+            for endpoint in ENDPOINTS:
+                with QueryCounter() as counter:
+                    response = client.get(endpoint)
+                if response.status_code != 200:
+                    print(f"✗ {endpoint} returned {response.status_code}")
+                    return 1
+                counts[endpoint].append(counter.count)
+                print(f"{endpoint:>20} with {size:>4} playlists: {counter.count} queries")
+    finally:
+        db = SessionLocal()
+        try:
+            db.query(Playlist).filter(Playlist.user_id == user_id).delete(synchronize_session=False)
+            db.query(Song).filter(Song.spotify_track_id.like(f'{run_id}%')).delete(synchronize_session=False)
+            db.query(User).filter(User.id == user_id).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    failed = [endpoint for endpoint, seen in counts.items() if len(set(seen)) > 1]
+    for endpoint in failed:
+        print(f"✗ {endpoint} query count depends on playlist count: {counts[endpoint]}")
+    if not failed:
+        print("✓ Query counts are independent of playlist count")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,17 +1,46 @@
 import pandas as pd
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
 import numpy as np
+import argparse
+import hashlib
 import json
+import multiprocessing
 import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# IndexBundle lives with the search code in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+SPOTIFY_CSV = "chroma/spotify_songs.csv"
+EMBED_MODEL_NAME = "all-mpnet-base-v2"
+COLLECTION_NAME = "spotify_songs_collection"
+FEATURE_COLUMNS = ['danceability', 'energy', 'acousticness', 'liveness', 'tempo', 'valence']
+# Read features as float64 in every path: inferred per chunk, a chunk of whole-number tempos
+# would render as "120" instead of "120.0" and embed differently from a full read
+FEATURE_DTYPES = {c: "float64" for c in FEATURE_COLUMNS}
+
+EMBEDDINGS_FILE = "spotify_embeddings.npy"
+IDS_FILE = "spotify_ids.json"
+METADATA_FILE = "spotify_metadata.json"
+# Stable track ID -> content fingerprint for every row in the index, plus the model that embedded them
+MANIFEST_FILE = "spotify_manifest.json"
+# Full rebuilds fill a collection under this suffix and rename it over the live one when done
+BUILDING_SUFFIX = "_building"
 
 
 # Createds a ChromaDB persistent client, embeds spotify songs from CSV, and stores them in ChromaDB
-def initialize_chroma_db():
+# @param csv_path: Songs CSV
+# @param out_dir: Directory for spotify_embeddings.npy, spotify_ids.json, spotify_metadata.json and the manifest
+def initialize_chroma_db(csv_path=SPOTIFY_CSV, out_dir="."):
+    # Imported here so the text and manifest helpers load without torch or Chroma
+    from sentence_transformers import SentenceTransformer
+    import chromadb
+
     # Load CSV
-    spotify_data = "chroma/spotify_songs.csv"
-    df = pd.read_csv(spotify_data)
+    df = pd.read_csv(csv_path, dtype=FEATURE_DTYPES)
 
     # Expected Numeric Columns
     expected_columns = ['danceability', 'energy', 'acousticness', 'liveness', 'tempo', 'valence']
@@ -36,19 +65,32 @@ def initialize_chroma_db():
     df["text"] = df.apply(build_track_text, axis=1)
 
     # File paths for saved embeddings
-    embedding_file = "spotify_embeddings.npy"
-    ids_file= "spotify_ids.json"
-    metadata_file = "spotify_metadata.json"
+    embedding_file = os.path.join(out_dir, EMBEDDINGS_FILE)
+    ids_file = os.path.join(out_dir, IDS_FILE)
+    metadata_file = os.path.join(out_dir, METADATA_FILE)
+
+    # Per-row fingerprints of the CSV, the same ones update_chroma_db keeps, checked against the cached files' manifest
+    csv_metadatas = df[["name", "artists"] + expected_columns].to_dict(orient="records")
+    fingerprints = {str(i): row_fingerprint(text, metadata) for i, (text, metadata) in enumerate(zip(df["text"], csv_metadatas))}
 
     # Check if embeddings already exist
+    embeddings = None
     if os.path.exists(embedding_file) and os.path.exists(ids_file) and os.path.exists(metadata_file):
-        print("Loading existing embeddings...")
-        embeddings = np.load(embedding_file)
-        with open(ids_file, "r") as f:
-            ids = json.load(f)
-        with open(metadata_file, "r") as f:
-            metadatas = json.load(f)
-    else:
+        manifest = _read_manifest(out_dir)
+        # Files from a different CSV, or rows whose features changed since, would pair stale vectors with these rows
+        if (manifest and manifest.get("model") == EMBED_MODEL_NAME and manifest.get("id_scheme") == "positional"
+                and manifest["rows"] == fingerprints):
+            print("Loading existing embeddings...")
+            embeddings = np.load(embedding_file)
+            with open(ids_file, "r") as f:
+                ids = json.load(f)
+            with open(metadata_file, "r") as f:
+                metadatas = json.load(f)
+            if len(embeddings) != len(df) or len(ids) != len(df):
+                embeddings = None
+        if embeddings is None:
+            print("Existing embeddings do not match the CSV, recomputing...")
+    if embeddings is None:
         print("Creating embedding model and computing embeddings...")
         embed_model = SentenceTransformer("all-mpnet-base-v2")
         embeddings = embed_model.encode(
@@ -59,8 +101,11 @@ def initialize_chroma_db():
 
         #IDs and metadata
         ids = [str(i) for i in range(len(df))]
-        metadatas = df[["name", "artists"] + expected_columns].to_dict(orient="records")
+        metadatas = csv_metadatas
 
+    # The manifest is rewritten once the files and the collection below are both rebuilt
+    os.makedirs(out_dir, exist_ok=True)
+    _remove_manifest(out_dir)
 
     # # Embed all rows 
     # print("Embedding texts...")
@@ -70,12 +115,12 @@ def initialize_chroma_db():
     #     convert_to_numpy=True)
 
     #Save embeddings to a .npy file
-    np.save("spotify_embeddings.npy", embeddings)
+    np.save(embedding_file, embeddings)
     with open(ids_file, "w") as f:
         json.dump(ids, f)
     with open(metadata_file, "w") as f:
         json.dump(metadatas, f)
-    print("Embeddings, IDs, and metadata saved to spotify_embeddings.npy.")
+    print(f"Embeddings, IDs, and metadata saved to {embedding_file}.")
 
 
     # Create a local Chroma client and persistent directory
@@ -115,4 +160,499 @@ def initialize_chroma_db():
         print(f"Added batch {i//batch_size + 1}: records {i} to {end_idx}")
 
     # Persist DB (Note: PersistentClient auto-persists, but keeping for compatibility)
-    print("Chroma created with", len(ids), "tracks.")
\ No newline at end of file
+    _write_manifest(out_dir, fingerprints, "positional")
+    print("Chroma created with", len(ids), "tracks.")
+
+
+# Per-process model for ParallelEncoder workers
+_worker_model = None
+
+
+def _init_encode_worker(model_name, torch_threads):
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+    torch.set_num_threads(torch_threads)
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+
+def _encode_shard(texts, batch_size):
+    return _worker_model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+
+
+def _embedding_dimension():
+    return _worker_model.get_sentence_embedding_dimension()
+
+
+class ParallelEncoder:
+    """
+    SentenceTransformer encoding sharded across a pool of worker processes.
+
+    Each worker loads its own copy of the model and is limited to torch_threads
+    intra-op threads, so workers * torch_threads can match the core count
+    instead of every process fighting over all of them. encode() returns rows
+    in input order. With workers=1 encoding happens in this process.
+    """
+
+    def __init__(self, workers=1, torch_threads=None, batch_size=256, model_name=EMBED_MODEL_NAME):
+        self.workers = max(1, workers)
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.batch_size = batch_size
+        self.model_name = model_name
+        self._model = None
+        self._pool = None
+
+    def __enter__(self):
+        if self.workers == 1:
+            _init_encode_worker(self.model_name, self.torch_threads)
+            self._model = _worker_model
+        else:
+            # spawn, not fork: torch's thread pools don't survive a fork
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_encode_worker,
+                initargs=(self.model_name, self.torch_threads),
+            )
+        return self
+
+    def __exit__(self, *exc):
+        if self._pool:
+            self._pool.shutdown()
+            self._pool = None
+
+    def dimension(self):
+        if self._model is not None:
+            return self._model.get_sentence_embedding_dimension()
+        return self._pool.submit(_embedding_dimension).result()
+
+    # Encode texts, preserving their order
+    # @param texts: List of strings
+    # @return: float32 array of shape (len(texts), dimension)
+    def encode(self, texts):
+        if self._model is not None:
+            return _encode_shard(texts, self.batch_size)
+        # Several shards per worker keep every worker busy until the end of the chunk
+        shard_rows = max(1, min(self.batch_size * 4, -(-len(texts) // (self.workers * 2))))
+        shards = [texts[i:i + shard_rows] for i in range(0, len(texts), shard_rows)]
+        results = self._pool.map(_encode_shard, shards, [self.batch_size] * len(shards))
+        return np.concatenate(list(results)) if shards else np.empty((0, self.dimension()), dtype=np.float32)
+
+
+# Build the embedding text for a whole chunk at once; identical to build_track_text row by row
+# @param df: DataFrame with the FEATURE_COLUMNS
+# @return: Series of document strings
+def build_track_texts(df):
+    # map(str) rather than astype(str): pandas 3 keeps NaN as NaN under astype, where the f-string gives "nan"
+    texts = "with danceability: " + df["danceability"].map(str)
+    for column in FEATURE_COLUMNS[1:]:
+        texts = texts + f",{column}: " + df[column].map(str)
+    return texts
+
+
+# Peak resident set size so far, in MB
+# @param who: resource.RUSAGE_SELF, or RUSAGE_CHILDREN for the largest finished worker process
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+class _JsonArrayWriter:
+    """
+    Writes a JSON array one element at a time.
+    """
+
+    def __init__(self, path):
+        self._fp = open(path, "w")
+        self._fp.write("[")
+        self._first = True
+
+    def write(self, value):
+        self._fp.write(("" if self._first else ",") + json.dumps(value))
+        self._first = False
+
+    def close(self):
+        self._fp.write("]")
+        self._fp.close()
+
+
+# Replace the live collection with a fully built one
+# @param client: Chroma client holding both collections
+# @param collection: Collection built under COLLECTION_NAME + BUILDING_SUFFIX
+def _swap_in_collection(client, collection):
+    # Chroma has no atomic rename-over; the gap between delete and rename is one metadata write,
+    # and ChromaClient reopens by name when its cached handle stops working
+    try:
+        client.delete_collection(COLLECTION_NAME)
+    except Exception:
+        pass
+    collection.modify(name=COLLECTION_NAME)
+
+
+# Streams the CSV in chunks: each chunk is embedded, appended to the .npy/JSON files and added to Chroma,
+# so memory stays bounded by the chunk size rather than the catalog size. The files and the collection are
+# built beside the live ones and swapped in at the end, so search keeps working for the whole run
+# @param csv_path: Songs CSV
+# @param out_dir: Directory for spotify_embeddings.npy, spotify_ids.json and spotify_metadata.json
+# @param chroma_path: Persistent Chroma directory
+# @param chunk_rows: CSV rows read, embedded and written per chunk
+# @param batch_size: Sentences per SentenceTransformer.encode batch
+# @param chroma_batch_size: Records per Chroma add call
+# @param workers: Encoding processes (1 encodes in this process)
+# @param torch_threads: Torch threads per encoding process (defaults to cores / workers)
+# @return: Dict with rows, seconds, rows_per_second, peak_rss_mb and worker_peak_rss_mb
+def stream_chroma_db(csv_path=SPOTIFY_CSV, out_dir=".", chroma_path="./chromadb_db",
+                     chunk_rows=50000, batch_size=256, chroma_batch_size=200, workers=1, torch_threads=None):
+    header = pd.read_csv(csv_path, nrows=0)
+    for c in ["name", "artists"] + FEATURE_COLUMNS:
+        if c not in header.columns:
+            raise ValueError(f"Column '{c}' not found in the CSV.")
+
+    # A cheap single-column pass sizes the memory-mapped embedding file up front
+    total_rows = sum(len(chunk) for chunk in pd.read_csv(csv_path, usecols=[FEATURE_COLUMNS[0]], chunksize=chunk_rows))
+    print(f"Streaming {total_rows} tracks from {csv_path} in chunks of {chunk_rows}...")
+
+    with ParallelEncoder(workers=workers, torch_threads=torch_threads, batch_size=batch_size) as encoder:
+        dim = encoder.dimension()
+
+        import chromadb
+        client = chromadb.PersistentClient(path=chroma_path)
+        building_name = COLLECTION_NAME + BUILDING_SUFFIX
+        try:
+            # Leftover from an interrupted run
+            client.delete_collection(building_name)
+        except Exception:
+            pass
+        collection = client.get_or_create_collection(building_name)
+
+        os.makedirs(out_dir, exist_ok=True)
+        paths = {name: os.path.join(out_dir, name) for name in (EMBEDDINGS_FILE, IDS_FILE, METADATA_FILE)}
+        embeddings = np.lib.format.open_memmap(
+            paths[EMBEDDINGS_FILE] + ".tmp", mode="w+", dtype=np.float32, shape=(total_rows, dim)
+        )
+        ids_out = _JsonArrayWriter(paths[IDS_FILE] + ".tmp")
+        metadata_out = _JsonArrayWriter(paths[METADATA_FILE] + ".tmp")
+
+        started = time.perf_counter()
+        offset = 0
+        try:
+            for chunk in pd.read_csv(csv_path, usecols=["name", "artists"] + FEATURE_COLUMNS,
+                                     dtype=FEATURE_DTYPES, chunksize=chunk_rows):
+                documents = build_track_texts(chunk).tolist()
+                chunk_embeddings = encoder.encode(documents)
+                end = offset + len(chunk)
+                embeddings[offset:end] = chunk_embeddings
+
+                ids = [str(i) for i in range(offset, end)]
+                metadatas = chunk[["name", "artists"] + FEATURE_COLUMNS].to_dict(orient="records")
+                for track_id, metadata in zip(ids, metadatas):
+                    ids_out.write(track_id)
+                    metadata_out.write(metadata)
+
+                for i in range(0, len(ids), chroma_batch_size):
+                    collection.add(
+                        ids=ids[i:i + chroma_batch_size],
+                        embeddings=chunk_embeddings[i:i + chroma_batch_size].tolist(),
+                        metadatas=metadatas[i:i + chroma_batch_size],
+                        documents=documents[i:i + chroma_batch_size]
+                    )
+
+                offset = end
+                elapsed = time.perf_counter() - started
+                print(f"{offset}/{total_rows} tracks, {offset / elapsed:.0f} rows/s, peak RSS {peak_rss_mb():.0f} MB")
+        finally:
+            ids_out.close()
+            metadata_out.close()
+            embeddings.flush()
+            del embeddings
+
+        # A manifest left by an earlier build would no longer describe these files. None is written in its
+        # place: per-row fingerprints would cost memory per row, and with positional IDs nothing could reuse
+        # them, so the next --update rebuilds from scratch and a full build re-embeds
+        _remove_manifest(out_dir)
+        _swap_in_collection(client, collection)
+    for name, path in paths.items():
+        os.replace(path + ".tmp", path)
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "rows": offset,
+        "seconds": elapsed,
+        "rows_per_second": offset / elapsed if elapsed else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "worker_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+    print(f"Chroma created with {offset} tracks in {elapsed:.1f}s "
+          f"({stats['rows_per_second']:.0f} rows/s, peak RSS {stats['peak_rss_mb']:.0f} MB).")
+    return stats
+
+
+# Stable IDs for a chunk: the CSV's track id column when it has one, otherwise a hash of name and artists
+# @param chunk: DataFrame with name and artists (and optionally id)
+# @return: List of ID strings
+def stable_track_ids(chunk):
+    if "id" in chunk.columns:
+        return chunk["id"].astype(str).tolist()
+    keys = chunk["name"].astype(str) + "\x1f" + chunk["artists"].astype(str)
+    return [hashlib.sha1(key.encode("utf-8")).hexdigest()[:24] for key in keys]
+
+
+# Fingerprint of everything stored for a row; a row is re-embedded when this changes
+def row_fingerprint(document, metadata):
+    return hashlib.sha1((document + json.dumps(metadata, sort_keys=True)).encode("utf-8")).hexdigest()[:16]
+
+
+# Read the manifest of the index files in out_dir
+# @return: Manifest dict, or None if there is none
+def _read_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+# Atomically write the manifest for the index files in out_dir and the collection built with them
+# @param fingerprints: Track ID -> row_fingerprint for every row
+# @param id_scheme: "stable" (update_chroma_db) or "positional" (row numbers: full builds)
+def _write_manifest(out_dir, fingerprints, id_scheme):
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"model": EMBED_MODEL_NAME, "id_scheme": id_scheme, "rows": fingerprints}, f)
+    os.replace(path + ".tmp", path)
+
+
+# Drop the manifest before the files or collection it describes change. A build that dies before
+# writing its new manifest then leaves none, and the next --update rebuilds instead of trusting it
+def _remove_manifest(out_dir):
+    try:
+        os.remove(os.path.join(out_dir, MANIFEST_FILE))
+    except FileNotFoundError:
+        pass
+
+
+# CSV rows chunk by chunk, keyed on stable track IDs; repeated IDs keep their first row
+# @return: Iterator of (ids, documents, metadatas, duplicates skipped) per chunk
+def _iter_unique_rows(csv_path, columns, chunk_rows):
+    seen = set()
+    for chunk in pd.read_csv(csv_path, usecols=columns, dtype=FEATURE_DTYPES, chunksize=chunk_rows):
+        chunk_ids = stable_track_ids(chunk)
+        keep = []
+        for track_id in chunk_ids:
+            keep.append(track_id not in seen)
+            seen.add(track_id)
+        chunk = chunk[keep]
+        ids = [track_id for track_id, k in zip(chunk_ids, keep) if k]
+        metadatas = chunk[["name", "artists"] + FEATURE_COLUMNS].to_dict(orient="records")
+        yield ids, build_track_texts(chunk).tolist(), metadatas, keep.count(False)
+
+
+# Bring the .npy/JSON files and the Chroma collection in line with the CSV, embedding only new or changed rows
+# @param csv_path: Songs CSV
+# @param out_dir: Directory holding (and receiving) the index files and manifest
+# @param chroma_path: Persistent Chroma directory
+# @param chunk_rows: CSV rows processed per chunk
+# @param batch_size: Sentences per SentenceTransformer.encode batch
+# @param chroma_batch_size: Records per Chroma upsert/delete call
+# @param workers: Encoding processes (1 encodes in this process)
+# @param torch_threads: Torch threads per encoding process
+# @return: Dict with rows, added, changed, unchanged, removed and seconds
+def update_chroma_db(csv_path=SPOTIFY_CSV, out_dir=".", chroma_path="./chromadb_db",
+                     chunk_rows=50000, batch_size=256, chroma_batch_size=200, workers=1, torch_threads=None):
+    header = pd.read_csv(csv_path, nrows=0)
+    for c in ["name", "artists"] + FEATURE_COLUMNS:
+        if c not in header.columns:
+            raise ValueError(f"Column '{c}' not found in the CSV.")
+    columns = (["id"] if "id" in header.columns else []) + ["name", "artists"] + FEATURE_COLUMNS
+    started = time.perf_counter()
+
+    # Previous build: its manifest decides what can be reused, its .npy supplies the reused vectors
+    paths = {name: os.path.join(out_dir, name) for name in (EMBEDDINGS_FILE, IDS_FILE, METADATA_FILE)}
+    old_fingerprints, old_rows, old_embeddings = {}, {}, None
+    manifest = _read_manifest(out_dir)
+    if manifest is not None and all(os.path.exists(path) for path in paths.values()):
+        if manifest.get("id_scheme", "stable") != "stable":
+            print("Index was built with positional IDs (full build), rebuilding it with stable IDs")
+        elif manifest.get("model") != EMBED_MODEL_NAME:
+            print(f"Index was built with {manifest.get('model')}, re-embedding everything with {EMBED_MODEL_NAME}")
+        else:
+            old_fingerprints = manifest["rows"]
+            with open(paths[IDS_FILE]) as f:
+                old_rows = {track_id: i for i, track_id in enumerate(json.load(f))}
+            old_embeddings = np.load(paths[EMBEDDINGS_FILE], mmap_mode="r")
+    if old_embeddings is None or len(old_embeddings) != len(old_rows):
+        # No usable previous build (or files that disagree with each other): nothing is reused
+        old_fingerprints, old_rows, old_embeddings = {}, {}, None
+
+    # Sizing pass over the ID columns only; repeated IDs keep their first row
+    seen = set()
+    for chunk in pd.read_csv(csv_path, usecols=columns[:3], chunksize=chunk_rows):
+        seen.update(stable_track_ids(chunk))
+    total_rows = len(seen)
+    seen = None
+
+    stats = {"rows": 0, "added": 0, "changed": 0, "unchanged": 0, "removed": 0, "duplicates": 0}
+    fingerprints = {}
+    # Rows embedded in this run; they are written to Chroma only after the new files are in place
+    upserts = set()
+    with ParallelEncoder(workers=workers, torch_threads=torch_threads, batch_size=batch_size) as encoder:
+        dim = encoder.dimension() if old_embeddings is None else old_embeddings.shape[1]
+        # Write the new files beside the old ones and swap them in only once everything succeeded
+        os.makedirs(out_dir, exist_ok=True)
+        embeddings = np.lib.format.open_memmap(
+            paths[EMBEDDINGS_FILE] + ".tmp", mode="w+", dtype=np.float32, shape=(total_rows, dim)
+        )
+        ids_out = _JsonArrayWriter(paths[IDS_FILE] + ".tmp")
+        metadata_out = _JsonArrayWriter(paths[METADATA_FILE] + ".tmp")
+        try:
+            offset = 0
+            for ids, documents, metadatas, duplicates in _iter_unique_rows(csv_path, columns, chunk_rows):
+                stats["duplicates"] += duplicates
+                chunk_embeddings = np.empty((len(ids), dim), dtype=np.float32)
+                stale, reused, reused_from = [], [], []
+                for i, (track_id, document, metadata) in enumerate(zip(ids, documents, metadatas)):
+                    fingerprint = row_fingerprint(document, metadata)
+                    fingerprints[track_id] = fingerprint
+                    if old_fingerprints.get(track_id) == fingerprint and track_id in old_rows:
+                        reused.append(i)
+                        reused_from.append(old_rows[track_id])
+                    else:
+                        stale.append(i)
+                        stats["changed" if track_id in old_rows else "added"] += 1
+                stats["unchanged"] += len(reused)
+
+                if reused:
+                    chunk_embeddings[reused] = old_embeddings[reused_from]
+                if stale:
+                    chunk_embeddings[stale] = encoder.encode([documents[i] for i in stale])
+                    upserts.update(ids[i] for i in stale)
+
+                embeddings[offset:offset + len(ids)] = chunk_embeddings
+                for track_id, metadata in zip(ids, metadatas):
+                    ids_out.write(track_id)
+                    metadata_out.write(metadata)
+                offset += len(ids)
+                print(f"{offset}/{total_rows} tracks: {stats['added']} added, {stats['changed']} changed, "
+                      f"{stats['unchanged']} unchanged")
+        finally:
+            ids_out.close()
+            metadata_out.close()
+            embeddings.flush()
+            del embeddings
+
+    removed = [track_id for track_id in old_rows if track_id not in fingerprints]
+    stats["removed"] = len(removed)
+    stats["rows"] = len(fingerprints)
+
+    # Nothing live has been touched yet. The old manifest stops describing the files and the collection
+    # from here on, so it goes first and the new one is written only once both match the CSV
+    _remove_manifest(out_dir)
+    old_embeddings = None
+    for path in paths.values():
+        os.replace(path + ".tmp", path)
+
+    import chromadb
+    client = chromadb.PersistentClient(path=chroma_path)
+    if old_rows:
+        collection = client.get_or_create_collection(COLLECTION_NAME)
+    else:
+        # Without a manifest the live collection's IDs are unknown (e.g. positional), so build a new one beside it
+        try:
+            client.delete_collection(COLLECTION_NAME + BUILDING_SUFFIX)
+        except Exception:
+            pass
+        collection = client.get_or_create_collection(COLLECTION_NAME + BUILDING_SUFFIX)
+
+    # Second pass over the CSV (no embedding) so documents and metadata never have to be held in memory
+    embeddings = np.load(paths[EMBEDDINGS_FILE], mmap_mode="r")
+    offset = 0
+    for ids, documents, metadatas, _ in _iter_unique_rows(csv_path, columns, chunk_rows):
+        batch = [i for i, track_id in enumerate(ids) if track_id in upserts]
+        for i in batch:
+            if fingerprints.get(ids[i]) != row_fingerprint(documents[i], metadatas[i]):
+                raise ValueError(f"{csv_path} changed during the update; run it again")
+        for start in range(0, len(batch), chroma_batch_size):
+            rows = batch[start:start + chroma_batch_size]
+            collection.upsert(
+                ids=[ids[i] for i in rows],
+                embeddings=np.asarray(embeddings[[offset + i for i in rows]]).tolist(),
+                metadatas=[metadatas[i] for i in rows],
+                documents=[documents[i] for i in rows]
+            )
+        offset += len(ids)
+    del embeddings
+    for start in range(0, len(removed), chroma_batch_size):
+        collection.delete(ids=removed[start:start + chroma_batch_size])
+    if not old_rows:
+        _swap_in_collection(client, collection)
+    _write_manifest(out_dir, fingerprints, "stable")
+
+    stats["seconds"] = time.perf_counter() - started
+    print(f"Index updated in {stats['seconds']:.1f}s: {stats['added']} added, {stats['changed']} changed, "
+          f"{stats['unchanged']} unchanged, {stats['removed']} removed, {stats['duplicates']} duplicate rows skipped.")
+    return stats
+
+
+# Package the .npy/JSON index files as a versioned bundle (compact embeddings, columnar metadata, checksummed manifest)
+# @param out_dir: Directory holding the files written by a build
+# @param bundle_root: Directory receiving one subdirectory per bundle version
+# @param dtype: Stored embedding dtype, "float16" or "int8" ("float32" keeps full precision)
+# @param recall_queries: Probe queries for the quantization recall measurement (0 skips it)
+# @return: Path of the published bundle
+def export_bundle(out_dir=".", bundle_root="index_bundles", dtype="float16", recall_queries=200):
+    from IndexBundle import write_bundle
+
+    embeddings = np.load(os.path.join(out_dir, EMBEDDINGS_FILE), mmap_mode="r")
+    with open(os.path.join(out_dir, IDS_FILE)) as f:
+        ids = json.load(f)
+    with open(os.path.join(out_dir, METADATA_FILE)) as f:
+        metadatas = json.load(f)
+
+    started = time.perf_counter()
+    bundle_dir = write_bundle(bundle_root, embeddings, ids, metadatas, EMBED_MODEL_NAME,
+                              dtype=dtype, recall_queries=recall_queries)
+    with open(os.path.join(bundle_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+
+    source_bytes = sum(os.path.getsize(os.path.join(out_dir, name)) for name in (EMBEDDINGS_FILE, IDS_FILE, METADATA_FILE))
+    bundle_bytes = sum(entry["bytes"] for entry in manifest["files"].values())
+    print(f"Bundle {manifest['version']} written to {bundle_dir} in {time.perf_counter() - started:.1f}s: "
+          f"{bundle_bytes / 1e6:.1f} MB ({dtype}) vs {source_bytes / 1e6:.1f} MB of .npy/JSON")
+    if "recall" in manifest:
+        print(f"Recall@{manifest['recall']['k']} vs float32: {manifest['recall']['recall_at_k']:.4f}")
+    return bundle_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embed the songs CSV and build the Chroma collection")
+    parser.add_argument("--stream", action="store_true", help="Read, embed and write the CSV chunk by chunk")
+    parser.add_argument("--update", action="store_true",
+                        help="Only embed rows that are new or changed since the last --update build")
+    parser.add_argument("--csv", default=SPOTIFY_CSV)
+    parser.add_argument("--out-dir", default=".", help="Where the .npy/JSON index files are written")
+    parser.add_argument("--chunk-rows", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=256, help="Sentences per encode batch")
+    parser.add_argument("--workers", type=int, default=1, help="Encoding processes (with --stream or --update)")
+    parser.add_argument("--torch-threads", type=int, default=None, help="Torch threads per encoding process")
+    parser.add_argument("--bundle-dir", default=None, help="Also publish a versioned index bundle under this directory")
+    parser.add_argument("--bundle-dtype", default="float16", choices=["float32", "float16", "int8"])
+    parser.add_argument("--bundle-only", action="store_true", help="Bundle the existing --out-dir files without rebuilding")
+    args = parser.parse_args()
+    if args.bundle_only and (args.update or args.stream):
+        parser.error("--bundle-only does not rebuild; drop --update/--stream")
+    if not (args.update or args.stream or args.bundle_only) and (
+            args.workers != 1 or args.torch_threads is not None or args.chunk_rows != 50000):
+        parser.error("--workers, --torch-threads and --chunk-rows need --stream or --update")
+
+    if args.bundle_only:
+        pass
+    elif args.update:
+        update_chroma_db(args.csv, out_dir=args.out_dir, chunk_rows=args.chunk_rows, batch_size=args.batch_size,
+                         workers=args.workers, torch_threads=args.torch_threads)
+    elif args.stream:
+        stream_chroma_db(args.csv, out_dir=args.out_dir, chunk_rows=args.chunk_rows, batch_size=args.batch_size,
+                         workers=args.workers, torch_threads=args.torch_threads)
+    else:
+        initialize_chroma_db(args.csv, out_dir=args.out_dir)
+
+    if args.bundle_dir or args.bundle_only:
+        export_bundle(args.out_dir, args.bundle_dir or "index_bundles", dtype=args.bundle_dtype)
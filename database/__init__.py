@@ -11,7 +11,7 @@ from database.config import (
     drop_db,
     test_connection
 )
-from database.models import User, Playlist, Song, PlaylistSong
+from database.models import User, Playlist, Song, PlaylistSong, PipelineCacheEntry, PlaylistJob, TrackLookup
 
 __all__ = [
     'engine',
@@ -25,5 +25,8 @@ __all__ = [
     'User',
     'Playlist',
     'Song',
-    'PlaylistSong'
+    'PlaylistSong',
+    'PipelineCacheEntry',
+    'PlaylistJob',
+    'TrackLookup'
 ]
@@ -58,7 +58,7 @@ def init_db():
     """
     Initialize database - create all tables
     """
-    from database.models import User, Playlist, Song, PlaylistSong
+    from database.models import User, Playlist, Song, PlaylistSong, PipelineCacheEntry, PlaylistJob, TrackLookup
     Base.metadata.create_all(bind=engine)
     print("✓ Database tables created successfully")
 
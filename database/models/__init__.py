@@ -5,5 +5,8 @@ from database.models.user import User
 from database.models.playlist import Playlist
 from database.models.song import Song
 from database.models.playlist_song import PlaylistSong
+from database.models.pipeline_cache_entry import PipelineCacheEntry
+from database.models.playlist_job import PlaylistJob
+from database.models.track_lookup import TrackLookup
 
-__all__ = ['User', 'Playlist', 'Song', 'PlaylistSong']
+__all__ = ['User', 'Playlist', 'Song', 'PlaylistSong', 'PipelineCacheEntry', 'PlaylistJob', 'TrackLookup']
@@ -0,0 +1,61 @@
+"""
+PipelineCacheEntry model for Toonify application
+Cached AI pipeline results keyed on a perceptual hash of the uploaded image
+"""
+from sqlalchemy import Column, Integer, Text, DateTime
+from sqlalchemy.dialects.mysql import CHAR, BIGINT
+from database.config import Base
+import uuid
+import json
+from datetime import datetime
+
+
+class PipelineCacheEntry(Base):
+    __tablename__ = 'pipeline_cache_entries'
+
+    # Primary key
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+
+    # 64-bit difference hash of the image; near-duplicates differ in a few bits
+    image_hash = Column(BIGINT(unsigned=True), nullable=False, index=True, comment='64-bit perceptual hash of the uploaded image')
+
+    # Pipeline stage outputs
+    description = Column(Text, nullable=True)
+    keywords = Column(Text, nullable=True)
+    playlist_values = Column(Text, nullable=True)
+    songs = Column(Text, nullable=False, comment='JSON list of songs returned by the search stage')
+    descriptors = Column(Text, nullable=False, comment='JSON list of playlist descriptors')
+
+    # Usage
+    hit_count = Column(Integer, default=0, nullable=False)
+
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<PipelineCacheEntry(id={self.id}, image_hash={self.image_hash:016x}, expires_at={self.expires_at})>"
+
+    def is_expired(self):
+        """
+        Check if the cached result is past its TTL
+
+        Returns:
+            bool: True if expired
+        """
+        return self.expires_at <= datetime.utcnow()
+
+    def to_result(self):
+        """
+        Convert entry back to the dict returned by LlamaClient.run_stages
+
+        Returns:
+            dict: Pipeline result
+        """
+        return {
+            'description': self.description,
+            'keywords': self.keywords,
+            'playlist_values': self.playlist_values,
+            'songs': json.loads(self.songs),
+            'descriptors': json.loads(self.descriptors)
+        }
@@ -2,13 +2,41 @@
 Playlist model for Toonify application
 User-created playlists
 """
-from sqlalchemy import Column, String, Text, Boolean, DateTime, ForeignKey, func
+from sqlalchemy import Column, String, Text, Boolean, Integer, DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.mysql import CHAR
 from database.config import Base
+import re
 import uuid
 from datetime import datetime
 
+# Thumbnail sizes (shorter edge in pixels) written next to each content-addressed cover
+# as <sha256>_<size>.jpg, and the fingerprinted, immutably cached route serving them
+COVER_THUMBNAIL_SIZES = (160, 320, 640)
+COVER_VARIANT_URL_PREFIX = '/covers'
+_CONTENT_ADDRESSED_COVER = re.compile(r'/([0-9a-f]{64})\.jpg$')
+
+
+def cover_variant_urls(cover_image):
+    """
+    Get fingerprinted URLs for a cover image URL
+
+    Args:
+        cover_image (str): Playlist.cover_image value
+
+    Returns:
+        dict: 'original' plus one URL per size in COVER_THUMBNAIL_SIZES,
+              or None if there is no cover or it predates content addressing
+    """
+    match = _CONTENT_ADDRESSED_COVER.search(cover_image or '')
+    if not match:
+        return None
+    digest = match.group(1)
+    variants = {'original': f"{COVER_VARIANT_URL_PREFIX}/{digest}.jpg"}
+    for size in COVER_THUMBNAIL_SIZES:
+        variants[str(size)] = f"{COVER_VARIANT_URL_PREFIX}/{digest}_{size}.jpg"
+    return variants
+
 
 class Playlist(Base):
     __tablename__ = 'playlists'
@@ -21,6 +49,7 @@ class Playlist(Base):
     description = Column(Text, nullable=True)
     is_public = Column(Boolean, default=False, nullable=False)
     cover_image = Column(Text, nullable=True)
+    song_count = Column(Integer, default=0, server_default='0', nullable=False, comment='Number of playlist_songs rows, maintained on insert/delete')
 
     # Foreign key to User
     user_id = Column(CHAR(36), ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
@@ -35,6 +64,12 @@ class Playlist(Base):
     songs = relationship('Song', secondary='playlist_songs', back_populates='playlists', overlaps="playlist_songs")
     playlist_songs = relationship('PlaylistSong', back_populates='playlist', cascade='all, delete-orphan', overlaps="songs")
 
+    # A user's live playlists, newest first, as one index range scan
+    # (InnoDB appends the primary key, so the (created_at, id) keyset tie-break is covered too)
+    __table_args__ = (
+        Index('idx_user_deleted_created', 'user_id', 'deleted_at', 'created_at'),
+    )
+
     def __repr__(self):
         return f"<Playlist(id={self.id}, name={self.name}, user_id={self.user_id})>"
 
@@ -45,7 +80,19 @@ class Playlist(Base):
         Returns:
             int: Number of songs
         """
-        return len(self.songs)
+        if self.song_count is not None:
+            return self.song_count
+        # Not flushed yet: count the association rows added so far, without lazy-loading them
+        return len(self.__dict__.get('playlist_songs', ()))
+
+    def get_cover_variants(self):
+        """
+        Get fingerprinted URLs of the cover and its thumbnails
+
+        Returns:
+            dict: See cover_variant_urls()
+        """
+        return cover_variant_urls(self.cover_image)
 
     def to_dict(self, include_songs=False):
         """
@@ -63,6 +110,7 @@ class Playlist(Base):
             'description': self.description,
             'is_public': self.is_public,
             'cover_image': self.cover_image,
+            'cover_variants': self.get_cover_variants(),
             'user_id': self.user_id,
             'song_count': self.get_song_count(),
             'created_at': self.created_at.isoformat() if self.created_at else None,
@@ -0,0 +1,71 @@
+"""
+PlaylistJob model for Toonify application
+Background jobs that turn an uploaded image into a playlist
+"""
+from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey
+from sqlalchemy.dialects.mysql import CHAR
+from database.config import Base
+import uuid
+import json
+from datetime import datetime
+
+
+class PlaylistJob(Base):
+    __tablename__ = 'playlist_jobs'
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+
+    # Primary key
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+
+    # Owner (nullable so uploads without a database user can still be tracked)
+    user_id = Column(CHAR(36), ForeignKey('users.id', ondelete='CASCADE'), nullable=True, index=True)
+
+    # Job state
+    status = Column(String(20), default=STATUS_QUEUED, nullable=False, index=True)
+    stage = Column(String(100), nullable=True, comment='Human readable description of the current step')
+    progress = Column(Integer, default=0, nullable=False, comment='Completion percentage (0-100)')
+    result = Column(Text, nullable=True, comment='JSON response body once the job succeeds')
+    error = Column(Text, nullable=True)
+    http_status = Column(Integer, nullable=True, comment='HTTP status the synchronous endpoint would have returned')
+
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<PlaylistJob(id={self.id}, status={self.status}, progress={self.progress})>"
+
+    def is_finished(self):
+        """
+        Check if the job has reached a terminal state
+
+        Returns:
+            bool: True if succeeded or failed
+        """
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
+
+    def to_dict(self):
+        """
+        Convert job to dictionary
+
+        Returns:
+            dict: Job data
+        """
+        return {
+            'id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': self.progress,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'http_status': self.http_status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
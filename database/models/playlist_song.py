@@ -2,7 +2,7 @@
 PlaylistSong association table for Toonify application
 Many-to-many relationship between Playlists and Songs
 """
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, UniqueConstraint, Index
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, UniqueConstraint, Index, event, update
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.mysql import CHAR
 from database.config import Base
@@ -93,3 +93,25 @@ class PlaylistSong(Base):
                 'cover_image': self.playlist.cover_image
             }
         return data
+
+
+def _adjust_song_count(connection, playlist_id, delta):
+    from database.models.playlist import Playlist
+    connection.execute(
+        update(Playlist.__table__)
+        .where(Playlist.__table__.c.id == playlist_id)
+        .values(song_count=Playlist.__table__.c.song_count + delta)
+    )
+
+
+# Keep playlists.song_count in step with ORM inserts/deletes of playlist_songs.
+# Core bulk statements bypass these hooks and must update song_count themselves
+# (see database/playlist_store.py); database/scripts/repair_song_counts.py fixes drift.
+@event.listens_for(PlaylistSong, 'after_insert')
+def _playlist_song_inserted(mapper, connection, target):
+    _adjust_song_count(connection, target.playlist_id, 1)
+
+
+@event.listens_for(PlaylistSong, 'after_delete')
+def _playlist_song_deleted(mapper, connection, target):
+    _adjust_song_count(connection, target.playlist_id, -1)
@@ -0,0 +1,56 @@
+"""
+TrackLookup model for Toonify application
+Cached (title, artist) -> Spotify track URI resolutions, including misses
+"""
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.dialects.mysql import CHAR
+from database.config import Base
+import uuid
+from datetime import datetime
+
+
+class TrackLookup(Base):
+    __tablename__ = 'track_lookups'
+
+    # Primary key
+    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+
+    # SHA-256 of the normalized "title|artist" pair
+    lookup_key = Column(CHAR(64), unique=True, nullable=False, index=True, comment='SHA-256 of the normalized title and artist')
+    normalized_title = Column(String(500), nullable=False)
+    normalized_artist = Column(String(500), nullable=False)
+
+    # Resolution (NULL means Spotify search found nothing)
+    spotify_uri = Column(String(255), nullable=True, comment='Spotify track URI, NULL for a negative result')
+
+    # Timestamps
+    resolved_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<TrackLookup(title={self.normalized_title}, artist={self.normalized_artist}, uri={self.spotify_uri})>"
+
+    def is_negative(self):
+        """
+        Check if this lookup recorded that no track was found
+
+        Returns:
+            bool: True if Spotify returned no match
+        """
+        return self.spotify_uri is None
+
+    def to_dict(self):
+        """
+        Convert lookup to dictionary
+
+        Returns:
+            dict: TrackLookup data
+        """
+        return {
+            'id': self.id,
+            'normalized_title': self.normalized_title,
+            'normalized_artist': self.normalized_artist,
+            'spotify_uri': self.spotify_uri,
+            'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
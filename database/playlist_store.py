@@ -0,0 +1,228 @@
+"""
+Bulk persistence for generated playlists, and the queries that list them
+"""
+import uuid
+from datetime import datetime
+from sqlalchemy import insert, and_, or_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import selectinload
+from database.models import Playlist, Song, PlaylistSong
+from database.models.playlist import cover_variant_urls
+
+# Artist stored on songs saved without one
+UNKNOWN_ARTIST = 'Unknown Artist'
+
+
+def dedupe_tracks(tracks):
+    """
+    Drop repeated track URIs, keeping the first occurrence
+
+    Args:
+        tracks (list): Track dicts with 'name', 'artist' and 'uri'
+
+    Returns:
+        list: Unique tracks in their original order
+    """
+    seen_uris = set()
+    unique_tracks = []
+    for track in tracks:
+        if track['uri'] not in seen_uris:
+            seen_uris.add(track['uri'])
+            unique_tracks.append(track)
+    return unique_tracks
+
+
+def spotify_track_id_from_uri(uri):
+    """
+    Extract the Spotify track ID from a URI (format: spotify:track:TRACK_ID)
+
+    Returns:
+        str: Track ID, or None if the URI has no ID segment
+    """
+    return uri.split(':')[-1] if ':' in uri else None
+
+
+def _song_ids_by_track_id(db, track_ids, lock=False):
+    if not track_ids:
+        return {}
+    query = db.query(Song.spotify_track_id, Song.id).filter(Song.spotify_track_id.in_(track_ids))
+    if lock:
+        # A locking read sees the latest committed rows, not the transaction's snapshot
+        query = query.with_for_update(read=True)
+    return {track_id: song_id for track_id, song_id in query.all()}
+
+
+def save_generated_playlist(db, user_id, name, description, cover_image, tracks, is_public=False):
+    """
+    Save a playlist, its songs and their order in a single transaction
+
+    Songs are matched on spotify_track_id with one IN (...) lookup, missing
+    ones are written with one multi-row INSERT ... ON DUPLICATE KEY UPDATE
+    (so a concurrent upload of the same track cannot violate the unique
+    constraint) and read back with a shared-lock SELECT so the winning row's
+    ID is used, and playlist_songs rows are inserted in one batch with
+    the playlist's song_count set to match.
+
+    Args:
+        db: SQLAlchemy session (committed on success, rolled back on error)
+        user_id (str): Owner of the playlist
+        name (str): Playlist name
+        description (str): Playlist description
+        cover_image (str): Cover image URL
+        tracks (list): Track dicts with 'name', 'artist' and 'uri', in playlist order
+        is_public (bool): Public/private flag
+
+    Returns:
+        Playlist: The saved playlist
+    """
+    unique_tracks = dedupe_tracks(tracks)
+    now = datetime.utcnow()
+
+    try:
+        track_ids = [spotify_track_id_from_uri(t['uri']) for t in unique_tracks]
+        known = _song_ids_by_track_id(db, [tid for tid in track_ids if tid])
+
+        song_ids = []
+        new_rows = []
+        new_track_ids = []
+        for track, track_id in zip(unique_tracks, track_ids):
+            song_id = known.get(track_id) if track_id else None
+            if song_id is None:
+                song_id = str(uuid.uuid4())
+                new_rows.append({
+                    'id': song_id,
+                    'spotify_track_id': track_id,
+                    'title': track['name'],
+                    'artist': track.get('artist') or UNKNOWN_ARTIST,
+                    'audio_url': track['uri'],
+                    'created_at': now,
+                    'updated_at': now
+                })
+                if track_id:
+                    new_track_ids.append(track_id)
+                    # Same track twice under different URIs shares one song row
+                    known[track_id] = song_id
+            song_ids.append(song_id)
+
+        if new_rows:
+            stmt = mysql_insert(Song).values(new_rows)
+            stmt = stmt.on_duplicate_key_update(updated_at=stmt.inserted.updated_at)
+            db.execute(stmt)
+
+            # Rows another transaction inserted first kept their own IDs; read them back.
+            # Under REPEATABLE READ a plain SELECT would reuse the snapshot from the lookup above
+            # and miss a row committed since (the upsert changes nothing when updated_at is equal
+            # to the second), leaving our unused uuid to fail the playlist_songs foreign key
+            winners = _song_ids_by_track_id(db, new_track_ids, lock=True)
+            song_ids = [
+                winners.get(track_id, song_id) if track_id else song_id
+                for song_id, track_id in zip(song_ids, track_ids)
+            ]
+
+        # The bulk insert below skips the PlaylistSong ORM hooks, so song_count is set up front
+        playlist_song_ids = list(dict.fromkeys(song_ids))
+        playlist = Playlist(
+            name=name,
+            description=description,
+            is_public=is_public,
+            cover_image=cover_image,
+            user_id=user_id,
+            song_count=len(playlist_song_ids)
+        )
+        db.add(playlist)
+        db.flush()
+
+        link_rows = []
+        for song_id in playlist_song_ids:
+            link_rows.append({
+                'id': str(uuid.uuid4()),
+                'playlist_id': playlist.id,
+                'song_id': song_id,
+                'order': len(link_rows),
+                'added_at': now
+            })
+        if link_rows:
+            db.execute(insert(PlaylistSong), link_rows)
+
+        db.commit()
+        return playlist
+    except Exception:
+        db.rollback()
+        raise
+
+
+def list_playlist_summaries(db, user_id):
+    """
+    Get every live playlist of a user for the playlists page, newest first
+
+    One query on playlists alone; song_count is kept on the row.
+
+    Args:
+        db: Database session
+        user_id (str): Owner of the playlists
+
+    Returns:
+        list: Dicts with id, name, description, song_count, cover_image,
+              cover_variants and created_at
+    """
+    rows = (
+        db.query(
+            Playlist.id,
+            Playlist.name,
+            Playlist.description,
+            Playlist.cover_image,
+            Playlist.created_at,
+            Playlist.song_count,
+        )
+        .filter(Playlist.user_id == user_id, Playlist.deleted_at.is_(None))
+        .order_by(Playlist.created_at.desc())
+        .all()
+    )
+    return [
+        {
+            'id': playlist_id,
+            'name': name,
+            'description': description,
+            'song_count': song_count,
+            'cover_image': cover_image,
+            'cover_variants': cover_variant_urls(cover_image),
+            'created_at': created_at.isoformat() if created_at else None
+        }
+        for playlist_id, name, description, cover_image, created_at, song_count in rows
+    ]
+
+
+def get_playlist_page(db, user_id, limit, after=None, include_songs=True):
+    """
+    Get one keyset page of a user's live playlists, newest first
+
+    Pages on (created_at, id) descending and fetches one extra row to tell
+    whether there is a next page. With include_songs, songs are batch-loaded
+    for the whole page instead of per playlist.
+
+    Args:
+        db: Database session
+        user_id (str): Owner of the playlists
+        limit (int): Playlists per page
+        after (tuple): (created_at, id) of the last playlist on the previous page, or None for the first page
+        include_songs (bool): Whether to load each playlist's songs
+
+    Returns:
+        tuple: (list of Playlist on this page, True if there is a next page)
+    """
+    query = (
+        db.query(Playlist)
+        .filter(Playlist.user_id == user_id, Playlist.deleted_at.is_(None))
+        .order_by(Playlist.created_at.desc(), Playlist.id.desc())
+    )
+    if after:
+        after_created_at, after_id = after
+        query = query.filter(or_(
+            Playlist.created_at < after_created_at,
+            and_(Playlist.created_at == after_created_at, Playlist.id < after_id),
+        ))
+    if include_songs:
+        query = query.options(selectinload(Playlist.playlist_songs).selectinload(PlaylistSong.song))
+
+    rows = query.limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
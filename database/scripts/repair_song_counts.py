@@ -0,0 +1,88 @@
+"""
+Script to backfill and repair playlists.song_count
+
+Adds the song_count column to an existing playlists table if it is missing,
+then recomputes every playlist's count from playlist_songs. Run with --check
+to only report playlists whose stored count has drifted.
+"""
+import sys
+import os
+import argparse
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from sqlalchemy import inspect, text
+from database.config import engine, test_connection
+
+ACTUAL_COUNTS_SQL = """
+    SELECT p.id, p.song_count, COUNT(ps.id) AS actual
+    FROM playlists p
+    LEFT JOIN playlist_songs ps ON ps.playlist_id = p.id
+    GROUP BY p.id, p.song_count
+    HAVING p.song_count <> COUNT(ps.id)
+"""
+
+REPAIR_SQL = """
+    UPDATE playlists p
+    SET song_count = (SELECT COUNT(*) FROM playlist_songs ps WHERE ps.playlist_id = p.id)
+"""
+
+
+def repair_song_counts(check_only=False):
+    """
+    Add the song_count column if needed and recompute it from playlist_songs
+
+    Args:
+        check_only (bool): Report mismatches without writing
+
+    Returns:
+        bool: True on success (with check_only, True only if nothing has drifted)
+    """
+    print("Checking playlist song counts...\n")
+
+    if not test_connection():
+        print("✗ Cannot proceed without database connection")
+        return False
+
+    try:
+        columns = {column['name'] for column in inspect(engine).get_columns('playlists')}
+        with engine.begin() as connection:
+            if 'song_count' not in columns:
+                if check_only:
+                    print("✗ playlists.song_count column is missing")
+                    return False
+                connection.execute(text(
+                    "ALTER TABLE playlists ADD COLUMN song_count INT NOT NULL DEFAULT 0 "
+                    "COMMENT 'Number of playlist_songs rows, maintained on insert/delete'"
+                ))
+                print("✓ Added playlists.song_count column")
+
+            mismatches = connection.execute(text(ACTUAL_COUNTS_SQL)).fetchall()
+            for playlist_id, stored, actual in mismatches[:20]:
+                print(f"  {playlist_id}: stored {stored}, actual {actual}")
+            if len(mismatches) > 20:
+                print(f"  ... and {len(mismatches) - 20} more")
+            print(f"✓ {len(mismatches)} playlist(s) with a stale song_count")
+
+            if check_only:
+                return not mismatches
+
+            if mismatches:
+                connection.execute(text(REPAIR_SQL))
+                print("✓ Recomputed song_count for all playlists")
+
+        print("\n✓ Song counts are up to date!\n")
+        return True
+
+    except Exception as e:
+        print(f"\n✗ Error repairing song counts: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill and repair playlists.song_count")
+    parser.add_argument('--check', action='store_true', help="Only report playlists whose count has drifted")
+    args = parser.parse_args()
+    success = repair_song_counts(check_only=args.check)
+    sys.exit(0 if success else 1)
@@ -1,44 +1,284 @@
-import chromadb as chroma
 import os
-from sentence_transformers import SentenceTransformer
+import threading
+import time
+import numpy as np
+from config import (
+    SEARCH_BACKEND,
+    NUMPY_INDEX_DIR,
+    INDEX_BUNDLE_ROOT,
+    INDEX_RELOAD_INTERVAL_SECONDS,
+    INDEX_RELOAD_VERIFY,
+    FEATURE_INDEX_CSV,
+    FEATURE_WEIGHTS,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_CACHE_DECIMALS,
+)
+from VectorIndex import NumpyVectorIndex
+from IndexReloader import ReloadingIndex
+from FeatureIndex import FeatureIndex, parse_feature_values, parse_feature_weights
+from EmbeddingCache import EmbeddingCache, canonicalize_query
 
 
-# Load the same embedding model used during initialization
-embed_model = SentenceTransformer("all-mpnet-base-v2")
+# Same embedding model used during initialization
+EMBED_MODEL_NAME = "all-mpnet-base-v2"
+
+# Use the same persistent client path as chromaInit.py
+CHROMA_DB_PATH = os.path.join(os.path.dirname(__file__), "..", "chromadb_db")
+CHROMA_COLLECTION_NAME = "spotify_songs_collection"
+
+# Seconds between health checks of the cached collection handle
+HEALTH_CHECK_INTERVAL_SECONDS = 30
+
+_embed_model_lock = threading.Lock()
+_embed_model = None
+
+# Query embeddings keyed on canonicalized feature JSON
+embedding_cache = EmbeddingCache(max_size=EMBEDDING_CACHE_SIZE)
+
+_collection_lock = threading.Lock()
+_collection = None
+_collection_pid = None
+_collection_checked_at = 0.0
+
+_numpy_index_lock = threading.Lock()
+_numpy_index = None
+
+# Versioned bundles under INDEX_BUNDLE_ROOT, swapped in as they are published
+_index_reloader = ReloadingIndex(INDEX_BUNDLE_ROOT, model_name=EMBED_MODEL_NAME, verify=INDEX_RELOAD_VERIFY) if INDEX_BUNDLE_ROOT else None
+
+_feature_index_lock = threading.Lock()
+_feature_index = None
+
+
+# Get the process-wide embedding model, loading it on first use
+# @return: SentenceTransformer instance
+def get_embed_model():
+    global _embed_model
+
+    with _embed_model_lock:
+        if _embed_model is None:
+            # Imported here so scripts that never embed don't pay for torch
+            from sentence_transformers import SentenceTransformer
+            _embed_model = SentenceTransformer(EMBED_MODEL_NAME)
+        return _embed_model
+
+
+# Load the embedding model and search backend ahead of the first request
+# @return: Dict of timings in seconds: 'model_load', 'first_encode', 'backend_open'
+def warmup():
+    timings = {}
+    if SEARCH_BACKEND != "features":
+        t0 = time.perf_counter()
+        model = get_embed_model()
+        timings["model_load"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        model.encode(["with danceability: 0.5,energy: 0.5"], convert_to_numpy=True)
+        timings["first_encode"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    if SEARCH_BACKEND == "numpy":
+        get_numpy_index()
+    elif SEARCH_BACKEND == "features":
+        get_feature_index()
+    else:
+        get_collection()
+    timings["backend_open"] = time.perf_counter() - t0
+    return timings
+
+
+# Open a fresh client and collection handle
+# @return: The spotify songs collection
+def _open_collection():
+    import chromadb as chroma
+
+    client = chroma.PersistentClient(path=CHROMA_DB_PATH)
+    return client.get_collection(name=CHROMA_COLLECTION_NAME)
+
+
+# Check that a collection handle can still talk to the underlying store
+# @param collection: The collection handle to check
+# @return: True if the handle answered a cheap query
+def _is_healthy(collection):
+    try:
+        collection.count()
+        return True
+    except Exception as e:
+        print(f"⚠️  Chroma collection health check failed: {e}")
+        return False
+
+
+# Get the process-wide collection handle, opening it once per worker
+# @param force_reopen: Drop the cached handle and open a new one
+# @return: The spotify songs collection
+def get_collection(force_reopen=False):
+    global _collection, _collection_pid, _collection_checked_at
+
+    with _collection_lock:
+        now = time.time()
+        # A forked worker must not reuse the parent's SQLite/HNSW handles
+        if _collection is not None and _collection_pid != os.getpid():
+            force_reopen = True
+
+        if (
+            _collection is not None
+            and not force_reopen
+            and now - _collection_checked_at > HEALTH_CHECK_INTERVAL_SECONDS
+        ):
+            if _is_healthy(_collection):
+                _collection_checked_at = now
+            else:
+                force_reopen = True
+
+        if _collection is None or force_reopen:
+            _collection = _open_collection()
+            _collection_pid = os.getpid()
+            _collection_checked_at = now
+
+        return _collection
+
+
+# Embed query texts, reusing cached embeddings for equivalent feature JSON
+# @param query_texts: List of text inputs to embed
+# @return: Array of shape (n_queries, dim)
+def embed_queries(query_texts):
+    # The canonical form is only a cache key; the model always embeds the original text, so caching
+    # never changes what is retrieved. With the cache disabled only identical texts share an embedding
+    if embedding_cache.max_size > 0:
+        keys = [canonicalize_query(text, EMBEDDING_CACHE_DECIMALS) for text in query_texts]
+    else:
+        keys = list(query_texts)
+    embeddings = [embedding_cache.get(key) for key in keys]
+
+    # Encode each distinct missing key once, in a single batch, from the first text that produced it
+    missing = {}
+    for key, text, embedding in zip(keys, query_texts, embeddings):
+        if embedding is None:
+            missing.setdefault(key, text)
+    if missing:
+        encoded = get_embed_model().encode(list(missing.values()), convert_to_numpy=True)
+        fresh = dict(zip(missing, encoded))
+        for key, embedding in fresh.items():
+            embedding_cache.put(key, embedding)
+        embeddings = [fresh[key] if embedding is None else embedding for key, embedding in zip(keys, embeddings)]
+
+    return np.stack(embeddings)
+
+
+# Load the first bundle generation and start watching for new ones, once per process
+# New generations are picked up by the watcher thread only, so queries never wait on a reload
+# @return: The process-wide ReloadingIndex
+def _get_index_reloader():
+    _index_reloader.start(INDEX_RELOAD_INTERVAL_SECONDS)
+    return _index_reloader
+
+
+# Get the process-wide memory-mapped NumPy index, loading it on first use
+# With INDEX_BUNDLE_ROOT set this is an unpinned snapshot of the generation now serving: a reload may swap
+# it out at any time, so use it only for loading and inspection and run every query through search_embeddings
+# @return: NumpyVectorIndex over the files written by chromaInit.py, or the bundle generation now serving
+def get_numpy_index():
+    global _numpy_index
+
+    if _index_reloader is not None:
+        with _get_index_reloader().acquire() as index:
+            return index
+
+    with _numpy_index_lock:
+        if _numpy_index is None:
+            _numpy_index = NumpyVectorIndex.load(NUMPY_INDEX_DIR)
+        return _numpy_index
+
+
+# Get the process-wide audio-feature KD-tree, building it on first use
+# @return: FeatureIndex over the numeric columns of the songs CSV
+def get_feature_index():
+    global _feature_index
+
+    with _feature_index_lock:
+        if _feature_index is None:
+            _feature_index = FeatureIndex.from_csv(FEATURE_INDEX_CSV, parse_feature_weights(FEATURE_WEIGHTS))
+        return _feature_index
+
+
+# Run a nearest-neighbour query on the Chroma collection
+# @param query_embeddings: Array of shape (n_queries, dim)
+# @param top_k: Number of results per query
+# @return: Chroma query result dict
+def _query_collection(query_embeddings, top_k):
+    try:
+        return get_collection().query(
+            query_embeddings=query_embeddings.tolist(),
+            n_results=top_k,
+            include=["metadatas", "distances"]
+        )
+    except Exception as e:
+        # The cached handle may have gone stale; reopen once and retry
+        print(f"⚠️  Chroma query failed, reopening collection: {e}")
+        return get_collection(force_reopen=True).query(
+            query_embeddings=query_embeddings.tolist(),
+            n_results=top_k,
+            include=["metadatas", "distances"]
+        )
+
+
+# Run a nearest-neighbour query on the configured search backend
+# @param query_embeddings: Array of shape (n_queries, dim)
+# @param top_k: Number of results per query
+# @param backend: "chroma" or "numpy"; defaults to SEARCH_BACKEND
+# @return: Dict with 'ids', 'distances' and 'metadatas', one inner list per query
+def search_embeddings(query_embeddings, top_k=5, backend=None):
+    backend = backend or SEARCH_BACKEND
+    if backend == "numpy":
+        if _index_reloader is not None:
+            # Pinned for the whole query, so a swap mid-search neither changes nor unmaps this generation
+            with _get_index_reloader().acquire() as index:
+                return index.query(query_embeddings, top_k)
+        return get_numpy_index().query(query_embeddings, top_k)
+    if backend == "chroma":
+        return _query_collection(query_embeddings, top_k)
+    raise ValueError(f"Unknown search backend: {backend}")
+
+
+# Convert stored song metadata to the song dict returned to callers
+# @param metadata: Metadata dict stored alongside the embedding
+# @return: Song dict
+def _format_song(metadata):
+    return {
+        "name": metadata["name"],
+        "artists": metadata["artists"],
+        "danceability": metadata.get("danceability"),
+        "energy": metadata.get("energy"),
+        "acousticness": metadata.get("acousticness"),
+        "liveness": metadata.get("liveness"),
+        "valence": metadata.get("valence"),
+        "tempo": metadata.get("tempo")
+    }
+
 
 # Query function to get playlist from ChromaDB
 # @param query_text: The text input to be embedded and queried
 # @param top_k: Number of top results to return
 # @return: List of songs with their metadata
 def query_chroma(query_text, top_k=5):
-    # Use the same persistent client path as chromaInit.py
-    db_path = os.path.join(os.path.dirname(__file__), "..", "chromadb_db")
-    client = chroma.PersistentClient(path=db_path)
-    collection = client.get_collection(name="spotify_songs_collection")
-
-    # Embed the query text using the same model as initialization
-    query_embedding = embed_model.encode([query_text], convert_to_numpy=True)
-
-    results = collection.query(
-        query_embeddings=query_embedding.tolist(),
-        n_results=top_k,
-        include=["metadatas", "distances"]
-    )
-
-    playlist = []
-    # results is a dict with keys: 'ids', 'distances', 'metadatas', 'embeddings', 'documents'
-    # metadatas is a list of lists, where each inner list contains metadata dicts
-    for metadata in results['metadatas'][0]:  # [0] because we queried with one query text
-        song_info = {
-            "name": metadata["name"],
-            "artists": metadata["artists"],
-            "danceability": metadata.get("danceability"),
-            "energy": metadata.get("energy"),
-            "acousticness": metadata.get("acousticness"),
-            "liveness": metadata.get("liveness"),
-            "valence": metadata.get("valence"),
-            "tempo": metadata.get("tempo")
-        }
-        playlist.append(song_info)
-
-    return playlist
\ No newline at end of file
+    return query_chroma_batch([query_text], top_k)[0]
+
+
+# Batched variant of query_chroma
+# @param query_texts: List of text inputs to be embedded and queried
+# @param top_k: Number of top results to return per query
+# @return: List of playlists, one list of songs per query text
+def query_chroma_batch(query_texts, top_k=5):
+    if SEARCH_BACKEND == "features":
+        # The query is already six numbers; search them directly instead of embedding the JSON
+        results = get_feature_index().query([parse_feature_values(text) for text in query_texts], top_k)
+        return [[_format_song(metadata) for metadata in metadatas] for metadatas in results['metadatas']]
+
+    # Embed the query texts using the same model as initialization
+    query_embeddings = embed_queries(list(query_texts))
+
+    results = search_embeddings(query_embeddings, top_k)
+
+    # results is a dict with keys: 'ids', 'distances', 'metadatas'
+    # metadatas is a list of lists, one inner list of metadata dicts per query
+    return [[_format_song(metadata) for metadata in metadatas] for metadatas in results['metadatas']]
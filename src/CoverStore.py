@@ -0,0 +1,174 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import time
+
+
+# Stored covers are named <sha256>.jpg and their thumbnails <sha256>_<size>.jpg;
+# nothing else in the directory is ever garbage-collected
+COVER_NAME_RE = re.compile(r"^(?P<digest>[0-9a-f]{64})(?:_(?P<size>\d+))?\.jpg$")
+PARTIAL_SUFFIX = ".part"
+
+
+class _HashingWriter:
+    """
+    Write-only file wrapper that hashes bytes as they pass through.
+
+    Deliberately has no fileno(), so Pillow writes through write() instead of the raw descriptor.
+    """
+
+    def __init__(self, fp):
+        self._fp = fp
+        self._hash = hashlib.sha256()
+        self._size = 0
+
+    def write(self, data):
+        self._hash.update(data)
+        self._size += len(data)
+        return self._fp.write(data)
+
+    def tell(self):
+        return self._size
+
+    def flush(self):
+        self._fp.flush()
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+class CoverStore:
+    """
+    Content-addressed playlist cover storage.
+
+    Each cover is written exactly once, straight from the encoder into a
+    temporary file in the store directory while being hashed, then renamed to
+    <sha256>.jpg. An identical upload finds its file already present and reuses
+    it. Thumbnails in each of thumbnail_sizes (the shorter edge, in pixels) are
+    written next to it at upload time, or on first request by variant_path().
+    Covers no playlist references are removed by collect_garbage() together
+    with their thumbnails.
+    """
+
+    def __init__(self, root_dir, url_prefix="/playlist_covers", thumbnail_sizes=(), thumbnail_quality=80):
+        self.root_dir = root_dir
+        self.url_prefix = url_prefix.rstrip("/")
+        self.thumbnail_sizes = tuple(sorted(thumbnail_sizes))
+        self.thumbnail_quality = thumbnail_quality
+        os.makedirs(root_dir, exist_ok=True)
+
+    def path_for(self, digest):
+        return os.path.join(self.root_dir, f"{digest}.jpg")
+
+    def url_for(self, digest):
+        return f"{self.url_prefix}/{digest}.jpg"
+
+    # Path of a stored cover or thumbnail, generating a missing thumbnail from its cover
+    # @param name: File name, <sha256>.jpg or <sha256>_<size>.jpg with size in thumbnail_sizes
+    # @return: Absolute path, or None if the name is not a known cover or size
+    def variant_path(self, name):
+        match = COVER_NAME_RE.match(name)
+        if not match:
+            return None
+        digest, size = match.group("digest"), match.group("size")
+        if size is None:
+            path = self.path_for(digest)
+            return path if os.path.exists(path) else None
+        size = int(size)
+        if size not in self.thumbnail_sizes or not os.path.exists(self.path_for(digest)):
+            return None
+        return self._make_thumbnail(digest, size)
+
+    def _make_thumbnail(self, digest, size):
+        from PIL import Image
+
+        path = os.path.join(self.root_dir, f"{digest}_{size}.jpg")
+        if os.path.exists(path):
+            return path
+        source = self.path_for(digest)
+        with Image.open(source) as img:
+            # Scale the shorter edge to size so the thumbnail can fill any box up to size px with object-fit: cover
+            scale = min(1.0, size / min(img.size))
+            target = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+            img.draft("RGB", target)
+            thumb = None if scale == 1.0 else img.convert("RGB")
+            if thumb is not None and thumb.size != target:
+                thumb = thumb.resize(target, Image.Resampling.LANCZOS)
+
+        # Concurrent requests for the same thumbnail each write their own temp file; the last rename wins
+        fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, suffix=PARTIAL_SUFFIX)
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                if thumb is None:
+                    # Cover is already no larger than this size; re-encoding would only cost quality
+                    with open(source, "rb") as src:
+                        shutil.copyfileobj(src, fp)
+                else:
+                    thumb.save(fp, "JPEG", quality=self.thumbnail_quality, optimize=True, progressive=True)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return path
+
+    def make_thumbnails(self, digest):
+        for size in self.thumbnail_sizes:
+            self._make_thumbnail(digest, size)
+
+    # Store whatever write_fn writes, under its content hash
+    # @param write_fn: Callable taking a writable binary stream; its return value is passed through
+    # @return: Tuple of (digest, path, url, write_fn result)
+    def save(self, write_fn):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, suffix=PARTIAL_SUFFIX)
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                writer = _HashingWriter(fp)
+                result = write_fn(writer)
+            digest = writer.hexdigest()
+            path = self.path_for(digest)
+            try:
+                # Same bytes already stored; refresh mtime so garbage collection's grace period restarts
+                os.utime(path)
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                os.replace(tmp_path, path)
+            self.make_thumbnails(digest)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return digest, path, self.url_for(digest), result
+
+    # Delete covers no playlist references, along with their thumbnails
+    # @param referenced_urls: Iterable of cover URLs (Playlist.cover_image values) that must be kept
+    # @param grace_seconds: Files modified more recently than this are kept, covering jobs still in flight
+    # @return: Dict with removed, kept and bytes_freed
+    def collect_garbage(self, referenced_urls, grace_seconds=3600):
+        referenced = set()
+        for url in referenced_urls:
+            match = COVER_NAME_RE.match(os.path.basename(url or ""))
+            if match and url.startswith(self.url_prefix + "/"):
+                referenced.add(match.group("digest"))
+        cutoff = time.time() - grace_seconds
+        stats = {"removed": 0, "kept": 0, "bytes_freed": 0}
+
+        for entry in os.scandir(self.root_dir):
+            if not entry.is_file():
+                continue
+            match = COVER_NAME_RE.match(entry.name)
+            if not match and not entry.name.endswith(PARTIAL_SUFFIX):
+                continue
+            try:
+                st = entry.stat()
+                if (match and match.group("digest") in referenced) or st.st_mtime > cutoff:
+                    stats["kept"] += 1
+                    continue
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                continue
+            stats["removed"] += 1
+            stats["bytes_freed"] += st.st_size
+        return stats
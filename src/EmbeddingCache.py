@@ -0,0 +1,72 @@
+import json
+import threading
+from collections import OrderedDict
+from FeatureIndex import parse_feature_values
+
+
+# Canonical text for a playlist_values query, so equivalent vibes share a cache entry
+# @param query_text: Feature JSON from LlamaClient.generate_playlist_values (or any text)
+# @param decimals: Number of decimals feature values are rounded to
+# @return: Sorted, rounded JSON string, or the whitespace-normalized text if it isn't feature JSON
+def canonicalize_query(query_text, decimals=2):
+    try:
+        values = parse_feature_values(query_text)
+    except (ValueError, TypeError):
+        return " ".join(str(query_text).split())
+    return json.dumps({name: round(value, decimals) for name, value in values.items()}, sort_keys=True)
+
+
+class EmbeddingCache:
+    """
+    Bounded, thread-safe LRU cache of query embeddings keyed on canonical query text.
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, key, embedding):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Get cache counters
+
+        Returns:
+            dict: size, max_size, hits, misses, evictions and hit_rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
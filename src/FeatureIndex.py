@@ -0,0 +1,121 @@
+import json
+import re
+import numpy as np
+
+
+# Audio features produced by LlamaClient.generate_playlist_values, in index column order
+FEATURE_COLUMNS = ['danceability', 'energy', 'acousticness', 'liveness', 'valence', 'tempo']
+
+
+# Parse the feature JSON returned by LlamaClient.generate_playlist_values
+# @param playlist_values: JSON string (may be wrapped in prose or code fences) or dict
+# @return: Dict of feature name -> float for every feature that was present
+def parse_feature_values(playlist_values):
+    if isinstance(playlist_values, dict):
+        data = playlist_values
+    else:
+        # The model sometimes adds text around the object; take the first {...} block
+        match = re.search(r"\{.*?\}", playlist_values, re.DOTALL)
+        if not match:
+            raise ValueError(f"No JSON object found in playlist values: {playlist_values!r}")
+        data = json.loads(match.group(0))
+
+    values = {}
+    for name in FEATURE_COLUMNS:
+        value = data.get(name)
+        if value is None:
+            continue
+        try:
+            values[name] = float(value)
+        except (TypeError, ValueError):
+            continue
+    if not values:
+        raise ValueError(f"No audio features found in playlist values: {playlist_values!r}")
+    return values
+
+
+# Parse "name=weight,name=weight" into per-feature weights
+# @param spec: Weight string, e.g. "tempo=0.5,energy=2"
+# @return: Dict of feature name -> weight
+def parse_feature_weights(spec):
+    weights = {}
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in FEATURE_COLUMNS:
+            raise ValueError(f"Unknown feature in weights: {name}")
+        weights[name] = float(weight)
+    return weights
+
+
+class FeatureIndex:
+    """
+    KD-tree over min-max scaled audio features.
+
+    Each column is scaled to [0, 1] using the catalog's own range and then
+    multiplied by sqrt(weight), so Euclidean distance in the tree equals
+    the weighted distance between feature vectors.
+    """
+
+    def __init__(self, features, metadatas, weights=None):
+        from scipy.spatial import cKDTree
+
+        features = np.asarray(features, dtype=np.float64)
+        if features.ndim != 2 or features.shape[1] != len(FEATURE_COLUMNS):
+            raise ValueError(f"Expected an (n, {len(FEATURE_COLUMNS)}) feature matrix, got {features.shape}")
+        if len(features) != len(metadatas):
+            raise ValueError(f"Index inputs disagree: {len(features)} rows, {len(metadatas)} metadatas")
+
+        weights = weights or {}
+        self.metadatas = metadatas
+        self.mins = features.min(axis=0)
+        span = features.max(axis=0) - self.mins
+        self.spans = np.where(span > 0, span, 1.0)
+        self.means = features.mean(axis=0)
+        self.scale = np.sqrt([weights.get(name, 1.0) for name in FEATURE_COLUMNS])
+        self.tree = cKDTree(self._transform(features))
+
+    # Build an index from the songs CSV used by chromaInit.py
+    # @param csv_path: Path to spotify_songs.csv
+    # @param weights: Optional dict of feature name -> weight
+    # @return: FeatureIndex
+    @classmethod
+    def from_csv(cls, csv_path, weights=None):
+        import pandas as pd
+
+        df = pd.read_csv(csv_path, usecols=["name", "artists"] + FEATURE_COLUMNS)
+        df = df.dropna(subset=FEATURE_COLUMNS)
+        metadatas = df[["name", "artists"] + FEATURE_COLUMNS].to_dict(orient="records")
+        return cls(df[FEATURE_COLUMNS].to_numpy(), metadatas, weights=weights)
+
+    def _transform(self, features):
+        return (features - self.mins) / self.spans * self.scale
+
+    def __len__(self):
+        return len(self.metadatas)
+
+    # Turn parsed feature dicts into a query matrix, filling gaps with the catalog mean
+    # @param values_list: List of dicts from parse_feature_values
+    # @return: Array of shape (n_queries, n_features)
+    def to_vectors(self, values_list):
+        return np.array(
+            [[values.get(name, self.means[i]) for i, name in enumerate(FEATURE_COLUMNS)] for values in values_list],
+            dtype=np.float64,
+        )
+
+    # Nearest songs for a batch of feature dicts
+    # @param values_list: List of dicts from parse_feature_values
+    # @param top_k: Number of results per query
+    # @return: Dict with 'ids', 'distances' and 'metadatas', one inner list per query
+    def query(self, values_list, top_k=5):
+        k = min(top_k, len(self))
+        distances, indices = self.tree.query(self._transform(self.to_vectors(values_list)), k=k)
+        distances = np.asarray(distances).reshape(len(values_list), k)
+        indices = np.asarray(indices).reshape(len(values_list), k)
+        return {
+            "ids": [[str(i) for i in row] for row in indices],
+            "distances": distances.tolist(),
+            "metadatas": [[self.metadatas[i] for i in row] for row in indices],
+        }
@@ -0,0 +1,268 @@
+import hashlib
+import json
+import os
+import time
+import numpy as np
+from VectorIndex import NumpyVectorIndex
+
+
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+# Metadata columns stored as string tables; every other metadata key is a float32 column
+STRING_COLUMNS = ("name", "artists")
+EMBEDDING_DTYPES = ("float32", "float16", "int8")
+
+
+class StringColumn:
+    """
+    Read-only column of strings stored as one UTF-8 blob plus an int64 offset table.
+
+    Both files are memory-mapped; a string is only decoded when it is indexed.
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def load(cls, bundle_dir, name):
+        data_path = os.path.join(bundle_dir, f"{name}.bin")
+        # np.memmap refuses empty files, and an all-empty column has nothing to map
+        data = np.memmap(data_path, dtype=np.uint8, mode="r") if os.path.getsize(data_path) else np.empty(0, np.uint8)
+        return cls(data, np.load(os.path.join(bundle_dir, f"{name}.offsets.npy"), mmap_mode="r"))
+
+    # Write values as <name>.bin and <name>.offsets.npy
+    # @return: List of the file names written
+    @staticmethod
+    def write(bundle_dir, name, values):
+        offsets = np.empty(len(values) + 1, dtype=np.int64)
+        offsets[0] = 0
+        with open(os.path.join(bundle_dir, f"{name}.bin"), "wb") as f:
+            for i, value in enumerate(values):
+                encoded = ("" if value is None else str(value)).encode("utf-8")
+                f.write(encoded)
+                offsets[i + 1] = offsets[i] + len(encoded)
+        np.save(os.path.join(bundle_dir, f"{name}.offsets.npy"), offsets)
+        return [f"{name}.bin", f"{name}.offsets.npy"]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+
+class ColumnarMetadata:
+    """
+    Sequence of per-song metadata dicts backed by column files, in the shape chromaInit.py stores in Chroma.
+    """
+
+    def __init__(self, strings, numeric, numeric_names):
+        self.strings = strings
+        self.numeric = numeric
+        self.numeric_names = numeric_names
+
+    def __len__(self):
+        return len(self.numeric)
+
+    def __getitem__(self, i):
+        row = {name: column[i] for name, column in self.strings.items()}
+        row.update(zip(self.numeric_names, (float(v) for v in self.numeric[i])))
+        return row
+
+
+# SHA-256 of a file, read in 1 MB blocks
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Quantize float32 rows to the bundle's storage dtype
+# @param block: float32 array of shape (rows, dim)
+# @param dtype: "float32", "float16" or "int8"
+# @return: Tuple of (stored array, per-row float32 scales or None)
+def quantize(block, dtype):
+    if dtype == "int8":
+        # Symmetric per-row scaling: the largest magnitude in each row maps to 127
+        scales = np.abs(block).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        return np.round(block / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    return block.astype(dtype), None
+
+
+# Recall@k of a quantized index against exact float32 search
+# @param reference: Exact NumpyVectorIndex over the float32 embeddings
+# @param candidate: NumpyVectorIndex over the quantized embeddings
+# @param n_queries: Number of probe queries (catalog rows plus a little noise)
+# @param top_k: k for recall@k
+# @return: Mean fraction of the exact top-k the quantized search also returns
+def measure_recall(reference, candidate, n_queries=200, top_k=15, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(reference), size=min(n_queries, len(reference)), replace=False)
+    queries = np.asarray(reference.embeddings[np.sort(rows)], dtype=np.float32)
+    queries += rng.standard_normal(queries.shape).astype(np.float32) * 0.05 * np.linalg.norm(queries, axis=1, keepdims=True) / np.sqrt(queries.shape[1])
+    exact, _ = reference.search(queries, top_k)
+    approx, _ = candidate.search(queries, top_k)
+    return float(np.mean([len(set(e) & set(a)) / len(e) for e, a in zip(exact, approx)]))
+
+
+# Write a versioned, checksummed index bundle and publish it atomically
+# @param bundle_root: Directory holding one subdirectory per bundle version
+# @param embeddings: float32 array (or memmap) of shape (rows, dim)
+# @param ids: List of song IDs
+# @param metadatas: List of metadata dicts (name, artists and numeric features)
+# @param model_name: Embedding model the vectors came from
+# @param dtype: Stored embedding dtype: "float16", "int8" or "float32"
+# @param recall_queries: Probe queries used to measure quantization recall (0 skips it)
+# @param top_k: k for the recall measurement
+# @return: Path of the published bundle directory
+def write_bundle(bundle_root, embeddings, ids, metadatas, model_name, dtype="float16",
+                 recall_queries=200, top_k=15, block_rows=65536):
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"Unknown embedding dtype: {dtype}")
+    if not (len(embeddings) == len(ids) == len(metadatas)):
+        raise ValueError(f"Index files disagree: {len(embeddings)} embeddings, {len(ids)} ids, {len(metadatas)} metadatas")
+
+    version = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+    while os.path.exists(os.path.join(bundle_root, version)):
+        version += "_"
+    bundle_dir = os.path.join(bundle_root, version)
+    partial_dir = os.path.join(bundle_root, f".{version}.partial")
+    os.makedirs(partial_dir)
+
+    rows, dim = embeddings.shape
+    stored = np.lib.format.open_memmap(
+        os.path.join(partial_dir, "embeddings.npy"), mode="w+", dtype=np.dtype(dtype), shape=(rows, dim)
+    )
+    scales = np.ones(rows, dtype=np.float32) if dtype == "int8" else None
+    sq_norms = np.empty(rows, dtype=np.float32)
+    for start in range(0, rows, block_rows):
+        block = np.asarray(embeddings[start:start + block_rows], dtype=np.float32)
+        quantized, block_scales = quantize(block, dtype)
+        stored[start:start + len(block)] = quantized
+        # Norms of the vectors search will actually see, so distances stay consistent
+        dequantized = quantized.astype(np.float32)
+        if block_scales is not None:
+            scales[start:start + len(block)] = block_scales
+            dequantized *= block_scales[:, None]
+        sq_norms[start:start + len(block)] = np.einsum("ij,ij->i", dequantized, dequantized)
+    stored.flush()
+    del stored
+
+    files = ["embeddings.npy", "sq_norms.npy"]
+    np.save(os.path.join(partial_dir, "sq_norms.npy"), sq_norms)
+    if scales is not None:
+        np.save(os.path.join(partial_dir, "scales.npy"), scales)
+        files.append("scales.npy")
+
+    numeric_names = [key for key in (metadatas[0] if metadatas else {}) if key not in STRING_COLUMNS]
+    numeric = np.array(
+        [[np.nan if m.get(name) is None else m[name] for name in numeric_names] for m in metadatas], dtype=np.float32
+    ).reshape(rows, len(numeric_names))
+    np.save(os.path.join(partial_dir, "numeric.npy"), numeric)
+    files.append("numeric.npy")
+    files += StringColumn.write(partial_dir, "ids", ids)
+    for name in STRING_COLUMNS:
+        files += StringColumn.write(partial_dir, name, [m.get(name) for m in metadatas])
+
+    manifest = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "version": version,
+        "model": model_name,
+        "rows": rows,
+        "dim": dim,
+        "dtype": dtype,
+        "numeric_columns": numeric_names,
+        "string_columns": list(STRING_COLUMNS),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "files": {
+            name: {"sha256": file_sha256(os.path.join(partial_dir, name)), "bytes": os.path.getsize(os.path.join(partial_dir, name))}
+            for name in files
+        },
+    }
+
+    if recall_queries and rows:
+        reference = NumpyVectorIndex(embeddings, ids, ids)
+        candidate = load_bundle(partial_dir, manifest=manifest)
+        manifest["recall"] = {"k": top_k, "queries": min(recall_queries, rows),
+                              "recall_at_k": measure_recall(reference, candidate, recall_queries, top_k)}
+
+    with open(os.path.join(partial_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.rename(partial_dir, bundle_dir)
+    return bundle_dir
+
+
+# Published bundle versions under a bundle root, newest first
+# @param bundle_root: Directory write_bundle publishes into
+# @return: List of version names; in-progress .partial directories are skipped
+def list_bundle_versions(bundle_root):
+    try:
+        entries = os.listdir(bundle_root)
+    except FileNotFoundError:
+        return []
+    return sorted(
+        (name for name in entries
+         if not name.startswith(".") and os.path.isfile(os.path.join(bundle_root, name, MANIFEST_FILE))),
+        reverse=True,
+    )
+
+
+# Check every file of a bundle against its manifest checksums
+# @param bundle_dir: Bundle directory
+# @return: The manifest
+# @raise ValueError: If a file is missing or its size or checksum differs
+def verify_bundle(bundle_dir):
+    with open(os.path.join(bundle_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    for name, expected in manifest["files"].items():
+        path = os.path.join(bundle_dir, name)
+        if not os.path.exists(path):
+            raise ValueError(f"Bundle {bundle_dir} is missing {name}")
+        if os.path.getsize(path) != expected["bytes"] or file_sha256(path) != expected["sha256"]:
+            raise ValueError(f"Bundle {bundle_dir} has a corrupt {name}")
+    return manifest
+
+
+# Memory-map a bundle as a NumpyVectorIndex; nothing is parsed or decoded up front
+# @param bundle_dir: Bundle directory
+# @param verify: Check file checksums first (reads every byte)
+# @param manifest: Already-loaded manifest, if the caller has one
+# @return: NumpyVectorIndex with a .manifest attribute
+# @raise ValueError: If the bundle format is unknown or files are missing or the wrong size
+def load_bundle(bundle_dir, verify=False, manifest=None, block_rows=None):
+    if verify:
+        manifest = verify_bundle(bundle_dir)
+    elif manifest is None:
+        with open(os.path.join(bundle_dir, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    if manifest.get("format_version") != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported index bundle format: {manifest.get('format_version')}")
+    for name, expected in manifest["files"].items():
+        path = os.path.join(bundle_dir, name)
+        if not os.path.exists(path) or os.path.getsize(path) != expected["bytes"]:
+            raise ValueError(f"Bundle {bundle_dir} is missing or has a truncated {name}")
+
+    def load(name):
+        return np.load(os.path.join(bundle_dir, name), mmap_mode="r")
+
+    metadatas = ColumnarMetadata(
+        {name: StringColumn.load(bundle_dir, name) for name in manifest["string_columns"]},
+        load("numeric.npy"),
+        manifest["numeric_columns"],
+    )
+    kwargs = {"block_rows": block_rows} if block_rows else {}
+    index = NumpyVectorIndex(
+        load("embeddings.npy"),
+        StringColumn.load(bundle_dir, "ids"),
+        metadatas,
+        scales=load("scales.npy") if "scales.npy" in manifest["files"] else None,
+        sq_norms=load("sq_norms.npy"),
+        **kwargs,
+    )
+    index.manifest = manifest
+    return index
@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+from IndexBundle import list_bundle_versions, load_bundle
+
+
+class IndexGeneration:
+    """
+    One loaded bundle version plus the number of queries currently running on it.
+    """
+
+    def __init__(self, version, index):
+        self.version = version
+        self.index = index
+        self.active = 0
+        self.retired = False
+
+
+class ReloadingIndex:
+    """
+    Serves the newest valid index bundle under a bundle root and switches to
+    newer ones as they are published, without blocking queries.
+
+    A new version is loaded, checksum-verified, checked against the serving
+    model and paged in by a probe search before it is swapped in, all outside
+    the lock queries take. Queries pin the generation they started on, so a
+    swap never changes the index under a running search; a retired generation
+    drops its memory maps once its last query finishes. While a version fails
+    validation the current generation keeps serving. A version whose
+    checksums, format or model are wrong is skipped until a newer one
+    appears; one that failed on an I/O error is tried again on the next
+    reload.
+    """
+
+    def __init__(self, bundle_root, model_name=None, verify=True):
+        self.bundle_root = bundle_root
+        self.model_name = model_name
+        self.verify = verify
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._current = None
+        self._rejected = set()
+        self._start_lock = threading.Lock()
+        self._started_pid = None
+        self._thread = None
+
+    @property
+    def version(self):
+        current = self._current
+        return current.version if current else None
+
+    # Pin the current generation for the duration of a query
+    # @return: Context manager yielding the NumpyVectorIndex to search
+    # @raise FileNotFoundError: If no valid bundle has been loaded yet
+    @contextmanager
+    def acquire(self):
+        with self._lock:
+            generation = self._current
+            if generation is None:
+                raise FileNotFoundError(f"No valid index bundle under {self.bundle_root}")
+            generation.active += 1
+        try:
+            yield generation.index
+        finally:
+            with self._lock:
+                generation.active -= 1
+                drained = generation.retired and generation.active == 0
+            if drained:
+                self._release(generation)
+
+    def _release(self, generation):
+        # Dropping the last references closes the memory maps
+        generation.index = None
+        print(f"✓ Released index generation {generation.version}")
+
+    def _validate(self, version):
+        bundle_dir = os.path.join(self.bundle_root, version)
+        index = load_bundle(bundle_dir, verify=self.verify)
+        manifest = index.manifest
+        if self.model_name and manifest["model"] != self.model_name:
+            raise ValueError(f"Bundle {version} was embedded with {manifest['model']}, not {self.model_name}")
+        if len(index) == 0:
+            raise ValueError(f"Bundle {version} is empty")
+        # Probe search: confirms the files are usable and pages the embeddings in before traffic arrives
+        probe = np.asarray(index.embeddings[:1], dtype=np.float32)
+        if not len(index.query(probe, 1)["ids"][0]):
+            raise ValueError(f"Bundle {version} returned no results for a probe query")
+        return index
+
+    # Load and swap to the newest bundle version if it is not already serving
+    # @return: Version now being served, or None if no valid bundle exists
+    def reload(self):
+        # One reload at a time; queries never wait on this lock
+        with self._reload_lock:
+            for version in list_bundle_versions(self.bundle_root):
+                if self._current is not None and version <= self._current.version:
+                    break
+                if version in self._rejected:
+                    continue
+                started = time.perf_counter()
+                try:
+                    index = self._validate(version)
+                except (ValueError, KeyError) as e:
+                    # Checksum, format or model mismatch: the bundle will not get better by itself
+                    print(f"⚠️  Skipping index bundle {version}: {e}")
+                    self._rejected.add(version)
+                    continue
+                except OSError as e:
+                    # Possibly transient (a flaky mount, too many open files), so the next reload tries it again
+                    print(f"⚠️  Could not load index bundle {version}, will retry: {e}")
+                    continue
+                self._swap(IndexGeneration(version, index))
+                print(f"✓ Serving index generation {version} ({len(index)} songs, "
+                      f"loaded in {time.perf_counter() - started:.2f}s)")
+                break
+            return self.version
+
+    def _swap(self, generation):
+        with self._lock:
+            previous, self._current = self._current, generation
+            if previous is not None:
+                previous.retired = True
+            drained = previous is not None and previous.active == 0
+        if drained:
+            self._release(previous)
+
+    # Load the newest bundle and poll the bundle root for new ones in a daemon thread, once per process
+    # Later calls return at once without taking any lock, so queries can call this on every request
+    # @param interval_seconds: Seconds between checks for a new version (0 loads once and never polls)
+    def start(self, interval_seconds):
+        # Threads do not survive fork, so each worker process loads and starts its own
+        if self._started_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self.reload()
+            if interval_seconds > 0:
+                self._thread = threading.Thread(
+                    target=self._watch, args=(interval_seconds,), name="index-reload", daemon=True
+                )
+                self._thread.start()
+            self._started_pid = os.getpid()
+
+    def _watch(self, interval_seconds):
+        while True:
+            time.sleep(interval_seconds)
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"⚠️  Index reload failed: {e}")
+
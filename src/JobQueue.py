@@ -0,0 +1,176 @@
+import json
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from database.config import SessionLocal
+from database.models import PlaylistJob
+
+
+class JobFailed(Exception):
+    """
+    Raised by a job function to fail the job with a client-facing message and HTTP status.
+    """
+
+    def __init__(self, message, http_status=500):
+        super().__init__(message)
+        self.message = message
+        self.http_status = http_status
+
+
+# Update a job row in its own short transaction
+# @param job_id: PlaylistJob ID
+# @param fields: Column values to set
+def update_job(job_id, **fields):
+    db = SessionLocal()
+    try:
+        db.query(PlaylistJob).filter(PlaylistJob.id == job_id).update(fields, synchronize_session=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+# Report progress for a running job
+# @param job_id: PlaylistJob ID
+# @param stage: Description of the current step
+# @param progress: Completion percentage (0-100)
+def report_progress(job_id, stage, progress):
+    try:
+        update_job(job_id, stage=stage, progress=progress)
+    except Exception as e:
+        # Progress is informational; never fail the job because of it
+        print(f"⚠️  Could not update progress for job {job_id}: {e}")
+
+
+# Fail queued or running jobs that no process has touched recently
+# @param stale_seconds: Jobs whose updated_at is older than this are considered orphaned
+# @return: Number of jobs marked failed
+def fail_stale_jobs(stale_seconds):
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        swept = db.query(PlaylistJob).filter(
+            PlaylistJob.status.in_([PlaylistJob.STATUS_QUEUED, PlaylistJob.STATUS_RUNNING]),
+            PlaylistJob.updated_at < now - timedelta(seconds=stale_seconds)
+        ).update({
+            PlaylistJob.status: PlaylistJob.STATUS_FAILED,
+            PlaylistJob.error: "The server restarted before this playlist was finished. Please upload the image again.",
+            PlaylistJob.http_status: 503,
+            PlaylistJob.finished_at: now,
+            PlaylistJob.updated_at: now
+        }, synchronize_session=False)
+        db.commit()
+        return swept
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+class JobQueue:
+    """
+    Bounded worker pool for playlist jobs whose state lives in the playlist_jobs table.
+
+    Any process sharing the database can answer status requests; only the
+    process that accepted the upload runs the job. Jobs live only in that
+    process's executor, so heartbeat() keeps their updated_at fresh and
+    fail_stale_jobs() fails the ones whose process died.
+    """
+
+    def __init__(self, max_workers=2, max_pending=20):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="playlist-job")
+        # Counts jobs that are queued or running in this process
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        # IDs of jobs this process has accepted and not yet finished
+        self._active = set()
+        self._active_lock = threading.Lock()
+
+    # Create a job row and schedule the job
+    # @param fn: Callable taking the job ID and returning a JSON-serializable result
+    # @param user_id: Owner of the job (optional)
+    # @return: New job ID, or None if the queue is full
+    def submit(self, fn, user_id=None):
+        if not self._slots.acquire(blocking=False):
+            return None
+
+        db = SessionLocal()
+        try:
+            job = PlaylistJob(user_id=user_id, status=PlaylistJob.STATUS_QUEUED, stage="Queued", progress=0)
+            db.add(job)
+            db.commit()
+            job_id = job.id
+        except Exception:
+            db.rollback()
+            self._slots.release()
+            raise
+        finally:
+            db.close()
+
+        with self._active_lock:
+            self._active.add(job_id)
+        self._executor.submit(self._run, job_id, fn)
+        return job_id
+
+    # Touch updated_at on this process's queued and running jobs so fail_stale_jobs() leaves them alone
+    # @return: Number of jobs touched
+    def heartbeat(self):
+        with self._active_lock:
+            job_ids = list(self._active)
+        if not job_ids:
+            return 0
+        db = SessionLocal()
+        try:
+            touched = db.query(PlaylistJob).filter(
+                PlaylistJob.id.in_(job_ids),
+                PlaylistJob.status.in_([PlaylistJob.STATUS_QUEUED, PlaylistJob.STATUS_RUNNING])
+            ).update({PlaylistJob.updated_at: datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+            return touched
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _run(self, job_id, fn):
+        try:
+            update_job(job_id, status=PlaylistJob.STATUS_RUNNING, started_at=datetime.utcnow())
+            result = fn(job_id)
+            update_job(
+                job_id,
+                status=PlaylistJob.STATUS_SUCCEEDED,
+                stage="Done",
+                progress=100,
+                result=json.dumps(result),
+                http_status=200,
+                finished_at=datetime.utcnow()
+            )
+        except JobFailed as e:
+            print(f"✗ Job {job_id} failed: {e.message}")
+            self._fail(job_id, e.message, e.http_status)
+        except Exception as e:
+            print(f"✗ Job {job_id} crashed: {e}")
+            traceback.print_exc()
+            self._fail(job_id, f"An error occurred: {str(e)}", 500)
+        finally:
+            with self._active_lock:
+                self._active.discard(job_id)
+            self._slots.release()
+
+    def _fail(self, job_id, message, http_status):
+        try:
+            update_job(
+                job_id,
+                status=PlaylistJob.STATUS_FAILED,
+                error=message,
+                http_status=http_status,
+                finished_at=datetime.utcnow()
+            )
+        except Exception as e:
+            print(f"✗ Could not record failure for job {job_id}: {e}")
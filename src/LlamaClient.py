@@ -1,7 +1,8 @@
 from ollama import chat
-from config import OLLAMA_MODEL
+from config import OLLAMA_MODEL, PIPELINE_MODE, PLAYLIST_TRACK_COUNT
 from ChromaClient import query_chroma
 import json
+import re
 
 def remove_duplicates(songs):
     """
@@ -19,9 +20,44 @@ def remove_duplicates(songs):
             unique_songs.append(song)
     return unique_songs
 
+def parse_keywords(keywords):
+    """
+    Split the model's keyword response into a clean list.
+    @param keywords: Keywords string (comma-separated or whitespace-separated, maybe numbered)
+    @return: List of keyword strings
+    """
+    # Clean up keywords - remove numbering like "1.", "2.", etc.
+    if ',' in keywords:
+        keywords_list = [re.sub(r'^\d+\.\s*', '', k.strip()) for k in keywords.split(',') if k.strip()]
+    else:
+        # Split by whitespace and remove numbers
+        keywords_list = [re.sub(r'^\d+\.\s*', '', k.strip()) for k in keywords.split() if k.strip()]
+
+    # Filter out any remaining empty strings
+    return [k for k in keywords_list if k]
+
+# JSON schema for the single-call pipeline: description, keywords and features in one response
+STRUCTURED_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "description": {"type": "string"},
+        "keywords": {"type": "array", "items": {"type": "string"}},
+        "danceability": {"type": "number"},
+        "energy": {"type": "number"},
+        "acousticness": {"type": "number"},
+        "liveness": {"type": "number"},
+        "valence": {"type": "number"},
+        "tempo": {"type": "integer"},
+    },
+    "required": ["description", "keywords", "danceability", "energy", "acousticness", "liveness", "valence", "tempo"],
+}
+
+FEATURE_NAMES = ["danceability", "energy", "acousticness", "liveness", "valence", "tempo"]
+
 class LlamaClient:
-    def __init__(self, model=OLLAMA_MODEL):
+    def __init__(self, model=OLLAMA_MODEL, mode=PIPELINE_MODE):
         self.model = model
+        self.mode = mode
 
     # Generate image description response
     # @param img_prompt: The image input (file path or image data)
@@ -80,10 +116,43 @@ class LlamaClient:
             ])
         return response['message']['content']
 
-    # Pipeline method to process image and generate playlist
+    # Generate description, keywords and playlist values with one schema-constrained vision call
     # @param img_prompt: The image input (file path or image data)
-    # @return: Tuple of (playlist results as list of dicts, keywords as list of strings)
-    def pipeline(self, img_prompt):
+    # @return: Tuple of (description, keywords string, playlist values JSON string)
+    # @raise ValueError: If the response does not match STRUCTURED_RESPONSE_SCHEMA
+    def generate_structured(self, img_prompt):
+        response = chat(model=self.model, format=STRUCTURED_RESPONSE_SCHEMA, messages=[
+            {
+                'role': 'system',
+                'content': 'You are a photography and spotify music expert. Analyze photos looking at perspective, lighting, content, and focus, then describe them in terms of music.'
+            },
+            {
+                'role':'user',
+                'content': (
+                    'Describe the content, emotion, and general vibe of this photo using words that could also be used to describe music. '
+                    'Then give 10 to 15 keywords about the vibe and location that could also describe music. '
+                    'Finally give danceability, energy, acousticness, liveness, and valence as values between 0 and 1 with a precision of 2, '
+                    'and a suggested tempo as an integer. Respond in JSON.'
+                ),
+                'images': [img_prompt] if isinstance(img_prompt, str) else img_prompt
+            },
+            ])
+        try:
+            data = json.loads(response['message']['content'])
+            description = str(data['description']).strip()
+            keywords = [str(k).strip() for k in data['keywords'] if str(k).strip()]
+            features = {name: float(data[name]) for name in FEATURE_NAMES}
+        except (ValueError, TypeError, KeyError) as e:
+            raise ValueError(f"Structured response did not match schema: {e}") from e
+        if not description or not keywords:
+            raise ValueError("Structured response is missing a description or keywords")
+        features['tempo'] = int(round(features['tempo']))
+        return description, ", ".join(keywords), json.dumps(features)
+
+    # Three sequential chat calls: description, then keywords, then playlist values
+    # @param img_prompt: The image input (file path or image data)
+    # @return: Tuple of (description, keywords string, playlist values JSON string)
+    def generate_three_step(self, img_prompt):
         print("Generating description for image...")
         description = self.generate_img_response(img_prompt)
         print("Image Description:", description)
@@ -92,8 +161,25 @@ class LlamaClient:
         print("Keywords:", keywords)
         print("Generating playlist values from keywords...")
         playlist_values = self.generate_playlist_values(keywords)
+        return description, keywords, playlist_values
+
+    # Run every pipeline stage and keep the intermediate outputs
+    # @param img_prompt: The image input (file path or image data)
+    # @return: Dict with description, keywords, playlist_values, songs and descriptors
+    def run_stages(self, img_prompt):
+        if self.mode == "single_call":
+            try:
+                print("Generating description, keywords and values in one call...")
+                description, keywords, playlist_values = self.generate_structured(img_prompt)
+                print("Image Description:", description)
+                print("Keywords:", keywords)
+            except Exception as e:
+                print(f"⚠️  Single-call pipeline failed, falling back to three steps: {e}")
+                description, keywords, playlist_values = self.generate_three_step(img_prompt)
+        else:
+            description, keywords, playlist_values = self.generate_three_step(img_prompt)
         print("Playlist values:\n", playlist_values)
-        chroma_query = query_chroma(playlist_values, 15)
+        chroma_query = query_chroma(playlist_values, PLAYLIST_TRACK_COUNT)
         
 
         removed_duplicates = remove_duplicates(chroma_query)
@@ -101,16 +187,19 @@ class LlamaClient:
         format_query = json.dumps(removed_duplicates, indent=2)
         print("Chroma Query Results:\n", format_query)
 
-        # Return the list of songs and keywords as a list
-        # Clean up keywords - remove numbering like "1.", "2.", etc.
-        import re
-        if ',' in keywords:
-            keywords_list = [re.sub(r'^\d+\.\s*', '', k.strip()) for k in keywords.split(',') if k.strip()]
-        else:
-            # Split by whitespace and remove numbers
-            keywords_list = [re.sub(r'^\d+\.\s*', '', k.strip()) for k in keywords.split() if k.strip()]
+        return {
+            "description": description,
+            "keywords": keywords,
+            "playlist_values": playlist_values,
+            "songs": removed_duplicates,
+            "descriptors": parse_keywords(keywords)[:3],
+        }
 
-        # Filter out any remaining empty strings
-        keywords_list = [k for k in keywords_list if k]
+    # Pipeline method to process image and generate playlist
+    # @param img_prompt: The image input (file path or image data)
+    # @return: Tuple of (playlist results as list of dicts, keywords as list of strings)
+    def pipeline(self, img_prompt):
+        result = self.run_stages(img_prompt)
 
-        return removed_duplicates, keywords_list[:3]
\ No newline at end of file
+        # Return the list of songs and keywords as a list
+        return result["songs"], result["descriptors"]
@@ -0,0 +1,103 @@
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from database.config import SessionLocal
+from database.models import PipelineCacheEntry
+
+
+# Compute a 64-bit difference hash (dHash) of an image
+# @param image_path: Path to the image file
+# @param hash_size: Hash side length; 8 gives a 64-bit hash
+# @return: Hash as an unsigned integer
+def image_dhash(image_path, hash_size=8):
+    from PIL import Image
+
+    with Image.open(image_path) as img:
+        # draft() lets JPEG decode at reduced scale, far cheaper than a full decode
+        img.draft("L", (hash_size * 8, hash_size * 8))
+        small = img.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+        pixels = list(small.getdata())
+
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+
+# Number of differing bits between two hashes
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class PipelineCache:
+    """
+    Database-backed cache of LlamaClient.run_stages results keyed on image dHash.
+
+    An upload whose hash is within max_distance bits of a live entry reuses
+    that entry's description, keywords, feature values and songs.
+    """
+
+    def __init__(self, ttl_seconds=86400, max_entries=5000, max_distance=4):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+
+    # Find the closest live entry for an image hash
+    # @param image_hash: Hash from image_dhash
+    # @return: Pipeline result dict, or None on a miss
+    def lookup(self, image_hash):
+        db = SessionLocal()
+        try:
+            distance = func.bit_count(PipelineCacheEntry.image_hash.op("^")(image_hash))
+            entry = (
+                db.query(PipelineCacheEntry)
+                .filter(PipelineCacheEntry.expires_at > datetime.utcnow())
+                .filter(distance <= self.max_distance)
+                .order_by(distance, PipelineCacheEntry.created_at.desc())
+                .first()
+            )
+            if not entry:
+                return None
+            entry.hit_count = entry.hit_count + 1
+            db.commit()
+            return entry.to_result()
+        finally:
+            db.close()
+
+    # Store a pipeline result and trim the cache to its TTL and size cap
+    # @param image_hash: Hash from image_dhash
+    # @param result: Dict returned by LlamaClient.run_stages
+    def store(self, image_hash, result):
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            db.add(PipelineCacheEntry(
+                image_hash=image_hash,
+                description=result.get("description"),
+                keywords=result.get("keywords"),
+                playlist_values=result.get("playlist_values"),
+                songs=json.dumps(result.get("songs", [])),
+                descriptors=json.dumps(result.get("descriptors", [])),
+                created_at=now,
+                expires_at=now + timedelta(seconds=self.ttl_seconds)
+            ))
+            db.flush()
+
+            # Drop expired entries, then the oldest ones beyond the size cap
+            db.query(PipelineCacheEntry).filter(PipelineCacheEntry.expires_at <= now).delete(synchronize_session=False)
+            overflow = db.query(func.count(PipelineCacheEntry.id)).scalar() - self.max_entries
+            if overflow > 0:
+                oldest_ids = [
+                    row.id for row in
+                    db.query(PipelineCacheEntry.id).order_by(PipelineCacheEntry.created_at).limit(overflow)
+                ]
+                db.query(PipelineCacheEntry).filter(PipelineCacheEntry.id.in_(oldest_ids)).delete(synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
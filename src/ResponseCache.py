@@ -0,0 +1,71 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+# Strong ETag for a playlist version
+# @param playlist_id: Playlist ID
+# @param updated_at: Playlist.updated_at (bumped on every write to the row, including song_count changes)
+# @param song_count: Playlist.song_count
+# @return: Quoted ETag string
+def playlist_etag(playlist_id, updated_at, song_count):
+    stamp = updated_at.isoformat() if updated_at else ""
+    digest = hashlib.sha1(f"{playlist_id}|{stamp}|{song_count}".encode("utf-8")).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+class ResponseCache:
+    """
+    Bounded, thread-safe LRU of serialized response bodies, each tagged with the ETag it was built for.
+
+    get() only returns a body whose ETag matches the caller's current one, so an entry
+    written by another process is never served stale; invalidate() drops entries early
+    when this process writes the underlying row.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, etag):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, etag, body):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        """
+        Get cache counters
+
+        Returns:
+            dict: size, max_size, hits, misses and hit_rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
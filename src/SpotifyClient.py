@@ -0,0 +1,358 @@
+import random
+import threading
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ProtocolError
+
+
+SPOTIFY_TOKEN_URL = "https://accounts.spotify.com/api/token"
+SPOTIFY_API_BASE = "https://api.spotify.com/v1"
+
+# Most track URIs Spotify accepts in one add-items call
+MAX_TRACKS_PER_ADD = 100
+
+# Sends of one chunk; a chunk is only re-sent once the playlist shows it did not land
+MAX_CHUNK_ATTEMPTS = 2
+
+# Statuses worth retrying: rate limited or a transient server error
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+# Methods that are safe to send twice; anything else (POST) is only retried when
+# Spotify cannot have acted on it: a 429, or a connection that was never established
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+class SpotifyError(Exception):
+    """
+    Raised when a Spotify call fails after all retries.
+    """
+
+    def __init__(self, message, status_code=None, response=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = response
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every caller of a SpotifyClient.
+
+    pause() stops all callers until a deadline, which is how a 429's
+    Retry-After is applied to the whole process instead of one request.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class SpotifyClient:
+    """
+    Spotify Web API client with a shared rate budget, retries and per-endpoint metrics.
+
+    All requests go through one pooled requests.Session. Retryable failures
+    (429, 5xx, connection errors) back off exponentially with full jitter;
+    a 429's Retry-After header replaces the computed delay and is honoured
+    as sent, and a Retry-After longer than max_retry_after is surfaced as an
+    error instead of being waited out. POSTs are not
+    idempotent (creating a playlist, adding tracks, redeeming an auth code),
+    so they are only retried on a 429 or when the connection failed before
+    the request was sent.
+    """
+
+    def __init__(self, client_id=None, api_base=SPOTIFY_API_BASE, token_url=SPOTIFY_TOKEN_URL,
+                 rate_per_second=10.0, burst=20, max_retries=4, backoff_base=0.5, backoff_max=30.0,
+                 max_retry_after=120.0, pool_size=10, timeout=10):
+        self.client_id = client_id
+        self.api_base = api_base.rstrip("/")
+        self.token_url = token_url
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate_per_second, burst)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._metrics = {}
+        self._metrics_lock = threading.Lock()
+
+    def _record(self, endpoint, elapsed, status_code=None, error=False, retried=False):
+        with self._metrics_lock:
+            m = self._metrics.setdefault(endpoint, {
+                'requests': 0, 'errors': 0, 'retries': 0, 'rate_limited': 0,
+                'total_latency_ms': 0.0, 'max_latency_ms': 0.0
+            })
+            m['requests'] += 1
+            m['total_latency_ms'] += elapsed * 1000
+            m['max_latency_ms'] = max(m['max_latency_ms'], elapsed * 1000)
+            if error:
+                m['errors'] += 1
+            if retried:
+                m['retries'] += 1
+            if status_code == 429:
+                m['rate_limited'] += 1
+
+    def metrics(self):
+        """
+        Get per-endpoint counters
+
+        Returns:
+            dict: endpoint -> requests, errors, retries, rate_limited, avg/max latency in ms
+        """
+        with self._metrics_lock:
+            return {
+                endpoint: {
+                    **m,
+                    'avg_latency_ms': m['total_latency_ms'] / m['requests'] if m['requests'] else 0.0
+                }
+                for endpoint, m in self._metrics.items()
+            }
+
+    def _backoff(self, attempt, response=None):
+        if response is not None and response.status_code == 429:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after is not None:
+                try:
+                    # Not capped at backoff_max: retrying before the window ends only burns retries
+                    return max(0.0, float(retry_after))
+                except ValueError:
+                    pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _not_sent(error):
+        # A connect timeout or refused/unresolvable connection never reached Spotify; a read
+        # timeout or a connection dropped mid-response may have been applied
+        if isinstance(error, requests.ConnectTimeout):
+            return True
+        if not isinstance(error, requests.ConnectionError):
+            return False
+        cause = error.args[0] if error.args else None
+        return not isinstance(cause, ProtocolError) and not isinstance(getattr(cause, "reason", None), ProtocolError)
+
+    # Send a request with rate limiting and retries
+    # @param endpoint: Metric name for the call, e.g. "search"
+    # @param method: HTTP method
+    # @param url: Absolute URL
+    # @param ok_statuses: Statuses treated as success
+    # @return: requests.Response with a status in ok_statuses
+    # @raise SpotifyError: On a non-retryable status or once retries are exhausted
+    def request(self, endpoint, method, url, ok_statuses=(200, 201), **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                retrying = attempt < self.max_retries and (idempotent or self._not_sent(e))
+                self._record(endpoint, time.perf_counter() - started, error=True, retried=retrying)
+                if not retrying:
+                    raise SpotifyError(f"{endpoint} request failed: {e}") from e
+                time.sleep(self._backoff(attempt))
+                continue
+
+            elapsed = time.perf_counter() - started
+            if response.status_code in ok_statuses:
+                self._record(endpoint, elapsed, response.status_code)
+                return response
+
+            # A 429 was rejected before any work was done; a 5xx on a POST may have been applied
+            retryable = response.status_code in RETRYABLE_STATUSES if idempotent else response.status_code == 429
+            delay = self._backoff(attempt, response)
+            if response.status_code == 429 and delay > self.max_retry_after:
+                # Rate limited for longer than a caller should wait: give up rather than retry early
+                retryable = False
+            retrying = retryable and attempt < self.max_retries
+            self._record(endpoint, elapsed, response.status_code, error=True, retried=retrying)
+            if not retrying:
+                raise SpotifyError(
+                    f"{endpoint} returned {response.status_code}: {response.text[:200]}",
+                    status_code=response.status_code,
+                    response=response,
+                )
+            if response.status_code == 429:
+                # Everyone shares the budget, so everyone waits out the Retry-After
+                self.bucket.pause(delay)
+            time.sleep(delay)
+
+    @staticmethod
+    def _auth(access_token, json_body=False):
+        headers = {"Authorization": f"Bearer {access_token}"}
+        if json_body:
+            headers["Content-Type"] = "application/json"
+        return headers
+
+    def _token_request(self, endpoint, data):
+        data = {**data, "client_id": self.client_id}
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        return self.request(endpoint, "POST", self.token_url, ok_statuses=(200,), data=data, headers=headers).json()
+
+    # Exchange a PKCE authorization code for tokens
+    # @return: Token payload dict
+    def exchange_code(self, code, redirect_uri, code_verifier):
+        return self._token_request("token_exchange", {
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": redirect_uri,
+            "code_verifier": code_verifier,
+        })
+
+    # Refresh an access token
+    # @return: Token payload dict
+    def refresh_token(self, refresh_token):
+        return self._token_request("token_refresh", {
+            "grant_type": "refresh_token",
+            "refresh_token": refresh_token,
+        })
+
+    # Get the current user's profile
+    # @return: Raw /me response dict
+    def get_profile(self, access_token):
+        return self.request("me", "GET", f"{self.api_base}/me", ok_statuses=(200,), headers=self._auth(access_token)).json()
+
+    # Search for the best matching track
+    # @return: Track URI, or None if Spotify found no match
+    def search_track(self, access_token, name, artist=None) -> Optional[str]:
+        q = f"{name} artist:{artist}" if artist else name
+        response = self.request(
+            "search", "GET", f"{self.api_base}/search", ok_statuses=(200,),
+            headers=self._auth(access_token), params={"q": q, "type": "track", "limit": 1},
+        )
+        items = response.json().get("tracks", {}).get("items", [])
+        return items[0].get("uri") if items else None
+
+    # Create a playlist for the current user
+    # @return: Spotify playlist ID
+    def create_playlist(self, access_token, name, description="", public=False):
+        response = self.request(
+            "create_playlist", "POST", f"{self.api_base}/me/playlists",
+            headers=self._auth(access_token, json_body=True),
+            json={"name": name, "description": description, "public": public},
+        )
+        return response.json().get("id")
+
+    # Add up to 100 tracks to a playlist in one call
+    # @return: New snapshot_id of the playlist
+    def add_tracks(self, access_token, playlist_id, uris, position=None):
+        body = {"uris": uris}
+        if position is not None:
+            body["position"] = position
+        response = self.request(
+            "add_tracks", "POST", f"{self.api_base}/playlists/{playlist_id}/tracks",
+            headers=self._auth(access_token, json_body=True), json=body,
+        )
+        return response.json().get("snapshot_id")
+
+    # Get the playlist's current snapshot and length
+    # @return: (snapshot_id, number of tracks)
+    def get_playlist_state(self, access_token, playlist_id):
+        response = self.request(
+            "get_playlist", "GET", f"{self.api_base}/playlists/{playlist_id}", ok_statuses=(200,),
+            headers=self._auth(access_token), params={"fields": "snapshot_id,tracks.total"},
+        )
+        body = response.json()
+        return body.get("snapshot_id"), body.get("tracks", {}).get("total")
+
+    # After a failed add, tell from the playlist whether the chunk landed anyway
+    # @param snapshot_id: Snapshot after the last chunk known to have landed (None before the first)
+    # @param position: Tracks in the playlist before this chunk
+    # @param count: Tracks in this chunk
+    # @return: (state, snapshot_id), state being "added", "absent" or "unknown"
+    def _chunk_state(self, access_token, playlist_id, snapshot_id, position, count):
+        try:
+            current_snapshot, total = self.get_playlist_state(access_token, playlist_id)
+        except SpotifyError:
+            return "unknown", None
+        if snapshot_id is not None and current_snapshot == snapshot_id:
+            return "absent", current_snapshot
+        if total == position + count:
+            return "added", current_snapshot
+        if total == position:
+            return "absent", current_snapshot
+        return "unknown", current_snapshot
+
+    # Add any number of tracks in order, one chunk of up to 100 at a time
+    # @param access_token: Spotify access token
+    # @param playlist_id: Spotify playlist ID, empty before the call (as create_playlist leaves it)
+    # @param uris: Track URIs in playlist order
+    # @param chunk_size: URIs per call (capped at MAX_TRACKS_PER_ADD)
+    # @return: Dict with snapshot_id, added, failed_uris (known absent), unknown_uris and a per-chunk report
+    def add_tracks_chunked(self, access_token, playlist_id, uris, chunk_size=MAX_TRACKS_PER_ADD):
+        chunk_size = max(1, min(chunk_size, MAX_TRACKS_PER_ADD))
+        report = {"snapshot_id": None, "added": 0, "failed_uris": [], "unknown_uris": [], "chunks": []}
+        position = 0
+        blocked = None
+
+        # Chunks are sent one after another; each waits for the previous snapshot so order is kept.
+        # A POST that failed or timed out may still have been applied, so instead of blindly re-sending
+        # it the playlist is checked: a chunk that landed is counted, one that is known to be absent is
+        # sent again, and one whose fate cannot be told stops the run, since every later chunk's
+        # position would depend on it
+        for index, start in enumerate(range(0, len(uris), chunk_size)):
+            chunk = uris[start:start + chunk_size]
+            chunk_report = {"index": index, "start": start, "count": len(chunk), "ok": False, "state": "absent"}
+            if blocked is not None:
+                chunk_report["error"] = f"Not sent: chunk {blocked} may or may not have been added"
+                report["failed_uris"].extend(chunk)
+                report["chunks"].append(chunk_report)
+                continue
+
+            for attempt in range(MAX_CHUNK_ATTEMPTS):
+                try:
+                    snapshot_id = self.add_tracks(access_token, playlist_id, chunk, position=position)
+                    state = "added"
+                except SpotifyError as e:
+                    chunk_report["error"] = str(e)
+                    state, snapshot_id = self._chunk_state(
+                        access_token, playlist_id, report["snapshot_id"], position, len(chunk)
+                    )
+                if state != "absent":
+                    break
+
+            chunk_report.update(attempts=attempt + 1, state=state)
+            if state == "added":
+                chunk_report.update(ok=True, snapshot_id=snapshot_id)
+                report["snapshot_id"] = snapshot_id
+                report["added"] += len(chunk)
+                position += len(chunk)
+            elif state == "unknown":
+                report["unknown_uris"].extend(chunk)
+                blocked = index
+            else:
+                report["failed_uris"].extend(chunk)
+            report["chunks"].append(chunk_report)
+
+        return report
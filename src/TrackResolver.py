@@ -0,0 +1,207 @@
+import hashlib
+import re
+import threading
+import unicodedata
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from database.config import SessionLocal
+from database.models import Song, TrackLookup
+from database.playlist_store import UNKNOWN_ARTIST
+
+
+# Normalize a title or artist so cosmetic differences map to the same lookup
+# @param value: Raw title or artist string
+# @return: Lowercased, accent-free, punctuation-free, single-spaced string
+def normalize_track_text(value):
+    text = unicodedata.normalize("NFKD", str(value or ""))
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+# Stable lookup key for a (title, artist) pair
+# @return: Tuple of (SHA-256 hex key, normalized title, normalized artist)
+def track_lookup_key(title, artist):
+    norm_title = normalize_track_text(title)
+    norm_artist = normalize_track_text(artist)
+    key = hashlib.sha256(f"{norm_title}|{norm_artist}".encode("utf-8")).hexdigest()
+    return key, norm_title, norm_artist
+
+
+# Title and artist as a songs row stores them, folded the way MySQL's case-insensitive collation compares them
+# @return: (title, artist) tuple to query with, and its casefolded form to match returned rows on
+def _song_match_key(title, artist):
+    stored = (str(title or ""), str(artist or UNKNOWN_ARTIST))
+    return stored, (stored[0].casefold(), stored[1].casefold())
+
+
+class TrackResolver:
+    """
+    Resolves (title, artist) pairs to Spotify URIs through three layers:
+    an in-memory LRU, the track_lookups/songs tables, and finally Spotify search.
+
+    search_fn(access_token, songs) must return one (uri, ok) tuple per song,
+    where ok is False if the search itself failed (those are never cached).
+    """
+
+    def __init__(self, search_fn, lru_size=10000, ttl_seconds=30 * 86400, negative_ttl_seconds=86400):
+        self.search_fn = search_fn
+        self.lru_size = lru_size
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.negative_ttl = timedelta(seconds=negative_ttl_seconds)
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'db_hits': 0, 'searches': 0}
+        self._stats_lock = threading.Lock()
+
+    # resolve() runs on several request and job threads at once
+    def _count(self, stat, n=1):
+        with self._stats_lock:
+            self.stats[stat] += n
+
+    def _lru_get(self, key, now):
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None:
+                return False, None
+            uri, expires_at = entry
+            if expires_at <= now:
+                del self._lru[key]
+                return False, None
+            self._lru.move_to_end(key)
+            return True, uri
+
+    def _lru_put(self, key, uri, expires_at):
+        if self.lru_size <= 0:
+            return
+        with self._lock:
+            self._lru[key] = (uri, expires_at)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    # Resolve songs to Spotify URIs, searching only for pairs no layer has answered
+    # @param access_token: Spotify access token used for searches
+    # @param songs: List of (title, artist) tuples
+    # @return: List of URIs (or None) in the same order as songs
+    def resolve(self, access_token, songs):
+        now = datetime.utcnow()
+        keys = [track_lookup_key(title, artist) for title, artist in songs]
+        answers = {}
+
+        for key, _, _ in keys:
+            found, uri = self._lru_get(key, now)
+            if found:
+                answers[key] = uri
+                self._count('memory_hits')
+
+        pending = [(i, k) for i, k in enumerate(keys) if k[0] not in answers]
+        if pending:
+            try:
+                for key, uri, expires_at in self._lookup_db(songs, pending, now):
+                    if key not in answers:
+                        answers[key] = uri
+                        self._lru_put(key, uri, expires_at)
+                        self._count('db_hits')
+            except Exception as e:
+                print(f"⚠️  Track lookup cache read failed: {e}")
+
+        # Search each remaining distinct pair once
+        misses = OrderedDict()
+        for i, (key, norm_title, norm_artist) in enumerate(keys):
+            if key not in answers and key not in misses:
+                misses[key] = (songs[i], norm_title, norm_artist)
+        if misses:
+            self._count('searches', len(misses))
+            results = self.search_fn(access_token, [song for song, _, _ in misses.values()])
+            rows = []
+            for (key, (_, norm_title, norm_artist)), (uri, ok) in zip(misses.items(), results):
+                answers[key] = uri
+                if not ok:
+                    continue
+                expires_at = now + (self.ttl if uri else self.negative_ttl)
+                self._lru_put(key, uri, expires_at)
+                rows.append({
+                    'id': str(uuid.uuid4()),
+                    'lookup_key': key,
+                    'normalized_title': norm_title[:500],
+                    'normalized_artist': norm_artist[:500],
+                    'spotify_uri': uri,
+                    'resolved_at': now,
+                    'expires_at': expires_at
+                })
+            try:
+                self._store(rows)
+            except Exception as e:
+                print(f"⚠️  Track lookup cache write failed: {e}")
+
+        return [answers.get(key) for key, _, _ in keys]
+
+    def _lookup_db(self, songs, pending, now):
+        """
+        Yield (key, uri, expires_at) for pending pairs known to the database
+        """
+        db = SessionLocal()
+        try:
+            pending_keys = [k[0] for _, k in pending]
+            lookups = (
+                db.query(TrackLookup)
+                .filter(TrackLookup.lookup_key.in_(pending_keys))
+                .filter(TrackLookup.expires_at > now)
+                .all()
+            )
+            for lookup in lookups:
+                yield lookup.lookup_key, lookup.spotify_uri, lookup.expires_at
+
+            # Songs saved from earlier playlists already carry their Spotify URI
+            found = {lookup.lookup_key for lookup in lookups}
+            # Rows come back in whatever case they were stored in, so both sides are matched casefolded
+            stored_pairs = set()
+            remaining = {}
+            for i, k in pending:
+                if k[0] in found:
+                    continue
+                stored, folded = _song_match_key(*songs[i])
+                stored_pairs.add(stored)
+                remaining.setdefault(folded, set()).add(k[0])
+            if remaining:
+                saved = (
+                    db.query(Song.title, Song.artist, Song.audio_url, Song.spotify_track_id)
+                    .filter(tuple_(Song.title, Song.artist).in_(list(stored_pairs)))
+                    .all()
+                )
+                for title, artist, audio_url, spotify_track_id in saved:
+                    uri = audio_url if audio_url and audio_url.startswith('spotify:track:') else (
+                        f"spotify:track:{spotify_track_id}" if spotify_track_id else None
+                    )
+                    if not uri:
+                        continue
+                    for key in remaining.pop(_song_match_key(title, artist)[1], ()):
+                        yield key, uri, now + self.ttl
+        finally:
+            db.close()
+
+    def _store(self, rows):
+        """
+        Upsert freshly searched resolutions into track_lookups
+        """
+        if not rows:
+            return
+        db = SessionLocal()
+        try:
+            stmt = mysql_insert(TrackLookup).values(rows)
+            stmt = stmt.on_duplicate_key_update(
+                spotify_uri=stmt.inserted.spotify_uri,
+                resolved_at=stmt.inserted.resolved_at,
+                expires_at=stmt.inserted.expires_at
+            )
+            db.execute(stmt)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
@@ -0,0 +1,120 @@
+import json
+import os
+import numpy as np
+
+
+# File names written by chroma/chromaInit.py
+EMBEDDINGS_FILE = "spotify_embeddings.npy"
+IDS_FILE = "spotify_ids.json"
+METADATA_FILE = "spotify_metadata.json"
+
+# Catalog rows scored per block; bounds the size of the score matrix
+DEFAULT_BLOCK_ROWS = 131072
+
+
+class NumpyVectorIndex:
+    """
+    Exact top-k search over a memory-mapped embedding matrix.
+
+    Distances are squared L2, the same metric the Chroma collection uses,
+    so both backends rank songs identically.
+    """
+
+    def __init__(self, embeddings, ids, metadatas, block_rows=DEFAULT_BLOCK_ROWS, scales=None, sq_norms=None):
+        if len(embeddings) != len(ids) or len(ids) != len(metadatas):
+            raise ValueError(
+                f"Index files disagree: {len(embeddings)} embeddings, {len(ids)} ids, {len(metadatas)} metadatas"
+            )
+        self.embeddings = embeddings
+        self.ids = ids
+        self.metadatas = metadatas
+        self.block_rows = block_rows
+        # Per-row dequantization factors for int8 embeddings (see IndexBundle.quantize)
+        self.scales = scales
+        # Squared norms are needed for every query; compute them once per load unless stored alongside
+        self.sq_norms = sq_norms if sq_norms is not None else self._row_sq_norms(embeddings, block_rows, scales)
+
+    # Load an index from the files written by chromaInit.py, or from an index bundle
+    # @param index_dir: Directory containing the embedding, id and metadata files, or a bundle directory
+    # @return: NumpyVectorIndex backed by a read-only memory map
+    @classmethod
+    def load(cls, index_dir, block_rows=DEFAULT_BLOCK_ROWS):
+        from IndexBundle import MANIFEST_FILE, load_bundle
+
+        if os.path.exists(os.path.join(index_dir, MANIFEST_FILE)):
+            return load_bundle(index_dir, block_rows=block_rows)
+        embeddings = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode="r")
+        with open(os.path.join(index_dir, IDS_FILE), "r") as f:
+            ids = json.load(f)
+        with open(os.path.join(index_dir, METADATA_FILE), "r") as f:
+            metadatas = json.load(f)
+        return cls(embeddings, ids, metadatas, block_rows=block_rows)
+
+    @staticmethod
+    def _block(embeddings, scales, start, stop):
+        block = np.asarray(embeddings[start:stop], dtype=np.float32)
+        if scales is not None:
+            block = block * np.asarray(scales[start:stop])[:, None]
+        return block
+
+    @classmethod
+    def _row_sq_norms(cls, embeddings, block_rows, scales=None):
+        sq_norms = np.empty(len(embeddings), dtype=np.float32)
+        for start in range(0, len(embeddings), block_rows):
+            block = cls._block(embeddings, scales, start, start + block_rows)
+            sq_norms[start:start + len(block)] = np.einsum("ij,ij->i", block, block)
+        return sq_norms
+
+    def __len__(self):
+        return len(self.ids)
+
+    # Exact top-k search for a batch of query embeddings
+    # @param query_embeddings: Array of shape (n_queries, dim) or (dim,)
+    # @param top_k: Number of nearest rows to return per query
+    # @return: Tuple of (indices, distances), each of shape (n_queries, k), nearest first
+    def search(self, query_embeddings, top_k=5):
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        n_queries = queries.shape[0]
+        k = min(top_k, len(self))
+        if k <= 0:
+            return np.empty((n_queries, 0), dtype=np.int64), np.empty((n_queries, 0), dtype=np.float32)
+
+        query_sq_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+        best_idx = np.empty((n_queries, 0), dtype=np.int64)
+        best_dist = np.empty((n_queries, 0), dtype=np.float32)
+
+        # Score the catalog block by block and keep a running top-k per query
+        for start in range(0, len(self), self.block_rows):
+            block = np.asarray(self.embeddings[start:start + self.block_rows], dtype=np.float32)
+            dots = queries @ block.T
+            if self.scales is not None:
+                # Scaling the (n_queries, rows) scores is cheaper than dequantizing the (rows, dim) block
+                dots *= self.scales[start:start + len(block)]
+            dist = query_sq_norms - 2.0 * dots + self.sq_norms[start:start + len(block)]
+
+            block_k = min(k, dist.shape[1])
+            part = np.argpartition(dist, block_k - 1, axis=1)[:, :block_k]
+            part_dist = np.take_along_axis(dist, part, axis=1)
+
+            cand_idx = np.concatenate([best_idx, part + start], axis=1)
+            cand_dist = np.concatenate([best_dist, part_dist], axis=1)
+            if cand_idx.shape[1] > k:
+                keep = np.argpartition(cand_dist, k - 1, axis=1)[:, :k]
+                cand_idx = np.take_along_axis(cand_idx, keep, axis=1)
+                cand_dist = np.take_along_axis(cand_dist, keep, axis=1)
+            best_idx, best_dist = cand_idx, cand_dist
+
+        order = np.argsort(best_dist, axis=1)
+        return np.take_along_axis(best_idx, order, axis=1), np.take_along_axis(best_dist, order, axis=1)
+
+    # Search and return metadata in the same shape as a Chroma query result
+    # @param query_embeddings: Array of shape (n_queries, dim)
+    # @param top_k: Number of results per query
+    # @return: Dict with 'ids', 'distances' and 'metadatas', one inner list per query
+    def query(self, query_embeddings, top_k=5):
+        indices, distances = self.search(query_embeddings, top_k)
+        return {
+            "ids": [[self.ids[i] for i in row] for row in indices],
+            "distances": distances.tolist(),
+            "metadatas": [[self.metadatas[i] for i in row] for row in indices],
+        }
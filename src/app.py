@@ -2,20 +2,61 @@ import base64
 import hashlib
 import os
 import secrets
+import threading
 import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 from urllib.parse import urlencode
 from LlamaClient import LlamaClient
+from ChromaClient import warmup as warmup_search
+from config import (
+    WARMUP_SEARCH,
+    PIPELINE_CACHE_ENABLED,
+    PIPELINE_CACHE_TTL_SECONDS,
+    PIPELINE_CACHE_MAX_ENTRIES,
+    PIPELINE_CACHE_MAX_DISTANCE,
+    JOB_WORKERS,
+    JOB_MAX_PENDING,
+    JOB_HEARTBEAT_SECONDS,
+    JOB_STALE_SECONDS,
+    SPOTIFY_RESOLVE_WORKERS,
+    SPOTIFY_RATE_PER_SECOND,
+    SPOTIFY_RATE_BURST,
+    SPOTIFY_MAX_RETRIES,
+    SPOTIFY_MAX_RETRY_AFTER_SECONDS,
+    TRACK_CACHE_SIZE,
+    TRACK_CACHE_TTL_SECONDS,
+    TRACK_CACHE_NEGATIVE_TTL_SECONDS,
+    PLAYLISTS_PAGE_SIZE,
+    PLAYLISTS_MAX_PAGE_SIZE,
+    PLAYLIST_RESPONSE_CACHE_SIZE,
+    IMAGE_MAX_EDGE,
+    IMAGE_JPEG_QUALITY,
+    IMAGE_MAX_PIXELS,
+    COVER_GC_INTERVAL_SECONDS,
+    COVER_GC_GRACE_SECONDS,
+)
 
-import requests
 from dotenv import load_dotenv
-from flask import Flask, redirect, render_template, request, session, url_for, jsonify
+from flask import Flask, redirect, render_template, request, session, url_for, jsonify, send_file
+from sqlalchemy import event
+from sqlalchemy.orm import selectinload
 
 # Database imports
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database.config import SessionLocal, test_connection
-from database.models import User, Playlist, Song, PlaylistSong
+from database.models import User, Playlist, PlaylistSong, PlaylistJob
+from database.models.playlist import COVER_THUMBNAIL_SIZES, COVER_VARIANT_URL_PREFIX
+from database.playlist_store import save_generated_playlist, dedupe_tracks, list_playlist_summaries, get_playlist_page
+from PipelineCache import PipelineCache, image_dhash
+from JobQueue import JobQueue, JobFailed, report_progress, fail_stale_jobs
+from TrackResolver import TrackResolver
+from SpotifyClient import SpotifyClient, SpotifyError, SPOTIFY_API_BASE, SPOTIFY_TOKEN_URL
+from ResponseCache import ResponseCache, playlist_etag
+from ImagePreprocessor import preprocess_image, ImageRejected
+from CoverStore import CoverStore
 
 # Use absolute paths for template and static folders
 _base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -34,15 +75,114 @@ if test_connection():
 else:
     print("⚠️  Database connection failed - check your .env settings")
 
+# Optionally load the embedding model and song index before the first upload
+if WARMUP_SEARCH:
+  try:
+    timings = warmup_search()
+    print("✓ Search warmed up: " + ", ".join(f"{k}={v:.2f}s" for k, v in timings.items()))
+  except Exception as e:
+    print(f"⚠️  Search warmup failed: {e}")
+
 SPOTIFY_CLIENT_ID = os.getenv("CLIENT_ID")
 SPOTIFY_REDIRECT_URI = os.getenv("REDIRECT_URI")
 SPOTIFY_SCOPES = "user-read-email user-read-private playlist-read-private playlist-modify-public playlist-modify-private"
 SPOTIFY_AUTH_URL = "https://accounts.spotify.com/authorize"
-SPOTIFY_TOKEN_URL = "https://accounts.spotify.com/api/token"
-SPOTIFY_API_BASE = "https://api.spotify.com/v1"
 _PENDING_AUTH = {}
 _PENDING_AUTH_TTL_SECONDS = 600
 
+# One client per process so every request shares the rate budget and connection pool
+_spotify = SpotifyClient(
+    client_id=SPOTIFY_CLIENT_ID,
+    api_base=os.getenv("SPOTIFY_API_BASE", SPOTIFY_API_BASE),
+    token_url=os.getenv("SPOTIFY_TOKEN_URL", SPOTIFY_TOKEN_URL),
+    rate_per_second=SPOTIFY_RATE_PER_SECOND,
+    burst=SPOTIFY_RATE_BURST,
+    max_retries=SPOTIFY_MAX_RETRIES,
+    max_retry_after=SPOTIFY_MAX_RETRY_AFTER_SECONDS,
+    pool_size=max(SPOTIFY_RESOLVE_WORKERS, 10),
+)
+
+_pipeline_cache = PipelineCache(
+    ttl_seconds=PIPELINE_CACHE_TTL_SECONDS,
+    max_entries=PIPELINE_CACHE_MAX_ENTRIES,
+    max_distance=PIPELINE_CACHE_MAX_DISTANCE,
+)
+
+_job_queue = JobQueue(max_workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING)
+
+
+def _sweep_stale_jobs() -> None:
+  try:
+    swept = fail_stale_jobs(JOB_STALE_SECONDS)
+    if swept:
+      print(f"✓ Marked {swept} orphaned playlist jobs as failed")
+  except Exception as e:
+    print(f"⚠️  Stale job sweep failed: {e}")
+
+
+def _job_heartbeat_loop() -> None:
+  while True:
+    time.sleep(JOB_HEARTBEAT_SECONDS)
+    try:
+      _job_queue.heartbeat()
+    except Exception as e:
+      print(f"⚠️  Job heartbeat failed: {e}")
+    _sweep_stale_jobs()
+
+
+# Jobs left queued or running by a process that died are failed at startup and then periodically
+_sweep_stale_jobs()
+if JOB_HEARTBEAT_SECONDS > 0:
+  threading.Thread(target=_job_heartbeat_loop, name="job-heartbeat", daemon=True).start()
+
+_playlist_response_cache = ResponseCache(max_size=PLAYLIST_RESPONSE_CACHE_SIZE)
+
+_cover_store = CoverStore(
+    os.path.join(_base_dir, "static", "playlist_covers"),
+    url_prefix="/playlist_covers",
+    thumbnail_sizes=COVER_THUMBNAIL_SIZES,
+)
+
+
+def _collect_cover_garbage() -> dict:
+  """Delete stored covers that no playlist (deleted or not) points at."""
+  db = SessionLocal()
+  try:
+    referenced = [url for (url,) in db.query(Playlist.cover_image).filter(Playlist.cover_image.isnot(None)).distinct()]
+  finally:
+    db.close()
+  return _cover_store.collect_garbage(referenced, grace_seconds=COVER_GC_GRACE_SECONDS)
+
+
+def _cover_gc_loop() -> None:
+  while True:
+    time.sleep(COVER_GC_INTERVAL_SECONDS)
+    try:
+      stats = _collect_cover_garbage()
+      if stats["removed"]:
+        print(f"✓ Removed {stats['removed']} unreferenced covers ({stats['bytes_freed']} bytes)")
+    except Exception as e:
+      print(f"⚠️  Cover garbage collection failed: {e}")
+
+
+if COVER_GC_INTERVAL_SECONDS > 0:
+  threading.Thread(target=_cover_gc_loop, name="cover-gc", daemon=True).start()
+
+
+# Drop cached detail responses as soon as this process writes a playlist or its songs;
+# writes from other processes are caught by the ETag check on the next request
+@event.listens_for(Playlist, 'after_update')
+@event.listens_for(Playlist, 'after_delete')
+def _invalidate_playlist_response(mapper, connection, target):
+  _playlist_response_cache.invalidate(target.id)
+
+
+@event.listens_for(PlaylistSong, 'after_insert')
+@event.listens_for(PlaylistSong, 'after_update')
+@event.listens_for(PlaylistSong, 'after_delete')
+def _invalidate_playlist_song_response(mapper, connection, target):
+  _playlist_response_cache.invalidate(target.playlist_id)
+
 
 def _generate_code_verifier(length: int = 64) -> str:
   """Create a high-entropy string for Proof Key for Code Exchange."""
@@ -68,17 +208,17 @@ def _store_token(token_payload: dict) -> None:
 
 
 def _fetch_spotify_profile(access_token: str) -> Optional[dict]:
-  headers = {"Authorization": f"Bearer {access_token}"}
-  response = requests.get(f"{SPOTIFY_API_BASE}/me", headers=headers, timeout=10)
-  if response.status_code == 200:
-    data = response.json()
-    return {
-        "display_name": data.get("display_name") or data.get("id"),
-        "id": data.get("id"),
-        "email": data.get("email"),
-        "images": data.get("images", []),
-    }
-  return None
+  try:
+    data = _spotify.get_profile(access_token)
+  except SpotifyError as e:
+    print(f"⚠️  Fetching Spotify profile failed: {e}")
+    return None
+  return {
+      "display_name": data.get("display_name") or data.get("id"),
+      "id": data.get("id"),
+      "email": data.get("email"),
+      "images": data.get("images", []),
+  }
 
 
 def _ensure_access_token() -> Optional[str]:
@@ -98,18 +238,12 @@ def _ensure_access_token() -> Optional[str]:
     return token.get("access_token")
 
   print("🔄 Refreshing access token...")
-  data = {
-      "grant_type": "refresh_token",
-      "refresh_token": refresh_token,
-      "client_id": SPOTIFY_CLIENT_ID,
-  }
-  headers = {"Content-Type": "application/x-www-form-urlencoded"}
-  resp = requests.post(SPOTIFY_TOKEN_URL, data=data, headers=headers, timeout=10)
-  if resp.status_code != 200:
-    print(f"⚠️  Token refresh failed: {resp.status_code}")
+  try:
+    refreshed = _spotify.refresh_token(refresh_token)
+  except SpotifyError as e:
+    print(f"⚠️  Token refresh failed: {e.status_code or e}")
     return token.get("access_token")
 
-  refreshed = resp.json()
   # Spotify may not return a new refresh token; reuse the existing one.
   if "refresh_token" not in refreshed:
     refreshed["refresh_token"] = refresh_token
@@ -134,27 +268,46 @@ def _mock_pipeline_from_image(_image_file) -> dict:
   }
 
 
-def _spotify_headers(access_token: str) -> dict:
-  return {"Authorization": f"Bearer {access_token}"}
+def _resolve_track_uri(access_token: str, name: str, artist: Optional[str] = None) -> Optional[str]:
+  """Search Spotify for a track; None means no match, errors raise SpotifyError."""
+  return _spotify.search_track(access_token, name, artist)
 
 
-def _resolve_track_uri(access_token: str, name: str, artist: Optional[str] = None) -> Optional[str]:
-  q = name
-  if artist:
-    q = f"{name} artist:{artist}"
-  params = {"q": q, "type": "track", "limit": 1}
-  resp = requests.get(
-      f"{SPOTIFY_API_BASE}/search",
-      headers=_spotify_headers(access_token),
-      params=params,
-      timeout=10,
+def _search_track_uris(access_token: str, songs: list[tuple[str, Optional[str]]]) -> list[tuple[Optional[str], bool]]:
+  """Search (name, artist) pairs concurrently; returns (uri, ok) in input order, ok=False if the search failed."""
+  if not songs:
+    return []
+
+  def search(song):
+    name, artist = song
+    started = time.perf_counter()
+    try:
+      uri, ok = _resolve_track_uri(access_token, name=name, artist=artist), True
+    except SpotifyError as e:
+      print(f"⚠️  Track search failed for '{name}': {e}")
+      uri, ok = None, False
+    return uri, ok, time.perf_counter() - started
+
+  started = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=min(SPOTIFY_RESOLVE_WORKERS, len(songs))) as pool:
+    results = list(pool.map(search, songs))
+  total = time.perf_counter() - started
+
+  timings = [elapsed for _, _, elapsed in results]
+  print(
+      f"Searched {len(songs)} tracks, {sum(1 for uri, _, _ in results if uri)} found, in {total * 1000:.0f}ms "
+      f"(per call: min {min(timings) * 1000:.0f}ms, max {max(timings) * 1000:.0f}ms, "
+      f"sum {sum(timings) * 1000:.0f}ms)"
   )
-  if resp.status_code != 200:
-    return None
-  items = resp.json().get("tracks", {}).get("items", [])
-  if not items:
-    return None
-  return items[0].get("uri")
+  return [(uri, ok) for uri, ok, _ in results]
+
+
+_track_resolver = TrackResolver(
+    _search_track_uris,
+    lru_size=TRACK_CACHE_SIZE,
+    ttl_seconds=TRACK_CACHE_TTL_SECONDS,
+    negative_ttl_seconds=TRACK_CACHE_NEGATIVE_TTL_SECONDS,
+)
 
 
 def _create_spotify_playlist(access_token: str, user_id: str, name: str, description: str = "") -> Optional[str]:
@@ -172,30 +325,50 @@ def _create_spotify_playlist(access_token: str, user_id: str, name: str, descrip
   print(f"Creating playlist with payload: {payload}")
 
   # Use /me/playlists instead of /users/{user_id}/playlists (deprecated endpoint)
-  resp = requests.post(
-      f"{SPOTIFY_API_BASE}/me/playlists",
-      headers={**_spotify_headers(access_token), "Content-Type": "application/json"},
-      json=payload,
-      timeout=10,
-  )
-  if resp.status_code not in (200, 201):
-    print(f"Failed to create playlist. Status: {resp.status_code}, Response: {resp.text}")
-    print(f"Request headers: {_spotify_headers(access_token)}")
+  try:
+    return _spotify.create_playlist(access_token, **payload)
+  except SpotifyError as e:
+    print(f"Failed to create playlist. Status: {e.status_code}, Error: {e}")
     print(f"Request payload: {payload}")
     return None
-  return resp.json().get("id")
 
 
-def _add_tracks_to_playlist(access_token: str, playlist_id: str, uris: list[str]) -> bool:
-  if not uris:
-    return True
-  resp = requests.post(
-      f"{SPOTIFY_API_BASE}/playlists/{playlist_id}/tracks",
-      headers={**_spotify_headers(access_token), "Content-Type": "application/json"},
-      json={"uris": uris},
-      timeout=10,
-  )
-  return resp.status_code in (200, 201)
+def _add_tracks_to_playlist(access_token: str, playlist_id: str, uris: list[str]) -> dict:
+  """Add tracks in ordered chunks of up to 100; returns the per-chunk report."""
+  report = _spotify.add_tracks_chunked(access_token, playlist_id, uris)
+  for chunk in report["chunks"]:
+    if not chunk["ok"]:
+      print(f"Failed to add tracks {chunk['start']}-{chunk['start'] + chunk['count'] - 1} "
+            f"({chunk['state']}): {chunk.get('error')}")
+  return report
+
+
+def _run_cached_pipeline(image_path: str) -> tuple[list, list]:
+  """Run the AI pipeline, reusing the cached result for the same or a near-identical image."""
+  image_hash = None
+  if PIPELINE_CACHE_ENABLED:
+    try:
+      image_hash = image_dhash(image_path)
+      cached = _pipeline_cache.lookup(image_hash)
+      if cached:
+        print(f"✓ Pipeline cache hit for image hash {image_hash:016x}")
+        return cached["songs"], cached["descriptors"]
+    except Exception as e:
+      print(f"⚠️  Pipeline cache lookup failed: {e}")
+
+  llamaClient_instance = LlamaClient()
+  print("LlamaClient instance created")
+
+  # Call the AI pipeline with the temporary file path
+  result = llamaClient_instance.run_stages(image_path)
+
+  if image_hash is not None:
+    try:
+      _pipeline_cache.store(image_hash, result)
+    except Exception as e:
+      print(f"⚠️  Pipeline cache store failed: {e}")
+
+  return result["songs"], result["descriptors"]
 
 @app.context_processor
 def inject_spotify_profile():
@@ -224,43 +397,63 @@ def playlists():
   if user_id:
     db = SessionLocal()
     try:
-      user = db.query(User).filter(User.id == user_id).first()
-      if user:
-        # Get all non-deleted playlists with song counts
-        user_playlists = [
-          {
-            'id': p.id,
-            'name': p.name,
-            'description': p.description,
-            'song_count': len([ps for ps in p.playlist_songs if ps.song]),
-            'cover_image': p.cover_image,
-            'created_at': p.created_at.isoformat() if p.created_at else None
-          }
-          for p in user.playlists if not p.deleted_at
-        ]
-        # Sort by most recent first
-        user_playlists.sort(key=lambda x: x['created_at'] or '', reverse=True)
+      user_playlists = list_playlist_summaries(db, user_id)
     finally:
       db.close()
 
   return render_template("playlists.html", user_playlists=user_playlists)
 
 
+# Opaque keyset cursor for the playlist listing
+# @param created_at: created_at of the last playlist on the page
+# @param playlist_id: id of the last playlist on the page
+# @return: URL-safe cursor string
+def _encode_playlist_cursor(created_at, playlist_id):
+  raw = f"{created_at.isoformat()}|{playlist_id}".encode("utf-8")
+  return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+# @param cursor: String produced by _encode_playlist_cursor
+# @return: (created_at, playlist_id)
+# @raise ValueError: If the cursor is malformed
+def _decode_playlist_cursor(cursor):
+  try:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    created_at, playlist_id = raw.split("|", 1)
+    return datetime.fromisoformat(created_at), playlist_id
+  except Exception as e:
+    raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
 @app.route("/api/my-playlists")
 def get_my_playlists():
-  """Get user's playlists from database"""
+  """Get a page of the user's playlists from database, newest first"""
+  # ?limit= (capped at PLAYLISTS_MAX_PAGE_SIZE), ?cursor= (next_cursor of the previous page),
+  # ?include_songs=false to leave out song lists
   user_id = session.get('user_id')
   if not user_id:
     return jsonify({"error": "Not authenticated"}), 401
 
+  try:
+    limit = int(request.args.get("limit", PLAYLISTS_PAGE_SIZE))
+    cursor = request.args.get("cursor")
+    after = _decode_playlist_cursor(cursor) if cursor else None
+  except ValueError as e:
+    return jsonify({"error": str(e)}), 400
+  limit = max(1, min(limit, PLAYLISTS_MAX_PAGE_SIZE))
+  include_songs = request.args.get("include_songs", "true").lower() not in ("0", "false", "no")
+
   db = SessionLocal()
   try:
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
       return jsonify({"error": "User not found"}), 404
 
-    playlists = [p.to_dict(include_songs=True) for p in user.playlists if not p.deleted_at]
-    return jsonify({"playlists": playlists, "count": len(playlists)})
+    page, has_more = get_playlist_page(db, user_id, limit, after=after, include_songs=include_songs)
+    next_cursor = _encode_playlist_cursor(page[-1].created_at, page[-1].id) if has_more else None
+
+    playlists = [p.to_dict(include_songs=include_songs) for p in page]
+    return jsonify({"playlists": playlists, "count": len(playlists), "next_cursor": next_cursor})
   finally:
     db.close()
 
@@ -270,11 +463,34 @@ def get_playlist_details(playlist_id):
   """Get detailed playlist info from database"""
   db = SessionLocal()
   try:
-    playlist = db.query(Playlist).filter(Playlist.id == playlist_id).first()
-    if not playlist:
+    # Only the version columns are read up front; unchanged playlists stop here
+    version = db.query(Playlist.updated_at, Playlist.song_count).filter(Playlist.id == playlist_id).first()
+    if not version:
       return jsonify({"error": "Playlist not found"}), 404
 
-    return jsonify(playlist.to_dict(include_songs=True))
+    etag = playlist_etag(playlist_id, *version)
+    if request.if_none_match.contains_weak(etag.strip('"')):
+      response = app.response_class(status=304)
+    else:
+      body = _playlist_response_cache.get(playlist_id, etag)
+      if body is None:
+        playlist = (
+            db.query(Playlist)
+            .options(selectinload(Playlist.playlist_songs).selectinload(PlaylistSong.song))
+            .filter(Playlist.id == playlist_id)
+            .first()
+        )
+        if not playlist:
+          return jsonify({"error": "Playlist not found"}), 404
+        body = jsonify(playlist.to_dict(include_songs=True)).get_data()
+        # Tag with the version the body was actually built from
+        etag = playlist_etag(playlist.id, playlist.updated_at, playlist.song_count)
+        _playlist_response_cache.put(playlist_id, etag, body)
+      response = app.response_class(body, mimetype="application/json")
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
   finally:
     db.close()
 
@@ -290,189 +506,197 @@ def create_playlist_from_image():
   if not image_file:
     return jsonify({"error": "Image file is required."}), 400
 
-  # Save uploaded image to a temporary file for processing
-  import tempfile
-  with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(image_file.filename)[1]) as tmp_file:
-    image_file.save(tmp_file.name)
-    temp_image_path = tmp_file.name
+  # Validate, strip EXIF and downsample the upload straight from the request stream;
+  # the JPEG is written once, under its content hash, and is both the cover and the vision input
+  try:
+    _, image_path, cover_image_url, info = _cover_store.save(
+        lambda out: preprocess_image(
+            image_file.stream, out,
+            max_edge=IMAGE_MAX_EDGE, quality=IMAGE_JPEG_QUALITY, max_pixels=IMAGE_MAX_PIXELS,
+        )
+    )
+    print(f"Preprocessed {info['format']} {info['original_size']} -> {info['size']}, {info['bytes']} bytes")
+  except ImageRejected as e:
+    return jsonify({"error": str(e)}), 400
 
-  # Also save a permanent copy for the playlist cover
-  import uuid as uuid_lib
-  permanent_filename = f"{uuid_lib.uuid4()}{os.path.splitext(image_file.filename)[1]}"
-  permanent_image_dir = os.path.join(_base_dir, "static", "playlist_covers")
-  os.makedirs(permanent_image_dir, exist_ok=True)
-  permanent_image_path = os.path.join(permanent_image_dir, permanent_filename)
+  user_id = session.get('user_id')
+  try:
+    job_id = _job_queue.submit(
+        lambda job_id: _build_playlist_from_image(
+            job_id, image_path, cover_image_url, access_token, profile, user_id
+        ),
+        user_id=user_id,
+    )
+  except Exception as e:
+    print(f"✗ Error creating playlist job: {e}")
+    return jsonify({"error": "Could not queue playlist job."}), 500
 
-  # Copy the temp file to permanent location
-  import shutil
-  shutil.copy2(temp_image_path, permanent_image_path)
+  if not job_id:
+    return jsonify({"error": "Too many uploads in progress. Try again shortly."}), 503
 
-  # Store relative path for use in templates
-  cover_image_url = f"/playlist_covers/{permanent_filename}"
+  return jsonify({
+      "job_id": job_id,
+      "status": PlaylistJob.STATUS_QUEUED,
+      "status_url": url_for("get_job_status", job_id=job_id),
+  }), 202
 
-  try:
-    llamaClient_instance = LlamaClient()
-    print("LlamaClient instance created")
-
-    # Call the AI pipeline with the temporary file path
-    pipeline_result, descriptors = llamaClient_instance.pipeline(temp_image_path)
-    print(f"Pipeline completed. Result type: {type(pipeline_result)}, Descriptors: {descriptors}")
-
-    # Generate playlist name with validation
-    if descriptors:
-        # Join descriptors and clean up
-        playlist_name = " ".join(str(d).strip() for d in descriptors if str(d).strip())
-
-        # Remove newlines and extra whitespace that Spotify doesn't accept
-        playlist_name = " ".join(playlist_name.split())
-
-        # Remove any leading text like "Here are 15 keywords..." and get just the actual keywords
-        if ":" in playlist_name:
-            # Split by colon and take the last part (the actual keywords)
-            parts = playlist_name.split(":")
-            playlist_name = parts[-1].strip()
-    else:
-        playlist_name = "New Playlist"
-
-    # Ensure playlist name is not empty and within Spotify's limits (max 100 characters)
-    playlist_name = playlist_name.strip()
-    if not playlist_name:
-        playlist_name = "New Playlist"
-    if len(playlist_name) > 100:
-        playlist_name = playlist_name[:100].strip()
-
-    print(f"Generated playlist name: '{playlist_name}'")
-    print(f"Playlist name length: {len(playlist_name)}")
-
-    # Create the playlist on Spotify.
-    if descriptors:
-        # Clean descriptors for description (remove newlines and extra whitespace)
-        clean_descriptors = [" ".join(str(d).split()) for d in descriptors]
-        playlist_description = "Created by IBMRS from an uploaded image. Descriptors: " + ", ".join(clean_descriptors)
-    else:
-        playlist_description = "Created by IBMRS from an uploaded image."
 
-    # Ensure description doesn't exceed Spotify's limit (300 chars)
-    if len(playlist_description) > 300:
-        playlist_description = playlist_description[:297] + "..."
+@app.route(f"{COVER_VARIANT_URL_PREFIX}/<name>")
+def get_cover_variant(name):
+  """Serve a cover or thumbnail by content hash; the URL changes whenever the bytes do, so it is cached forever"""
+  path = _cover_store.variant_path(name)
+  if not path:
+    return jsonify({"error": "Cover not found"}), 404
+  response = send_file(path, mimetype="image/jpeg", max_age=31536000)
+  response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+  return response
 
-    print(f"Playlist description: {playlist_description}")
 
-    playlist_id = _create_spotify_playlist(
-        access_token=access_token,
-        user_id=profile.get("id"),
-        name=playlist_name,
-        description=playlist_description,
-    )
-    print(f"Playlist created with ID: {playlist_id}")
-
-    if not playlist_id:
-      return jsonify({"error": "Failed to create playlist on Spotify."}), 502
-
-    # Resolve song URIs and add them.
-    track_uris = []
-    resolved_tracks = []
-    for song in pipeline_result:
-      print("Song from pipeline:", song,"Artists:", song.get("artists") if isinstance(song, dict) else None)
-      name = song.get("name") if isinstance(song, dict) else None
-      artists = song.get("artists") if isinstance(song, dict) else None  # Note: plural "artists"
-      if not name:
-        continue
-      uri = _resolve_track_uri(access_token, name=name, artist=artists)
-      if uri:
-        track_uris.append(uri)
-        resolved_tracks.append({"name": name, "artist": artists, "uri": uri})
-
-    if track_uris:
-      added = _add_tracks_to_playlist(access_token, playlist_id, track_uris)
-      if not added:
-        return jsonify({"error": "Playlist created, but adding tracks failed."}), 502
-
-    # Save playlist and songs to database
-    db = SessionLocal()
-    try:
-        user_id = session.get('user_id')
-        if user_id:
-            # Create playlist record
-            db_playlist = Playlist(
-                name=playlist_name,
-                description=playlist_description,
-                is_public=False,
-                cover_image=cover_image_url,
-                user_id=user_id
-            )
-            db.add(db_playlist)
-            db.commit()
+@app.route("/api/metrics/spotify")
+def get_spotify_metrics():
+  """Per-endpoint Spotify latency, error and retry counters for this process"""
+  return jsonify({"endpoints": _spotify.metrics()})
 
-            # Deduplicate tracks by URI to prevent duplicate playlist entries
-            seen_uris = set()
-            unique_tracks = []
-            for track in resolved_tracks:
-                if track['uri'] not in seen_uris:
-                    seen_uris.add(track['uri'])
-                    unique_tracks.append(track)
-
-            # Add songs to database and link to playlist
-            for idx, track in enumerate(unique_tracks):
-                # Extract Spotify track ID from URI (format: spotify:track:TRACK_ID)
-                spotify_track_id = track['uri'].split(':')[-1] if ':' in track['uri'] else None
-
-                # Check if song exists by Spotify track ID
-                song = None
-                if spotify_track_id:
-                    song = db.query(Song).filter(Song.spotify_track_id == spotify_track_id).first()
-
-                if not song:
-                    # Create new song
-                    song = Song(
-                        spotify_track_id=spotify_track_id,
-                        title=track['name'],
-                        artist=track.get('artist', 'Unknown Artist'),
-                        audio_url=track['uri']
-                    )
-                    db.add(song)
-                    db.commit()
-
-                # Link song to playlist
-                playlist_song = PlaylistSong(
-                    playlist_id=db_playlist.id,
-                    song_id=song.id,
-                    order=idx
-                )
-                db.add(playlist_song)
 
-            db.commit()
-            duplicates_removed = len(resolved_tracks) - len(unique_tracks)
-            if duplicates_removed > 0:
-                print(f"✓ Saved playlist '{playlist_name}' with {len(unique_tracks)} unique songs to database ({duplicates_removed} duplicates removed)")
-            else:
-                print(f"✓ Saved playlist '{playlist_name}' with {len(unique_tracks)} songs to database")
-    except Exception as e:
-        print(f"✗ Error saving playlist to database: {e}")
-        import traceback
-        traceback.print_exc()
-        db.rollback()
-    finally:
-        db.close()
+@app.route("/api/jobs/<job_id>")
+def get_job_status(job_id):
+  """Get status and, once finished, the result of a playlist job"""
+  db = SessionLocal()
+  try:
+    job = db.query(PlaylistJob).filter(PlaylistJob.id == job_id).first()
+    if not job or (job.user_id and job.user_id != session.get('user_id')):
+      return jsonify({"error": "Job not found"}), 404
 
-    return jsonify(
-        {
-            "playlist_id": playlist_id,
-            "playlist_name": playlist_name,
-            "descriptors": descriptors,
-            "tracks": resolved_tracks,
-            "track_count": len(track_uris),
-        }
-    )
+    return jsonify(job.to_dict())
+  finally:
+    db.close()
+
+
+def _build_playlist_from_image(job_id: str, image_path: str, cover_image_url: str,
+                               access_token: str, profile: dict, user_id: Optional[str]) -> dict:
+  """Run the image-to-playlist flow for a queued job and return the response body."""
+  report_progress(job_id, "Analyzing image", 10)
+  pipeline_result, descriptors = _run_cached_pipeline(image_path)
+  print(f"Pipeline completed. Result type: {type(pipeline_result)}, Descriptors: {descriptors}")
+
+  # Generate playlist name with validation
+  if descriptors:
+      # Join descriptors and clean up
+      playlist_name = " ".join(str(d).strip() for d in descriptors if str(d).strip())
+
+      # Remove newlines and extra whitespace that Spotify doesn't accept
+      playlist_name = " ".join(playlist_name.split())
+
+      # Remove any leading text like "Here are 15 keywords..." and get just the actual keywords
+      if ":" in playlist_name:
+          # Split by colon and take the last part (the actual keywords)
+          parts = playlist_name.split(":")
+          playlist_name = parts[-1].strip()
+  else:
+      playlist_name = "New Playlist"
+
+  # Ensure playlist name is not empty and within Spotify's limits (max 100 characters)
+  playlist_name = playlist_name.strip()
+  if not playlist_name:
+      playlist_name = "New Playlist"
+  if len(playlist_name) > 100:
+      playlist_name = playlist_name[:100].strip()
+
+  print(f"Generated playlist name: '{playlist_name}'")
+  print(f"Playlist name length: {len(playlist_name)}")
+
+  # Create the playlist on Spotify.
+  if descriptors:
+      # Clean descriptors for description (remove newlines and extra whitespace)
+      clean_descriptors = [" ".join(str(d).split()) for d in descriptors]
+      playlist_description = "Created by IBMRS from an uploaded image. Descriptors: " + ", ".join(clean_descriptors)
+  else:
+      playlist_description = "Created by IBMRS from an uploaded image."
+
+  # Ensure description doesn't exceed Spotify's limit (300 chars)
+  if len(playlist_description) > 300:
+      playlist_description = playlist_description[:297] + "..."
+
+  print(f"Playlist description: {playlist_description}")
+
+  report_progress(job_id, "Creating Spotify playlist", 50)
+
+  playlist_id = _create_spotify_playlist(
+      access_token=access_token,
+      user_id=profile.get("id"),
+      name=playlist_name,
+      description=playlist_description,
+  )
+  print(f"Playlist created with ID: {playlist_id}")
+
+  if not playlist_id:
+    raise JobFailed("Failed to create playlist on Spotify.", 502)
+
+  # Resolve song URIs and add them.
+  report_progress(job_id, "Resolving tracks on Spotify", 60)
+  songs_to_resolve = []
+  for song in pipeline_result:
+    print("Song from pipeline:", song,"Artists:", song.get("artists") if isinstance(song, dict) else None)
+    name = song.get("name") if isinstance(song, dict) else None
+    artists = song.get("artists") if isinstance(song, dict) else None  # Note: plural "artists"
+    if name:
+      songs_to_resolve.append((name, artists))
+
+  track_uris = []
+  resolved_tracks = []
+  for (name, artists), uri in zip(songs_to_resolve, _track_resolver.resolve(access_token, songs_to_resolve)):
+    if uri:
+      track_uris.append(uri)
+      resolved_tracks.append({"name": name, "artist": artists, "uri": uri})
+
+  add_report = None
+  if track_uris:
+    add_report = _add_tracks_to_playlist(access_token, playlist_id, track_uris)
+    if not add_report["added"] and not add_report["unknown_uris"]:
+      raise JobFailed("Playlist created, but adding tracks failed.", 502)
+    if add_report["failed_uris"]:
+      # Leave out only tracks known to be missing from the Spotify playlist; a chunk whose outcome
+      # could not be checked is kept. Filtered by position, since a URI can sit in several chunks
+      kept = [i for chunk in add_report["chunks"] if chunk["state"] != "absent"
+              for i in range(chunk["start"], chunk["start"] + chunk["count"])]
+      track_uris = [track_uris[i] for i in kept]
+      resolved_tracks = [resolved_tracks[i] for i in kept]
+
+  # Save playlist and songs to database
+  report_progress(job_id, "Saving playlist", 90)
+  db = SessionLocal()
+  try:
+      if user_id:
+          unique_tracks = dedupe_tracks(resolved_tracks)
+          save_generated_playlist(
+              db,
+              user_id=user_id,
+              name=playlist_name,
+              description=playlist_description,
+              cover_image=cover_image_url,
+              tracks=unique_tracks
+          )
+          duplicates_removed = len(resolved_tracks) - len(unique_tracks)
+          if duplicates_removed > 0:
+              print(f"✓ Saved playlist '{playlist_name}' with {len(unique_tracks)} unique songs to database ({duplicates_removed} duplicates removed)")
+          else:
+              print(f"✓ Saved playlist '{playlist_name}' with {len(unique_tracks)} songs to database")
   except Exception as e:
-    print(f"Error in create_playlist_from_image: {str(e)}")
-    import traceback
-    traceback.print_exc()
-    return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+      print(f"✗ Error saving playlist to database: {e}")
+      import traceback
+      traceback.print_exc()
+      db.rollback()
   finally:
-    # Clean up the temporary file
-    if os.path.exists(temp_image_path):
-      os.unlink(temp_image_path)
+      db.close()
+
+  return {
+      "playlist_id": playlist_id,
+      "playlist_name": playlist_name,
+      "descriptors": descriptors,
+      "tracks": resolved_tracks,
+      "track_count": len(track_uris),
+      "add_report": add_report["chunks"] if add_report else [],
+  }
 
 
 @app.route("/auth/login")
@@ -539,19 +763,11 @@ def spotify_callback():
   if not code or not code_verifier or not redirect_uri:
     return "Missing authorization code or verifier.", 400
 
-  data = {
-      "grant_type": "authorization_code",
-      "code": code,
-      "redirect_uri": redirect_uri,
-      "client_id": SPOTIFY_CLIENT_ID,
-      "code_verifier": code_verifier,
-  }
-  headers = {"Content-Type": "application/x-www-form-urlencoded"}
-  token_response = requests.post(SPOTIFY_TOKEN_URL, data=data, headers=headers, timeout=10)
-  if token_response.status_code != 200:
-    return f"Failed to exchange code: {token_response.text}", 400
+  try:
+    token_payload = _spotify.exchange_code(code, redirect_uri, code_verifier)
+  except SpotifyError as e:
+    return f"Failed to exchange code: {e.response.text if e.response is not None else e}", 400
 
-  token_payload = token_response.json()
   _store_token(token_payload)
 
   access_token = token_payload.get("access_token")
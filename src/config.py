@@ -4,4 +4,93 @@ import os
 load_dotenv()
 
 # Llama model to use
-OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2-vision")
\ No newline at end of file
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2-vision")
+
+# Pipeline mode: "three_step" (description -> keywords -> values) or "single_call" (one JSON-schema vision call)
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "three_step").lower()
+
+# Songs requested from the search stage for each generated playlist
+PLAYLIST_TRACK_COUNT = int(os.getenv("PLAYLIST_TRACK_COUNT", "15"))
+
+# Song search backend: "chroma" (ChromaDB collection), "numpy" (memory-mapped embeddings)
+# or "features" (KD-tree over the numeric audio features, no text embedding)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "chroma").lower()
+
+# Directory holding spotify_embeddings.npy, spotify_ids.json and spotify_metadata.json, or an index bundle
+NUMPY_INDEX_DIR = os.getenv(
+    "NUMPY_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),
+)
+
+# Bundle root written by chromaInit.py --bundle-dir; when set, the "numpy" backend serves the newest
+# valid bundle under it instead of NUMPY_INDEX_DIR and switches to new versions without a restart
+INDEX_BUNDLE_ROOT = os.getenv("INDEX_BUNDLE_ROOT", "")
+# Seconds between checks for a new bundle version (0 loads once and never reloads), and whether
+# each new version's checksums are verified before it is served
+INDEX_RELOAD_INTERVAL_SECONDS = int(os.getenv("INDEX_RELOAD_INTERVAL_SECONDS", "30"))
+INDEX_RELOAD_VERIFY = os.getenv("INDEX_RELOAD_VERIFY", "True").lower() == "true"
+
+# Songs CSV the "features" backend builds its KD-tree from
+FEATURE_INDEX_CSV = os.getenv(
+    "FEATURE_INDEX_CSV",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "chroma", "spotify_songs.csv"),
+)
+
+# Optional per-feature weights for the "features" backend, e.g. "tempo=0.5,energy=2"
+FEATURE_WEIGHTS = os.getenv("FEATURE_WEIGHTS", "")
+
+# Load the embedding model and song index when the server starts instead of on the first upload
+WARMUP_SEARCH = os.getenv("WARMUP_SEARCH", "False").lower() == "true"
+
+# Number of query embeddings kept in the in-process LRU cache (0 disables it)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+
+# Decimals feature values are rounded to before they are used as a cache key
+EMBEDDING_CACHE_DECIMALS = int(os.getenv("EMBEDDING_CACHE_DECIMALS", "2"))
+
+# Cache of pipeline results keyed on a perceptual hash of the uploaded image
+PIPELINE_CACHE_ENABLED = os.getenv("PIPELINE_CACHE_ENABLED", "True").lower() == "true"
+PIPELINE_CACHE_TTL_SECONDS = int(os.getenv("PIPELINE_CACHE_TTL_SECONDS", "86400"))
+PIPELINE_CACHE_MAX_ENTRIES = int(os.getenv("PIPELINE_CACHE_MAX_ENTRIES", "5000"))
+# Maximum Hamming distance between 64-bit image hashes that still counts as the same image
+PIPELINE_CACHE_MAX_DISTANCE = int(os.getenv("PIPELINE_CACHE_MAX_DISTANCE", "4"))
+
+# Background workers for /api/playlists/from-image and how many more jobs may wait per process
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "20"))
+# Jobs live in the accepting process's executor; it touches them every JOB_HEARTBEAT_SECONDS, and
+# queued/running jobs untouched for JOB_STALE_SECONDS (their process died) are marked failed
+JOB_HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS", "60"))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "600"))
+
+# Concurrent Spotify track searches per playlist
+SPOTIFY_RESOLVE_WORKERS = int(os.getenv("SPOTIFY_RESOLVE_WORKERS", "8"))
+
+# (title, artist) -> Spotify URI cache: in-memory entries and lifetimes of hits and misses
+TRACK_CACHE_SIZE = int(os.getenv("TRACK_CACHE_SIZE", "10000"))
+TRACK_CACHE_TTL_SECONDS = int(os.getenv("TRACK_CACHE_TTL_SECONDS", str(30 * 86400)))
+TRACK_CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv("TRACK_CACHE_NEGATIVE_TTL_SECONDS", "86400"))
+
+# Shared Spotify Web API budget per process and retries for 429/5xx responses
+SPOTIFY_RATE_PER_SECOND = float(os.getenv("SPOTIFY_RATE_PER_SECOND", "10"))
+SPOTIFY_RATE_BURST = int(os.getenv("SPOTIFY_RATE_BURST", "20"))
+SPOTIFY_MAX_RETRIES = int(os.getenv("SPOTIFY_MAX_RETRIES", "4"))
+SPOTIFY_MAX_RETRY_AFTER_SECONDS = float(os.getenv("SPOTIFY_MAX_RETRY_AFTER_SECONDS", "120"))
+
+# Page size for /api/my-playlists when ?limit= is not given, and the most a client may ask for
+PLAYLISTS_PAGE_SIZE = int(os.getenv("PLAYLISTS_PAGE_SIZE", "20"))
+PLAYLISTS_MAX_PAGE_SIZE = int(os.getenv("PLAYLISTS_MAX_PAGE_SIZE", "100"))
+
+# Serialized /api/playlists/<id> responses kept in memory (0 disables; ETags still apply)
+PLAYLIST_RESPONSE_CACHE_SIZE = int(os.getenv("PLAYLIST_RESPONSE_CACHE_SIZE", "256"))
+
+# Uploads are validated and re-encoded to a JPEG no larger than this on its longest edge
+# before the vision stage; IMAGE_MAX_PIXELS rejects decompression bombs before decoding
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1024"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", "50000000"))
+
+# How often unreferenced covers in static/playlist_covers are deleted (0 disables),
+# and how old an unreferenced cover must be before it is, so in-flight jobs keep theirs
+COVER_GC_INTERVAL_SECONDS = int(os.getenv("COVER_GC_INTERVAL_SECONDS", "3600"))
+COVER_GC_GRACE_SECONDS = int(os.getenv("COVER_GC_GRACE_SECONDS", "3600"))
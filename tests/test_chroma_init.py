@@ -0,0 +1,27 @@
+"""
+chromaInit's chunked text builder against the per-row documents of a full build
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+from chroma.chromaInit import FEATURE_DTYPES, build_track_texts, row_fingerprint
+
+CSV = """name,artists,danceability,energy,acousticness,liveness,tempo,valence
+Song A,Artist,0.5,0.8,0.1,0.2,120,0.7
+Song B,Artist,0.4,,0.3,0.1,98.5,0.2
+"""
+
+
+def test_chunk_texts_match_row_texts_with_missing_values():
+    df = pd.read_csv(io.StringIO(CSV), dtype=FEATURE_DTYPES)
+    texts = build_track_texts(df).tolist()
+    assert texts == [
+        "with danceability: 0.5,energy: 0.8,acousticness: 0.1,liveness: 0.2,tempo: 120.0,valence: 0.7",
+        "with danceability: 0.4,energy: nan,acousticness: 0.3,liveness: 0.1,tempo: 98.5,valence: 0.2",
+    ]
+    # Same f-string formatting initialize_chroma_db's build_track_text applies per row
+    assert texts[1] == f"with danceability: 0.4,energy: {np.nan},acousticness: 0.3,liveness: 0.1,tempo: 98.5,valence: 0.2"
+    metadata = df[["name", "artists"]].to_dict(orient="records")[1]
+    assert len(row_fingerprint(texts[1], metadata)) == 16
@@ -0,0 +1,45 @@
+"""
+ChromaClient.embed_queries: the cache key is canonical, the embedded text is not
+"""
+import numpy as np
+import pytest
+
+import ChromaClient
+from EmbeddingCache import EmbeddingCache
+
+
+class RecordingModel:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, convert_to_numpy=True):
+        self.calls.append(list(texts))
+        return np.array([[float(len(text)), float(sum(map(ord, text)))] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = RecordingModel()
+    monkeypatch.setattr(ChromaClient, "get_embed_model", lambda: model)
+    return model
+
+
+QUERY = '{"energy": 0.8012, "danceability": 0.5, "acousticness": 0.1, "liveness": 0.2, "valence": 0.7, "tempo": 120}'
+SAME_VIBE = '{"danceability": 0.5, "energy": 0.8, "acousticness": 0.1, "liveness": 0.2, "valence": 0.7, "tempo": 120}'
+
+
+def test_original_text_is_embedded(model, monkeypatch):
+    monkeypatch.setattr(ChromaClient, "embedding_cache", EmbeddingCache(max_size=16))
+    embeddings = ChromaClient.embed_queries([QUERY, SAME_VIBE])
+    # One encode for the shared canonical key, using the first original text
+    assert model.calls == [[QUERY]]
+    assert np.array_equal(embeddings[0], embeddings[1])
+    assert np.array_equal(embeddings[0], model.encode([QUERY])[0])
+
+
+def test_disabled_cache_embeds_every_distinct_text(model, monkeypatch):
+    monkeypatch.setattr(ChromaClient, "embedding_cache", EmbeddingCache(max_size=0))
+    embeddings = ChromaClient.embed_queries([QUERY, SAME_VIBE, QUERY])
+    assert model.calls == [[QUERY, SAME_VIBE]]
+    assert np.array_equal(embeddings[0], embeddings[2])
+    assert not np.array_equal(embeddings[0], embeddings[1])
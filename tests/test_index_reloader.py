@@ -0,0 +1,112 @@
+"""
+ReloadingIndex: which bundle failures are remembered, and that queries never wait on a reload
+"""
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import IndexReloader
+from IndexBundle import write_bundle
+from IndexReloader import ReloadingIndex
+
+MODEL = "test-model"
+
+
+def publish(bundle_root, version):
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((4, 3)).astype(np.float32)
+    ids = [str(i) for i in range(4)]
+    metadatas = [{"name": f"Song {i}", "artists": "Artist", "energy": 0.5} for i in range(4)]
+    bundle_dir = write_bundle(bundle_root, embeddings, ids, metadatas, MODEL, dtype="float32", recall_queries=0)
+    # Fixed version names so the order is known
+    os.rename(bundle_dir, os.path.join(bundle_root, version))
+
+
+@pytest.fixture
+def bundle_root(tmp_path):
+    root = str(tmp_path)
+    publish(root, "v1")
+    return root
+
+
+def test_corrupt_bundle_is_not_retried(bundle_root, monkeypatch):
+    reloader = ReloadingIndex(bundle_root, model_name=MODEL, verify=True)
+    assert reloader.reload() == "v1"
+
+    publish(bundle_root, "v2")
+    with open(os.path.join(bundle_root, "v2", "embeddings.npy"), "r+b") as f:
+        f.seek(-4, os.SEEK_END)
+        f.write(b"\xff\xff\xff\xff")
+    assert reloader.reload() == "v1"
+
+    loads = []
+    load_bundle = IndexReloader.load_bundle
+    monkeypatch.setattr(IndexReloader, "load_bundle", lambda *a, **k: loads.append(a) or load_bundle(*a, **k))
+    assert reloader.reload() == "v1"
+    assert loads == []
+
+
+def test_io_error_is_retried_on_next_reload(bundle_root, monkeypatch):
+    reloader = ReloadingIndex(bundle_root, model_name=MODEL, verify=True)
+    assert reloader.reload() == "v1"
+    publish(bundle_root, "v2")
+
+    load_bundle = IndexReloader.load_bundle
+
+    def flaky_load(bundle_dir, **kwargs):
+        raise OSError("Too many open files")
+
+    monkeypatch.setattr(IndexReloader, "load_bundle", flaky_load)
+    assert reloader.reload() == "v1"
+
+    monkeypatch.setattr(IndexReloader, "load_bundle", load_bundle)
+    assert reloader.reload() == "v2"
+    with reloader.acquire() as index:
+        assert len(index) == 4
+
+
+def test_queries_do_not_wait_for_a_reload(bundle_root, monkeypatch):
+    reloader = ReloadingIndex(bundle_root, model_name=MODEL, verify=True)
+    reloader.start(3600)
+    assert reloader.version == "v1"
+    publish(bundle_root, "v2")
+
+    validating = threading.Event()
+    finish = threading.Event()
+    validate = reloader._validate
+
+    def slow_validate(version):
+        validating.set()
+        finish.wait(5)
+        return validate(version)
+
+    monkeypatch.setattr(reloader, "_validate", slow_validate)
+    reload_thread = threading.Thread(target=reloader.reload)
+    reload_thread.start()
+    try:
+        assert validating.wait(5)
+        started = time.monotonic()
+        # What every numpy query does: ensure the watcher is running, then pin the current generation
+        reloader.start(3600)
+        with reloader.acquire() as index:
+            assert len(index) == 4
+        assert time.monotonic() - started < 0.5
+        assert reloader.version == "v1"
+    finally:
+        finish.set()
+        reload_thread.join()
+    assert reloader.version == "v2"
+
+
+def test_start_loads_once_per_process(bundle_root, monkeypatch):
+    reloader = ReloadingIndex(bundle_root, model_name=MODEL, verify=True)
+    reloads = []
+    reload = reloader.reload
+    monkeypatch.setattr(reloader, "reload", lambda: reloads.append(1) or reload())
+    for _ in range(3):
+        reloader.start(0)
+    assert reloads == [1]
+    assert reloader.version == "v1"
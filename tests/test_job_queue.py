@@ -0,0 +1,85 @@
+"""
+Playlist job heartbeats and the orphaned-job sweep, on an in-memory SQLite database
+"""
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import JobQueue as job_queue_module
+from JobQueue import JobQueue, fail_stale_jobs
+from database.models import PlaylistJob
+
+
+@pytest.fixture
+def session_factory(sqlite_session, monkeypatch):
+    monkeypatch.setattr(job_queue_module, "SessionLocal", sqlite_session)
+    return sqlite_session
+
+
+def add_job(session_factory, status, age_seconds):
+    db = session_factory()
+    stamp = datetime.utcnow() - timedelta(seconds=age_seconds)
+    job = PlaylistJob(status=status, stage=status, created_at=stamp, updated_at=stamp)
+    db.add(job)
+    db.commit()
+    job_id = job.id
+    db.close()
+    return job_id
+
+
+def get_job(session_factory, job_id):
+    db = session_factory()
+    try:
+        return db.query(PlaylistJob).filter(PlaylistJob.id == job_id).one()
+    finally:
+        db.close()
+
+
+def test_sweep_fails_only_stale_unfinished_jobs(session_factory):
+    stale_queued = add_job(session_factory, PlaylistJob.STATUS_QUEUED, 3600)
+    stale_running = add_job(session_factory, PlaylistJob.STATUS_RUNNING, 3600)
+    fresh_running = add_job(session_factory, PlaylistJob.STATUS_RUNNING, 5)
+    old_succeeded = add_job(session_factory, PlaylistJob.STATUS_SUCCEEDED, 3600)
+
+    assert fail_stale_jobs(600) == 2
+
+    for job_id in (stale_queued, stale_running):
+        job = get_job(session_factory, job_id)
+        assert job.status == PlaylistJob.STATUS_FAILED
+        assert job.finished_at is not None
+        assert job.to_dict()["http_status"] == 503
+    assert get_job(session_factory, fresh_running).status == PlaylistJob.STATUS_RUNNING
+    assert get_job(session_factory, old_succeeded).status == PlaylistJob.STATUS_SUCCEEDED
+
+
+def test_heartbeat_keeps_live_jobs_out_of_the_sweep(session_factory):
+    queue = JobQueue(max_workers=1, max_pending=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def job(job_id):
+        started.set()
+        return release.wait(5) and {"ok": True}
+
+    job_id = queue.submit(job)
+    # The sessions share one SQLite connection, so let the worker's "running" update finish first
+    assert started.wait(5)
+
+    # Pretend the job has been running for an hour without a progress update
+    db = session_factory()
+    db.query(PlaylistJob).filter(PlaylistJob.id == job_id).update(
+        {PlaylistJob.updated_at: datetime.utcnow() - timedelta(hours=1)}, synchronize_session=False
+    )
+    db.commit()
+    db.close()
+
+    assert queue.heartbeat() == 1
+    assert fail_stale_jobs(600) == 0
+
+    release.set()
+    queue._executor.shutdown(wait=True)
+    job = get_job(session_factory, job_id)
+    assert job.status == PlaylistJob.STATUS_SUCCEEDED
+    assert job.to_dict()["http_status"] == 200
+    assert queue.heartbeat() == 0
@@ -0,0 +1,126 @@
+"""
+Playlist listings issue a fixed number of SQL queries, however many playlists a user has
+
+The in-process counterpart of benchmarks/check_query_counts.py, on an in-memory
+SQLite database: runs the playlist_store functions behind /playlists and
+/api/my-playlists, without Flask.
+"""
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from database.models import User, Playlist, PlaylistSong, Song
+from database.playlist_store import get_playlist_page, list_playlist_summaries
+
+SONGS_PER_PLAYLIST = 3
+PAGE_SIZE = 20
+
+
+class QueryCounter:
+    """
+    Counts statements sent to the engine while active
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self)
+
+
+def make_library(session_factory, playlists):
+    db = session_factory()
+    run_id = uuid.uuid4().hex[:8]
+    user = User(spotify_id=f'count_{run_id}', email=f'count_{run_id}@example.com')
+    db.add(user)
+    db.flush()
+    for p in range(playlists):
+        playlist = Playlist(name=f'Playlist {p}', user_id=user.id)
+        db.add(playlist)
+        for i in range(SONGS_PER_PLAYLIST):
+            song = Song(title=f'Song {p}.{i}', artist='Artist', audio_url=f'spotify:track:{run_id}{p}x{i}')
+            playlist.playlist_songs.append(PlaylistSong(song=song, order=i))
+    db.commit()
+    user_id = user.id
+    db.close()
+    return user_id
+
+
+def my_playlists(db, user_id, include_songs, after=None):
+    # /api/my-playlists: one page of models, serialized as the route does
+    page, has_more = get_playlist_page(db, user_id, PAGE_SIZE, after=after, include_songs=include_songs)
+    return [p.to_dict(include_songs=include_songs) for p in page], has_more
+
+
+def count_queries(sqlite_engine, sqlite_session, playlists, listing):
+    user_id = make_library(sqlite_session, playlists)
+    db = sqlite_session()
+    try:
+        with QueryCounter(sqlite_engine) as counter:
+            result = listing(db, user_id)
+    finally:
+        db.close()
+    return counter.count, result
+
+
+@pytest.mark.parametrize('listing, page_size', [
+    (list_playlist_summaries, None),
+    (lambda db, user_id: my_playlists(db, user_id, include_songs=False)[0], PAGE_SIZE),
+    (lambda db, user_id: my_playlists(db, user_id, include_songs=True)[0], PAGE_SIZE),
+], ids=['playlists', 'my-playlists', 'my-playlists-with-songs'])
+def test_listing_query_count_does_not_grow(sqlite_engine, sqlite_session, listing, page_size):
+    counts = []
+    for size in (1, 10, 50):
+        count, result = count_queries(sqlite_engine, sqlite_session, size, listing)
+        assert len(result) == min(size, page_size or size)
+        counts.append(count)
+    assert len(set(counts)) == 1, f"query counts grew with the number of playlists: {counts}"
+
+
+@pytest.mark.parametrize('include_songs', [False, True])
+def test_every_page_costs_the_same(sqlite_engine, sqlite_session, include_songs):
+    user_id = make_library(sqlite_session, 2 * PAGE_SIZE + 5)
+    db = sqlite_session()
+    seen, counts, after = [], [], None
+    try:
+        while True:
+            with QueryCounter(sqlite_engine) as counter:
+                page, has_more = my_playlists(db, user_id, include_songs, after=after)
+            counts.append(counter.count)
+            seen.extend(p['id'] for p in page)
+            if not has_more:
+                break
+            # What the route's cursor carries: the last playlist's created_at and id
+            after = (datetime.fromisoformat(page[-1]['created_at']), page[-1]['id'])
+    finally:
+        db.close()
+    assert len(counts) == 3
+    assert len(set(counts)) == 1, f"later pages cost more queries: {counts}"
+    assert len(seen) == len(set(seen)) == 2 * PAGE_SIZE + 5
+    if include_songs:
+        assert all(count == 3 for count in counts)
+
+
+def test_song_count_does_not_load_songs(sqlite_engine, sqlite_session):
+    _, playlists = count_queries(
+        sqlite_engine, sqlite_session, 5, lambda db, user_id: my_playlists(db, user_id, include_songs=False)[0]
+    )
+    assert [p['song_count'] for p in playlists] == [SONGS_PER_PLAYLIST] * 5
+
+
+def test_unflushed_song_count_counts_pending_rows():
+    playlist = Playlist(name='New')
+    assert playlist.get_song_count() == 0
+    playlist.playlist_songs.append(PlaylistSong(order=0))
+    assert playlist.get_song_count() == 1
@@ -0,0 +1,231 @@
+"""
+SpotifyClient retry policy against a local stub HTTP server
+"""
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from SpotifyClient import SpotifyClient, SpotifyError
+
+
+class StubSpotify:
+    """
+    Scripted HTTP server: each request pops the next (status, headers, body, delay) for its path.
+    """
+
+    def __init__(self):
+        self.scripts = {}
+        self.received = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                path = self.path.split("?")[0]
+                stub.received.append((self.command, path))
+                status, headers, body, delay = stub.scripts[path].pop(0)
+                if delay:
+                    time.sleep(delay)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                try:
+                    self.wfile.write(payload)
+                except OSError:
+                    pass
+
+            do_GET = _respond
+            do_POST = _respond
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def script(self, path, *responses):
+        self.scripts[path] = [tuple(r) + (None,) * (4 - len(r)) for r in responses]
+
+    def count(self, path):
+        return sum(1 for _, p in self.received if p == path)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubSpotify()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def client(stub):
+    return SpotifyClient(
+        client_id="test", api_base=stub.url, token_url=f"{stub.url}/api/token",
+        rate_per_second=1000, burst=1000, max_retries=3, backoff_base=0.001, backoff_max=0.01, timeout=0.5,
+    )
+
+
+SEARCH_HIT = {"tracks": {"items": [{"uri": "spotify:track:1"}]}}
+
+
+def test_429_waits_for_retry_after(stub, client):
+    # Honoured as sent, even past backoff_max
+    stub.script("/search", (429, {"Retry-After": "0.2"}, {}), (200, {}, SEARCH_HIT))
+    started = time.monotonic()
+    assert client.search_track("token", "Song") == "spotify:track:1"
+    assert time.monotonic() - started >= 0.2
+    assert stub.count("/search") == 2
+    assert client.metrics()["search"]["rate_limited"] == 1
+
+
+def test_429_longer_than_max_retry_after_is_not_retried(stub, client):
+    client.max_retry_after = 5
+    stub.script("/search", (429, {"Retry-After": "3600"}, {}), (200, {}, SEARCH_HIT))
+    started = time.monotonic()
+    with pytest.raises(SpotifyError) as e:
+        client.search_track("token", "Song")
+    assert e.value.status_code == 429
+    assert time.monotonic() - started < 1
+    assert stub.count("/search") == 1
+
+
+def test_429_without_retry_after_uses_jittered_backoff(client, monkeypatch):
+    class Response:
+        status_code = 429
+        headers = {}
+
+    bounds = []
+    monkeypatch.setattr("SpotifyClient.random.uniform", lambda low, high: bounds.append((low, high)) or high)
+    assert client._backoff(3, Response()) == min(client.backoff_max, client.backoff_base * 8)
+    assert bounds == [(0, min(client.backoff_max, client.backoff_base * 8))]
+
+
+def test_get_retries_5xx(stub, client):
+    stub.script("/search", (503, {}, {}), (502, {}, {}), (200, {}, SEARCH_HIT))
+    assert client.search_track("token", "Song") == "spotify:track:1"
+    assert stub.count("/search") == 3
+    assert client.metrics()["search"]["retries"] == 2
+
+
+def test_get_gives_up_after_max_retries(stub, client):
+    stub.script("/search", *[(500, {}, {})] * 4)
+    with pytest.raises(SpotifyError) as e:
+        client.search_track("token", "Song")
+    assert e.value.status_code == 500
+    assert stub.count("/search") == 4
+
+
+def test_get_retries_read_timeout(stub, client):
+    stub.script("/search", (200, {}, SEARCH_HIT, 1.0), (200, {}, SEARCH_HIT))
+    assert client.search_track("token", "Song") == "spotify:track:1"
+    assert stub.count("/search") == 2
+
+
+def test_post_is_not_retried_on_5xx(stub, client):
+    stub.script("/me/playlists", (500, {}, {}), (201, {}, {"id": "duplicate"}))
+    with pytest.raises(SpotifyError) as e:
+        client.create_playlist("token", "Playlist")
+    assert e.value.status_code == 500
+    assert stub.count("/me/playlists") == 1
+
+
+def test_post_is_not_retried_on_read_timeout(stub, client):
+    # The server applies the request but answers too late; re-sending would add the tracks twice
+    stub.script("/playlists/p1/tracks", (201, {}, {"snapshot_id": "s1"}, 1.0), (201, {}, {"snapshot_id": "s2"}))
+    with pytest.raises(SpotifyError):
+        client.add_tracks("token", "p1", ["spotify:track:1"])
+    assert stub.count("/playlists/p1/tracks") == 1
+
+
+def test_post_is_retried_on_429(stub, client):
+    stub.script("/me/playlists", (429, {"Retry-After": "0"}, {}), (201, {}, {"id": "p1"}))
+    assert client.create_playlist("token", "Playlist") == "p1"
+    assert stub.count("/me/playlists") == 2
+
+
+def test_code_exchange_is_not_retried_on_5xx(stub, client):
+    stub.script("/api/token", (502, {}, {}), (200, {}, {"access_token": "a"}))
+    with pytest.raises(SpotifyError):
+        client.exchange_code("code", "http://localhost/callback", "verifier")
+    assert stub.count("/api/token") == 1
+
+
+def test_post_is_retried_when_connection_is_refused():
+    # Reserve a port and close it so every connect is refused before anything is sent
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    client = SpotifyClient(api_base=f"http://127.0.0.1:{port}", max_retries=2, backoff_base=0.001,
+                           rate_per_second=1000, burst=1000, timeout=0.5)
+    with pytest.raises(SpotifyError):
+        client.create_playlist("token", "Playlist")
+    metrics = client.metrics()["create_playlist"]
+    assert metrics["requests"] == 3
+    assert metrics["retries"] == 2
+
+
+def test_timed_out_chunk_that_landed_is_kept(stub, client):
+    # Middle chunk times out but was applied; the playlist shows it, so it is counted and not re-sent
+    stub.script(
+        "/playlists/p1/tracks",
+        (201, {}, {"snapshot_id": "s1"}),
+        (201, {}, {"snapshot_id": "late"}, 1.0),
+        (201, {}, {"snapshot_id": "s3"}),
+    )
+    stub.script("/playlists/p1", (200, {}, {"snapshot_id": "late", "tracks": {"total": 4}}))
+    uris = [f"spotify:track:{i}" for i in range(5)]
+    report = client.add_tracks_chunked("token", "p1", uris, chunk_size=2)
+    assert stub.count("/playlists/p1/tracks") == 3
+    assert [chunk["state"] for chunk in report["chunks"]] == ["added", "added", "added"]
+    assert report["failed_uris"] == []
+    assert report["added"] == 5
+    assert report["snapshot_id"] == "s3"
+
+
+def test_chunk_known_absent_is_sent_again(stub, client):
+    stub.script(
+        "/playlists/p1/tracks",
+        (201, {}, {"snapshot_id": "s1"}),
+        (500, {}, {}),
+        (201, {}, {"snapshot_id": "s2"}),
+        (201, {}, {"snapshot_id": "s3"}),
+    )
+    stub.script("/playlists/p1", (200, {}, {"snapshot_id": "s1", "tracks": {"total": 2}}))
+    uris = [f"spotify:track:{i}" for i in range(5)]
+    report = client.add_tracks_chunked("token", "p1", uris, chunk_size=2)
+    assert stub.count("/playlists/p1/tracks") == 4
+    assert [chunk["attempts"] for chunk in report["chunks"]] == [1, 2, 1]
+    assert report["added"] == 5
+    assert report["snapshot_id"] == "s3"
+
+
+def test_chunk_of_unknown_fate_stops_the_run(stub, client):
+    # The playlist cannot be read back, so the timed-out chunk may or may not be there
+    stub.script(
+        "/playlists/p1/tracks",
+        (201, {}, {"snapshot_id": "s1"}),
+        (201, {}, {"snapshot_id": "late"}, 1.0),
+    )
+    stub.script("/playlists/p1", *[(500, {}, {})] * 4)
+    uris = [f"spotify:track:{i}" for i in range(5)]
+    report = client.add_tracks_chunked("token", "p1", uris, chunk_size=2)
+    assert stub.count("/playlists/p1/tracks") == 2
+    assert [chunk["state"] for chunk in report["chunks"]] == ["added", "unknown", "absent"]
+    assert report["unknown_uris"] == uris[2:4]
+    assert report["failed_uris"] == uris[4:]
+    assert report["added"] == 2
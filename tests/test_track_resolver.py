@@ -0,0 +1,72 @@
+"""
+TrackResolver's songs-table layer, on an in-memory SQLite database
+"""
+import threading
+
+import pytest
+from sqlalchemy import tuple_
+
+import TrackResolver as track_resolver_module
+from TrackResolver import TrackResolver
+from database.models import Song
+
+
+@pytest.fixture
+def session_factory(sqlite_session, monkeypatch):
+    monkeypatch.setattr(track_resolver_module, "SessionLocal", sqlite_session)
+    db = sqlite_session()
+    db.add_all([
+        Song(title="Hello", artist="ADELE", audio_url="spotify:track:hello"),
+        Song(title="Untitled", artist="Unknown Artist", audio_url="spotify:track:untitled"),
+    ])
+    db.commit()
+    db.close()
+    return sqlite_session
+
+
+def no_search(searched):
+    def search(access_token, songs):
+        searched.extend(songs)
+        return [(None, True) for _ in songs]
+    return search
+
+
+def sqlite_nocase(monkeypatch):
+    # MySQL compares these columns case-insensitively through its collation; SQLite needs telling
+    monkeypatch.setattr(
+        track_resolver_module, "tuple_", lambda *columns: tuple_(*(column.collate("NOCASE") for column in columns))
+    )
+
+
+def test_saved_songs_match_regardless_of_case(session_factory, monkeypatch):
+    sqlite_nocase(monkeypatch)
+    searched = []
+    resolver = TrackResolver(no_search(searched))
+    assert resolver.resolve("token", [("hello", "Adele"), ("HELLO", "adele")]) == ["spotify:track:hello"] * 2
+    assert searched == []
+    assert resolver.stats["db_hits"] == 1
+
+
+def test_missing_artist_matches_the_stored_default(session_factory):
+    searched = []
+    resolver = TrackResolver(no_search(searched))
+    assert resolver.resolve("token", [("Untitled", None)]) == ["spotify:track:untitled"]
+    assert searched == []
+
+
+def test_stats_are_counted_across_threads(session_factory):
+    resolver = TrackResolver(no_search([]))
+    resolver.resolve("token", [("Untitled", None)])
+    barrier = threading.Barrier(8)
+
+    def resolve_many():
+        barrier.wait()
+        for _ in range(200):
+            resolver.resolve("token", [("Untitled", None)])
+
+    threads = [threading.Thread(target=resolve_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert resolver.stats["memory_hits"] == 8 * 200